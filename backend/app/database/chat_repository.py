@@ -1,25 +1,22 @@
-import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Optional
 from datetime import datetime
 import uuid
-from app.utils.database import get_chroma_collection
+from app.database.metadata_store import CHAT_PAGE_SIZE, get_metadata_store
+from app.utils.executors import run_storage
 
 logger = logging.getLogger(__name__)
 
 class ChatRepository:
-    """Repository for managing chat/search history in ChromaDB"""
+    """Repository for managing chat/search history in the metadata store"""
     
     def __init__(self, profile_id: str):
         self.profile_id = profile_id
-        self.collection_name = f"{profile_id}_chats"
-        self.collection = None
+        self.store = get_metadata_store()
     
     async def initialize(self):
-        """Initialize the collection"""
-        if not self.collection:
-            self.collection = await get_chroma_collection(self.collection_name)
-        return self.collection
+        """Kept for API compatibility; the metadata store needs no per-profile setup"""
+        return self.store
     
     async def create_chat(self, title: Optional[str] = None) -> str:
         """Create a new chat session and return its ID"""
@@ -32,26 +29,17 @@ class ChatRepository:
                 "title": title or "New Chat",
                 "created_at": datetime.now().isoformat(),
                 "updated_at": datetime.now().isoformat(),
-                "messages": "[]",  # JSON string — ChromaDB can't store list-of-dicts
             }
 
-            if not self.collection:
-                await self.initialize()
-
-            self.collection.upsert(
-                ids=[chat_id],
-                metadatas=[chat_data],
-                embeddings=[[0.0] * 10]
-            )
+            await run_storage(self.store.create_chat, chat_data)
             
             return chat_id
         except Exception as e:
             logger.error(f"Error creating chat: {str(e)}")
             return None
     
-    async def add_message(self, chat_id: str, message_type: str, content: Dict[str, Any], 
-                   embedding: Optional[List[float]] = None) -> str:
-        """Add a message to a chat session"""
+    async def add_message(self, chat_id: str, message_type: str, content: Dict[str, Any]) -> str:
+        """Append a message to a chat session without touching earlier messages"""
         try:
             message_id = str(uuid.uuid4())
             
@@ -62,46 +50,49 @@ class ChatRepository:
                 "timestamp": datetime.now().isoformat()
             }
             
-            if not self.collection:
-                await self.initialize()
-                
-            # Get current chat data
-            results = self.collection.get(ids=[chat_id], include=["metadatas"])
-            
-            if not results or not results["metadatas"]:
+            if await run_storage(self.store.append_chat_message, chat_id, message_data) is None:
                 logger.error(f"Chat {chat_id} not found")
                 return None
-                
-            chat_data = results["metadatas"][0]
-
-            # Messages are stored as a JSON string
-            messages = json.loads(chat_data.get("messages", "[]"))
-            messages.append(message_data)
-            chat_data["messages"] = json.dumps(messages)
-            chat_data["updated_at"] = datetime.now().isoformat()
-
-            self.collection.upsert(
-                ids=[chat_id],
-                metadatas=[chat_data],
-                embeddings=[embedding if embedding else [0.0] * 10]
-            )
             
             return message_id
         except Exception as e:
             logger.error(f"Error adding message: {str(e)}")
             return None
     
-    async def get_chat(self, chat_id: str) -> Optional[Dict[str, Any]]:
-        """Get a chat by ID"""
+    async def get_chat_info(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """Get a chat's title, timestamps and message count if it belongs to this profile"""
+        chat = await run_storage(self.store.get_chat, chat_id)
+        if not chat or chat["profile_id"] != self.profile_id:
+            return None
+        return chat
+    
+    async def get_chat(self, chat_id: str, message_limit: int = CHAT_PAGE_SIZE) -> Optional[Dict[str, Any]]:
+        """Get a chat with its newest page of messages"""
         try:
-            if not self.collection:
-                await self.initialize()
-                
-            results = self.collection.get(ids=[chat_id], include=["metadatas"])
+            chat = await self.get_chat_info(chat_id)
+            if not chat:
+                return None
             
-            if results and results["metadatas"] and results["metadatas"][0]:
-                return results["metadatas"][0]
-            return None
+            return {**chat, **await self.get_messages(chat_id, limit=message_limit)}
         except Exception as e:
             logger.error(f"Error getting chat: {str(e)}")
             return None
+    
+    async def get_messages(
+        self,
+        chat_id: str,
+        limit: int = CHAT_PAGE_SIZE,
+        after: Optional[int] = None,
+        before: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get one page of a chat's messages plus cursors for the neighbouring pages.
+
+        Without a cursor the newest page is returned; pass `before` to load older
+        messages and `after` to load newer ones.
+        """
+        messages = await run_storage(self.store.get_chat_messages, chat_id, limit, after, before)
+        return {
+            "messages": messages,
+            "before": messages[0]["seq"] if messages and messages[0]["seq"] > 1 else None,
+            "after": messages[-1]["seq"] if messages else after,
+        }
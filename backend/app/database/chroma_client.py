@@ -1,9 +1,9 @@
-import chromadb
-from chromadb.config import Settings
 import os
-from typing import Optional, Dict, Any, List
+import threading
+from typing import Optional, Dict, Any, List, Set, Iterator, Callable
 from datetime import datetime
 import logging
+from app.utils.executors import run_storage
 
 logger = logging.getLogger(__name__)
 
@@ -18,12 +18,15 @@ os.makedirs(CHROMA_DIR, exist_ok=True)
 class ChromaDBClient:
     _instance = None
     _client = None
+    _instance_lock = threading.Lock()
 
     @classmethod
     def get_instance(cls):
         """Singleton pattern to ensure only one ChromaDB client instance exists"""
-        if cls._instance is None:
-            cls._instance = ChromaDBClient()
+        # Storage executor threads may race on first use
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = ChromaDBClient()
         return cls._instance
 
     def __init__(self):
@@ -33,6 +36,10 @@ class ChromaDBClient:
             # Ensure the directory exists
             os.makedirs(CHROMA_DIR, exist_ok=True)
             
+            # Imported here rather than at module level; chromadb is slow to import
+            import chromadb
+            from chromadb.config import Settings
+            
             # Create the client with persistent storage
             self._client = chromadb.PersistentClient(
                 path=CHROMA_DIR,
@@ -82,21 +89,128 @@ class ChromaDBClient:
         """Delete a collection by name"""
         try:
             self._client.delete_collection(collection_name)
+            _drop_collection_indexes(collection_name)
+            _notify_write(collection_name, "reset", [])
             logger.info(f"Deleted collection: {collection_name}")
             return True
         except Exception as e:
             logger.error(f"Error deleting collection {collection_name}: {str(e)}")
             return False
 
+# Metadata fields looked up by equality often enough to keep an in-process index for
+INDEXED_FIELDS = ("filepath", "profile_id")
+
+# Rows fetched per page when a lookup has to scan a whole collection
+SCAN_PAGE_SIZE = 5000
+
+class _FieldIndex:
+    """In-process value -> ids index over one metadata field of a collection"""
+
+    def __init__(self, field: str):
+        self.field = field
+        self.ready = False
+        self.by_value: Dict[Any, Set[str]] = {}
+        self.by_id: Dict[str, Any] = {}
+
+    def reset(self):
+        """Forget everything; the index is rebuilt on its next lookup"""
+        self.ready = False
+        self.by_value.clear()
+        self.by_id.clear()
+
+    def set(self, doc_id: str, metadata: Dict[str, Any]):
+        """Record the field value of a written document"""
+        self.remove(doc_id)
+        value = metadata.get(self.field)
+        if value is not None:
+            self.by_value.setdefault(value, set()).add(doc_id)
+            self.by_id[doc_id] = value
+
+    def remove(self, doc_id: str):
+        """Drop a document from the index"""
+        if doc_id in self.by_id:
+            value = self.by_id.pop(doc_id)
+            ids = self.by_value.get(value)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.by_value[value]
+
+class _CollectionIndexes:
+    """Secondary indexes for one collection, shared by every wrapper around it"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.fields = {field: _FieldIndex(field) for field in INDEXED_FIELDS}
+
+    def record(self, ids: List[str], metadatas: Optional[List[Dict[str, Any]]]):
+        """Keep indexes in step with an add/update/upsert"""
+        with self.lock:
+            for index in self.fields.values():
+                if not index.ready:
+                    continue
+                if metadatas is None or any(index.field not in (metadata or {}) for metadata in metadatas):
+                    # Can't tell whether the write kept or dropped the field; rebuild on next use
+                    index.reset()
+                    continue
+                for doc_id, metadata in zip(ids, metadatas):
+                    index.set(doc_id, metadata)
+
+    def forget(self, ids: List[str]):
+        """Keep indexes in step with a delete"""
+        with self.lock:
+            for index in self.fields.values():
+                for doc_id in ids:
+                    index.remove(doc_id)
+
+_collection_indexes: Dict[str, _CollectionIndexes] = {}
+_collection_indexes_lock = threading.Lock()
+
+def _get_collection_indexes(collection_name: str) -> _CollectionIndexes:
+    with _collection_indexes_lock:
+        if collection_name not in _collection_indexes:
+            _collection_indexes[collection_name] = _CollectionIndexes()
+        return _collection_indexes[collection_name]
+
+def _drop_collection_indexes(collection_name: str):
+    with _collection_indexes_lock:
+        _collection_indexes.pop(collection_name, None)
+
+# Callbacks notified after each write to a collection, as (event, ids, embeddings, metadatas)
+# with event "upsert", "delete" or "reset" (the collection was dropped); caches derived from
+# a collection's vectors use them to stay current without re-reading it
+_write_listeners: Dict[str, List[Callable[[str, List[str], Any, Any], None]]] = {}
+_write_listeners_lock = threading.Lock()
+
+def add_write_listener(collection_name: str, listener: Callable[[str, List[str], Any, Any], None]) -> None:
+    """Register a callback for writes to a collection; it runs on the writing thread"""
+    with _write_listeners_lock:
+        _write_listeners.setdefault(collection_name, []).append(listener)
+
+def _notify_write(collection_name: str, event: str, ids: List[str], embeddings: Any = None, metadatas: Any = None) -> None:
+    with _write_listeners_lock:
+        listeners = list(_write_listeners.get(collection_name, ()))
+    for listener in listeners:
+        try:
+            listener(event, ids, embeddings, metadatas)
+        except Exception as e:
+            logger.error(f"Write listener of collection {collection_name} failed: {str(e)}")
+
+def _is_scalar(value: Any) -> bool:
+    """Whether a query value can be matched by a Chroma equality filter"""
+    return isinstance(value, (str, int, float, bool))
+
 class ChromaCollectionWrapper:
     """Wrapper class for ChromaDB collection with helper methods for CRUD operations"""
     
     def __init__(self, collection):
         self.collection = collection
+        self.name = getattr(collection, "name", str(id(collection)))
+        self._indexes = _get_collection_indexes(self.name)
     
-    def get(self, ids=None, include=None, limit=None):
+    def get(self, ids=None, include=None, limit=None, offset=None, where=None):
         """Direct pass-through to the underlying collection's get method"""
-        return self.collection.get(ids=ids, include=include, limit=limit)
+        return self.collection.get(ids=ids, include=include, limit=limit, offset=offset, where=where)
 
     def query(self, query_embeddings=None, n_results=None, include=None):
         """Direct pass-through to the underlying collection's query method"""
@@ -108,71 +222,143 @@ class ChromaCollectionWrapper:
         
     def add(self, ids, embeddings, metadatas=None, documents=None):
         """Direct pass-through to the underlying collection's add method"""
-        return self.collection.add(
+        result = self.collection.add(
             ids=ids,
             embeddings=embeddings,
             metadatas=metadatas,
             documents=documents
         )
+        self._indexes.record(ids, metadatas if metadatas is not None else [{} for _ in ids])
+        _notify_write(self.name, "upsert", ids, embeddings, metadatas)
+        return result
         
     def update(self, ids, embeddings=None, metadatas=None, documents=None):
         """Direct pass-through to the underlying collection's update method"""
-        return self.collection.update(
+        result = self.collection.update(
             ids=ids,
             embeddings=embeddings,
             metadatas=metadatas,
             documents=documents
         )
+        if metadatas is not None:
+            self._indexes.record(ids, metadatas)
+        if embeddings is not None:
+            _notify_write(self.name, "upsert", ids, embeddings, metadatas)
+        return result
         
     def upsert(self, ids, embeddings, metadatas=None, documents=None):
         """Direct pass-through to the underlying collection's upsert method"""
-        return self.collection.upsert(
+        result = self.collection.upsert(
             ids=ids,
             embeddings=embeddings,
             metadatas=metadatas,
             documents=documents
         )
+        self._indexes.record(ids, metadatas)
+        _notify_write(self.name, "upsert", ids, embeddings, metadatas)
+        return result
         
     def delete(self, ids):
         """Direct pass-through to the underlying collection's delete method"""
-        return self.collection.delete(ids=ids)
+        result = self.collection.delete(ids=ids)
+        self._indexes.forget(ids)
+        _notify_write(self.name, "delete", ids)
+        return result
+    
+    @staticmethod
+    def _to_documents(results) -> List[Dict[str, Any]]:
+        """Flatten a get() result into {"id": ..., **metadata} documents"""
+        if not results or not results.get("ids"):
+            return []
+        metadatas = results.get("metadatas") or [None] * len(results["ids"])
+        return [{"id": doc_id, **(metadata or {})} for doc_id, metadata in zip(results["ids"], metadatas)]
+    
+    @staticmethod
+    def _matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+        return all(document.get(k) == v for k, v in query.items())
+    
+    @staticmethod
+    def _to_where(query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Translate an equality query into a Chroma where filter, if every predicate can be pushed down"""
+        if not query or not all(_is_scalar(v) for v in query.values()) or "id" in query:
+            return None
+        clauses = [{k: v} for k, v in query.items()]
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+    
+    def _scan(self, include: List[str]) -> Iterator[Dict[str, Any]]:
+        """Page through every document in the collection"""
+        offset = 0
+        while True:
+            page = self.collection.get(include=include, limit=SCAN_PAGE_SIZE, offset=offset)
+            documents = self._to_documents(page)
+            if not documents:
+                return
+            yield from documents
+            offset += len(documents)
+    
+    def _indexed_ids(self, field: str, value: Any) -> List[str]:
+        """Look up ids by a hot metadata field, building its in-process index on first use"""
+        with self._indexes.lock:
+            index = self._indexes.fields[field]
+            if not index.ready:
+                for document in self._scan(["metadatas"]):
+                    index.set(document["id"], document)
+                index.ready = True
+                logger.debug(f"Built {field} index for collection {getattr(self.collection, 'name', '')}")
+            return sorted(index.by_value.get(value, ()))
+    
+    def _select(self, query: Optional[Dict[str, Any]], skip: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Find documents matching an equality query without scanning the collection when possible.
+
+        Lookups by id use `ids=`; lookups on an indexed field go through the in-process
+        index; other scalar predicates become a Chroma `where` filter. Only queries that
+        can't be expressed that way fall back to a paged scan.
+        """
+        query = query or {}
+        if not query:
+            return self._to_documents(self.collection.get(include=["metadatas"], limit=limit, offset=skip or None))
+        
+        candidate_ids = None
+        if _is_scalar(query.get("id")):
+            candidate_ids = [query["id"]]
+        else:
+            field = next((f for f in INDEXED_FIELDS if f in query and _is_scalar(query[f])), None)
+            if field is not None:
+                candidate_ids = self._indexed_ids(field, query[field])
+        
+        if candidate_ids is not None:
+            if not candidate_ids:
+                return []
+            # Re-check every predicate on the fetched rows
+            documents = [
+                document for document in self._to_documents(self.collection.get(ids=candidate_ids, include=["metadatas"]))
+                if self._matches(document, query)
+            ]
+            return documents[skip:] if limit is None else documents[skip:skip + limit]
+        
+        where = self._to_where(query)
+        if where is not None:
+            return self._to_documents(self.collection.get(where=where, include=["metadatas"], limit=limit, offset=skip or None))
+        
+        documents = []
+        matched = 0
+        for document in self._scan(["metadatas"]):
+            if self._matches(document, query):
+                matched += 1
+                if matched > skip:
+                    documents.append(document)
+                    if limit is not None and len(documents) >= limit:
+                        break
+        return documents
     
     def find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Find a single document by query"""
-        # ChromaDB doesn't have direct query by metadata fields, so we get all and filter
-        results = self.collection.get(include=["metadatas"])
-        
-        if results and "metadatas" in results and results["metadatas"]:
-            for i, metadata in enumerate(results["metadatas"]):
-                # Check if all query criteria match
-                if all(metadata.get(k) == v for k, v in query.items()):
-                    result = {
-                        "id": results["ids"][i],
-                        **metadata
-                    }
-                    return result
-        return None
+        documents = self._select(query, limit=1)
+        return documents[0] if documents else None
     
     def find(self, query: Dict[str, Any] = None, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
         """Find documents by query with pagination"""
-        results = self.collection.get(include=["metadatas", "ids"], limit=limit + skip)
-        
-        documents = []
-        if results and "metadatas" in results and results["metadatas"]:
-            for i, metadata in enumerate(results["metadatas"]):
-                if i < skip:
-                    continue
-                    
-                if query is None or all(metadata.get(k) == v for k, v in query.items()):
-                    documents.append({
-                        "id": results["ids"][i],
-                        **metadata
-                    })
-                
-                if len(documents) >= limit:
-                    break
-        
-        return documents
+        return self._select(query, skip=skip, limit=limit)
     
     def update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
         """Update a single document"""
@@ -197,16 +383,8 @@ class ChromaCollectionWrapper:
         if "id" in metadata:
             del metadata["id"]
             
-        # Get original embedding
-        original = self.collection.get(ids=[doc_id], include=["embeddings"])
-        embedding = original["embeddings"][0] if original and "embeddings" in original else [0.0] * 10
-            
-        # Upsert with updated metadata
-        self.collection.upsert(
-            ids=[doc_id],
-            metadatas=[metadata],
-            embeddings=[embedding]
-        )
+        # Metadata-only update: the stored embedding is left as it is
+        self.update(ids=[doc_id], metadatas=[metadata])
         
         return True
     
@@ -216,9 +394,52 @@ class ChromaCollectionWrapper:
         if not doc:
             return False
             
-        self.collection.delete(ids=[doc["id"]])
+        self.delete(ids=[doc["id"]])
         return True
 
+    # Async variants: dispatch the blocking calls above to the storage executor so
+    # coroutines never stall the event loop on ChromaDB I/O.
+
+    async def get_async(self, ids=None, include=None, limit=None, offset=None, where=None):
+        """Async version of get"""
+        return await run_storage(self.get, ids=ids, include=include, limit=limit, offset=offset, where=where)
+
+    async def query_async(self, query_embeddings=None, n_results=None, include=None):
+        """Async version of query"""
+        return await run_storage(self.query, query_embeddings=query_embeddings, n_results=n_results, include=include)
+
+    async def add_async(self, ids, embeddings, metadatas=None, documents=None):
+        """Async version of add"""
+        return await run_storage(self.add, ids, embeddings, metadatas=metadatas, documents=documents)
+
+    async def update_async(self, ids, embeddings=None, metadatas=None, documents=None):
+        """Async version of update"""
+        return await run_storage(self.update, ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    async def upsert_async(self, ids, embeddings, metadatas=None, documents=None):
+        """Async version of upsert"""
+        return await run_storage(self.upsert, ids, embeddings, metadatas=metadatas, documents=documents)
+
+    async def delete_async(self, ids):
+        """Async version of delete"""
+        return await run_storage(self.delete, ids)
+
+    async def find_one_async(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Async version of find_one"""
+        return await run_storage(self.find_one, query)
+
+    async def find_async(self, query: Dict[str, Any] = None, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Async version of find"""
+        return await run_storage(self.find, query, skip=skip, limit=limit)
+
+    async def update_one_async(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        """Async version of update_one"""
+        return await run_storage(self.update_one, query, update)
+
+    async def delete_one_async(self, query: Dict[str, Any]) -> bool:
+        """Async version of delete_one"""
+        return await run_storage(self.delete_one, query)
+
 
 def get_chroma_client():
     """Get the ChromaDB client instance"""
@@ -1,74 +1,131 @@
-import os
 import logging
 from typing import List, Dict, Any, Optional
-from app.utils.database import get_chroma_collection
-import chromadb
+from app.utils.database import (
+    get_chroma_collection, bump_index_generation, images_collection_name, get_profile_index_model
+)
+from app.utils.model_catalog import index_suffix
+from app.utils.executors import run_storage
+from app.utils.stat_cache import paths_exist
+from app.models.profiles_model import ModelType, SearchBackend
+from app.database.vector_index import get_vector_index, get_profile_search_backend
 
 logger = logging.getLogger(__name__)
 
 class ImageRepository:
     """Repository for managing image data and search in ChromaDB"""
     
-    def __init__(self, profile_id: str):
+    def __init__(self, profile_id: str, model_type: Optional[ModelType] = None, backend: Optional[str] = None):
         self.profile_id = profile_id
-        self.collection_name = f"{profile_id}_images"
+        # None follows the model and encoder backend the profile currently searches with
+        self.model_type = model_type
+        self.backend = backend
         self.collection = None
     
     async def initialize(self):
-        """Initialize the collection"""
+        """Initialize the collection of the repository's embedding model"""
         if not self.collection:
-            self.collection = await get_chroma_collection(self.collection_name)
+            if self.model_type is None:
+                self.model_type, self.backend = await get_profile_index_model(self.profile_id)
+            self.collection = await get_chroma_collection(
+                images_collection_name(self.profile_id, self.model_type, self.backend)
+            )
         return self.collection
     
     async def search_by_embedding(self, embedding: List[float], limit: int = 20) -> List[Dict[str, Any]]:
         """Search for images by embedding vector similarity"""
+        results = await self.search_by_embeddings([embedding], limit)
+        return results[0] if results else []
+    
+    async def search_by_embeddings(self, embeddings: List[List[float]], limit: int = 20) -> List[List[Dict[str, Any]]]:
+        """Search for images similar to each of several embeddings in one batched query,
+        using the vector search backend configured for the profile"""
         try:
             if not self.collection:
                 await self.initialize()
-                
-            results = self.collection.query(
-                query_embeddings=[embedding],
+            
+            if await get_profile_search_backend(self.profile_id) == SearchBackend.NUMPY:
+                try:
+                    return await self._search_numpy(embeddings, limit)
+                except Exception as e:
+                    logger.error(f"NumPy search failed, falling back to ChromaDB: {str(e)}")
+            
+            results = await self.collection.query_async(
+                query_embeddings=embeddings,
                 n_results=limit,
                 include=["metadatas", "distances"]
             )
             
-            search_results = []
+            batches = []
             if results and "ids" in results and results["ids"]:
-                for i, result_id in enumerate(results["ids"][0]):
-                    metadata = results["metadatas"][0][i]
-                    distance = results["distances"][0][i] if "distances" in results else 1.0
-                    
-                    # Convert distance to similarity score
-                    similarity_score = 1.0 - min(distance, 1.0)
-                    
-                    result = {
-                        "id": result_id,
-                        "metadata": metadata,
-                        "similarity_score": similarity_score,
-                        "path": metadata.get("filepath", ""),
-                        "exists": os.path.exists(metadata.get("filepath", ""))
-                    }
-                    search_results.append(result)
-            
-            # Sort by similarity score
-            search_results.sort(key=lambda x: x["similarity_score"], reverse=True)
-            return search_results
+                for query_index, query_ids in enumerate(results["ids"]):
+                    hits = [
+                        (result_id, results["metadatas"][query_index][i],
+                         results["distances"][query_index][i] if "distances" in results else 1.0)
+                        for i, result_id in enumerate(query_ids)
+                    ]
+                    batches.append(self._build_results(hits))
+            return batches
             
         except Exception as e:
             logger.error(f"Error searching by embedding: {str(e)}")
             return []
     
+    async def _search_numpy(self, embeddings: List[List[float]], limit: int) -> List[List[Dict[str, Any]]]:
+        """Exact top-k search over the profile's memory-mapped embedding matrix"""
+        index = get_vector_index(self.profile_id, index_suffix(self.model_type, self.backend))
+        matches = await run_storage(index.search, self.collection, embeddings, limit)
+        
+        # Fetch metadata for every hit in one round trip
+        hit_ids = list({image_id for query_matches in matches for image_id, _ in query_matches})
+        metadata_by_id = {}
+        if hit_ids:
+            stored = await self.collection.get_async(ids=hit_ids, include=["metadatas"])
+            metadata_by_id = dict(zip(stored["ids"], stored["metadatas"]))
+        
+        # Report cosine distance, as the ChromaDB collections do
+        return [
+            self._build_results([
+                (image_id, metadata_by_id[image_id], 1.0 - score)
+                for image_id, score in query_matches if image_id in metadata_by_id
+            ])
+            for query_matches in matches
+        ]
+    
+    @staticmethod
+    def _build_results(hits) -> List[Dict[str, Any]]:
+        """Convert (id, metadata, distance) hits into result dicts sorted by similarity.
+
+        Files are not stat-ed here; callers fill in `exists` through the stat cache.
+        """
+        search_results = []
+        for result_id, metadata, distance in hits:
+            # Convert distance to similarity score
+            similarity_score = 1.0 - min(distance, 1.0)
+            
+            result = {
+                "id": result_id,
+                "metadata": metadata,
+                "similarity_score": similarity_score,
+                "path": metadata.get("filepath", ""),
+            }
+            search_results.append(result)
+        
+        # Sort by similarity score
+        search_results.sort(key=lambda x: x["similarity_score"], reverse=True)
+        return search_results
+    
     async def add_image(self, image_id: str, metadata: Dict[str, Any], embedding: List[float]) -> bool:
         """Add or update an image in the collection"""
         try:
             if not self.collection:
                 await self.initialize()
                 
-            self.collection.upsert(
+            await self.collection.upsert_async(
                 ids=[image_id],
                 embeddings=[embedding],
                 metadatas=[metadata]
             )
+            bump_index_generation(self.profile_id, index_suffix(self.model_type, self.backend))
             return True
         except Exception as e:
             logger.error(f"Error adding image: {str(e)}")
@@ -76,24 +133,37 @@ class ImageRepository:
     
     async def get_image(self, image_id: str) -> Optional[Dict[str, Any]]:
         """Get image by ID"""
+        return (await self.get_images([image_id])).get(image_id)
+    
+    async def get_images(self, image_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get several images by ID with one collection read, checking their files concurrently.
+
+        Returns a map from ID to image details; unknown IDs are left out.
+        """
         try:
             if not self.collection:
                 await self.initialize()
-                
-            results = self.collection.get(
-                ids=[image_id],
+            
+            unique_ids = list(dict.fromkeys(image_ids))
+            if not unique_ids:
+                return {}
+            results = await self.collection.get_async(
+                ids=unique_ids,
                 include=["metadatas"]
             )
             
-            if results and "metadatas" in results and results["metadatas"]:
-                metadata = results["metadatas"][0]
-                return {
+            found = list(zip(results.get("ids") or [], results.get("metadatas") or []))
+            paths = [(metadata or {}).get("filepath", "") for _, metadata in found]
+            exists, _ = await paths_exist(paths, defer=False)
+            return {
+                image_id: {
                     "id": image_id,
                     "metadata": metadata,
-                    "path": metadata.get("filepath", ""),
-                    "exists": os.path.exists(metadata.get("filepath", ""))
+                    "path": path,
+                    "exists": path_exists,
                 }
-            return None
+                for (image_id, metadata), path, path_exists in zip(found, paths, exists)
+            }
         except Exception as e:
-            logger.error(f"Error getting image: {str(e)}")
-            return None
+            logger.error(f"Error getting images: {str(e)}")
+            return {}
@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Iterable, NamedTuple, Optional, Tuple
+
+from app.database.chroma_client import DB_DIR
+
+logger = logging.getLogger(__name__)
+
+# Per-profile manifests live next to the ChromaDB store
+MANIFEST_DIR = os.path.join(DB_DIR, "manifests")
+os.makedirs(MANIFEST_DIR, exist_ok=True)
+
+class ManifestEntry(NamedTuple):
+    """Filesystem state of an indexed image at the time it was embedded"""
+    path: str
+    size: int
+    mtime_ns: int
+    inode: int
+    content_hash: Optional[str]
+    image_id: str
+
+class ManifestRepository:
+    """Persistent on-disk manifest of indexed files for a profile, keyed by path.
+
+    Each embedding model's index has its own manifest, named by the model's index suffix.
+
+    Backed by SQLite so a rescan can diff filesystem stats against it without
+    touching the vector store. Methods are blocking; call them through the storage
+    executor from async code.
+    """
+
+    def __init__(self, profile_id: str, suffix: str = ""):
+        self.profile_id = profile_id
+        self.suffix = suffix
+        self.db_path = os.path.join(MANIFEST_DIR, f"{profile_id}{suffix}.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS manifest (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                content_hash TEXT,
+                image_id TEXT NOT NULL
+            )
+            """
+        )
+        # Content fingerprints map moved or duplicated files onto an existing embedding
+        self._conn.execute("CREATE INDEX IF NOT EXISTS manifest_content_hash ON manifest (content_hash)")
+        self._conn.commit()
+
+    def load(self) -> Dict[str, ManifestEntry]:
+        """Load the whole manifest as a path -> entry mapping"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns, inode, content_hash, image_id FROM manifest"
+            ).fetchall()
+        return {row[0]: ManifestEntry(*row) for row in rows}
+
+    def get_entries(self, paths: Iterable[str]) -> Dict[str, ManifestEntry]:
+        """Look up manifest entries for specific paths"""
+        entries: Dict[str, ManifestEntry] = {}
+        with self._lock:
+            for path in paths:
+                row = self._conn.execute(
+                    "SELECT path, size, mtime_ns, inode, content_hash, image_id FROM manifest WHERE path = ?",
+                    (path,)
+                ).fetchone()
+                if row:
+                    entries[row[0]] = ManifestEntry(*row)
+        return entries
+
+    def entries_under(self, folder: str) -> List[ManifestEntry]:
+        """Get every entry inside a folder, using a primary-key range scan on the path prefix"""
+        prefix = folder.rstrip(os.sep) + os.sep
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime_ns, inode, content_hash, image_id FROM manifest "
+                "WHERE path >= ? AND path < ?",
+                (prefix, upper)
+            ).fetchall()
+        return [ManifestEntry(*row) for row in rows]
+
+    def find_by_hashes(self, content_hashes: Iterable[str]) -> Dict[str, ManifestEntry]:
+        """Find one indexed entry per content fingerprint"""
+        entries: Dict[str, ManifestEntry] = {}
+        with self._lock:
+            for content_hash in content_hashes:
+                row = self._conn.execute(
+                    "SELECT path, size, mtime_ns, inode, content_hash, image_id FROM manifest "
+                    "WHERE content_hash = ? LIMIT 1",
+                    (content_hash,)
+                ).fetchone()
+                if row:
+                    entries[content_hash] = ManifestEntry(*row)
+        return entries
+
+    def duplicate_groups(self, limit: int = 100, offset: int = 0) -> List[List[ManifestEntry]]:
+        """Get groups of files sharing a content fingerprint, largest wasted space first"""
+        with self._lock:
+            hashes = self._conn.execute(
+                "SELECT content_hash FROM manifest WHERE content_hash IS NOT NULL "
+                "GROUP BY content_hash HAVING COUNT(*) > 1 "
+                "ORDER BY (COUNT(*) - 1) * MAX(size) DESC, content_hash LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+            groups = []
+            for (content_hash,) in hashes:
+                rows = self._conn.execute(
+                    "SELECT path, size, mtime_ns, inode, content_hash, image_id FROM manifest "
+                    "WHERE content_hash = ? ORDER BY path",
+                    (content_hash,)
+                ).fetchall()
+                groups.append([ManifestEntry(*row) for row in rows])
+        return groups
+
+    def count_duplicate_groups(self) -> int:
+        """Number of content fingerprints shared by more than one file"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM (SELECT content_hash FROM manifest WHERE content_hash IS NOT NULL "
+                "GROUP BY content_hash HAVING COUNT(*) > 1)"
+            ).fetchone()[0]
+
+    def count(self) -> int:
+        """Number of files tracked in the manifest"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM manifest").fetchone()[0]
+
+    def upsert_entries(self, entries: Iterable[ManifestEntry]) -> None:
+        """Insert or replace manifest entries in a single transaction"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO manifest (path, size, mtime_ns, inode, content_hash, image_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [tuple(entry) for entry in entries]
+            )
+
+    def delete_paths(self, paths: Iterable[str]) -> None:
+        """Remove entries for the given paths in a single transaction"""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM manifest WHERE path = ?", [(path,) for path in paths])
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+# Open manifests are cached so each profile and model index keeps a single connection
+_manifests: Dict[Tuple[str, str], ManifestRepository] = {}
+_manifests_lock = threading.Lock()
+
+def get_manifest(profile_id: str, suffix: str = "") -> ManifestRepository:
+    """Get the manifest repository for a profile's index of one model"""
+    with _manifests_lock:
+        if (profile_id, suffix) not in _manifests:
+            _manifests[(profile_id, suffix)] = ManifestRepository(profile_id, suffix)
+            logger.info(f"Opened file manifest {profile_id}{suffix}")
+        return _manifests[(profile_id, suffix)]
+
+def close_manifests() -> None:
+    """Close every open manifest"""
+    with _manifests_lock:
+        for manifest in _manifests.values():
+            manifest.close()
+        _manifests.clear()
@@ -0,0 +1,511 @@
+import os
+import json
+import sqlite3
+import uuid
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.database.chroma_client import DB_DIR
+
+logger = logging.getLogger(__name__)
+
+# Profiles, settings, albums, search sessions and chats live in one SQLite file
+METADATA_DB_PATH = os.path.join(DB_DIR, "metadata.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    avatar TEXT,
+    is_default INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    last_accessed TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS settings (
+    profile_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS albums (
+    id TEXT PRIMARY KEY,
+    profile_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    description TEXT,
+    type TEXT NOT NULL,
+    search_query TEXT,
+    cover_image_id TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS albums_profile_updated ON albums (profile_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS album_images (
+    album_id TEXT NOT NULL REFERENCES albums (id) ON DELETE CASCADE,
+    image_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    added_at TEXT NOT NULL,
+    PRIMARY KEY (album_id, image_id)
+);
+CREATE INDEX IF NOT EXISTS album_images_position ON album_images (album_id, position);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    profile_id TEXT NOT NULL,
+    name TEXT,
+    queries TEXT NOT NULL,
+    result_ids TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_profile_updated ON sessions (profile_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS chats (
+    id TEXT PRIMARY KEY,
+    profile_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chats_profile_updated ON chats (profile_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS chat_messages (
+    chat_id TEXT NOT NULL REFERENCES chats (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (chat_id, seq)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Chat messages returned per page when the caller doesn't ask for a size
+CHAT_PAGE_SIZE = 50
+
+# Columns listings may be sorted by; anything else falls back to updated_at
+SORTABLE_COLUMNS = {"updated_at", "created_at", "name"}
+
+def _timestamp(value: Any) -> str:
+    """Store datetimes as ISO strings"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value or datetime.now().isoformat()
+
+def _enum_value(value: Any) -> Any:
+    """Store enum members by value"""
+    return getattr(value, "value", value)
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value)} is not JSON serializable")
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default)
+
+def _order_clause(sort_by: str, sort_order: str) -> str:
+    column = sort_by if sort_by in SORTABLE_COLUMNS else "updated_at"
+    direction = "ASC" if sort_order.lower() == "asc" else "DESC"
+    return f"ORDER BY {column} {direction}, id"
+
+class MetadataStore:
+    """SQLite store for the application's non-vector entities.
+
+    Every lookup is an indexed point or range query with bound parameters, and every
+    multi-row write runs in one transaction. Methods are blocking; call them through
+    the storage executor from async code.
+    """
+
+    def __init__(self, db_path: str = METADATA_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+    # Profiles
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Get every profile, oldest first"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM profiles ORDER BY created_at, id").fetchall()
+        return [{**dict(row), "is_default": bool(row["is_default"])} for row in rows]
+
+    def get_profile(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Get a profile by ID"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM profiles WHERE id = ?", (profile_id,)).fetchone()
+        return {**dict(row), "is_default": bool(row["is_default"])} if row else None
+
+    def save_profile(self, profile: Dict[str, Any]) -> None:
+        """Insert or replace a profile"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profiles (id, name, avatar, is_default, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (profile["id"], profile["name"], profile.get("avatar"), int(bool(profile.get("is_default"))),
+                 _timestamp(profile.get("created_at")), _timestamp(profile.get("last_accessed")))
+            )
+
+    def delete_profile(self, profile_id: str) -> bool:
+        """Delete a profile together with its settings"""
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM profiles WHERE id = ?", (profile_id,)).rowcount
+            self._conn.execute("DELETE FROM settings WHERE profile_id = ?", (profile_id,))
+        return deleted > 0
+
+    def set_default_profile(self, profile_id: str) -> None:
+        """Make one profile the default and clear the flag on every other"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE profiles SET is_default = (id = ?)", (profile_id,))
+
+    # Settings
+
+    def get_settings(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Get a profile's stored settings document"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM settings WHERE profile_id = ?", (profile_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def save_settings(self, profile_id: str, data: Dict[str, Any]) -> None:
+        """Replace a profile's settings document"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO settings (profile_id, data, updated_at) VALUES (?, ?, ?)",
+                (profile_id, _dumps(data), datetime.now().isoformat())
+            )
+
+    def update_settings(self, profile_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge fields into a profile's settings document atomically"""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT data FROM settings WHERE profile_id = ?", (profile_id,)).fetchone()
+            data = {**(json.loads(row["data"]) if row else {}), **fields}
+            self._conn.execute(
+                "INSERT OR REPLACE INTO settings (profile_id, data, updated_at) VALUES (?, ?, ?)",
+                (profile_id, _dumps(data), datetime.now().isoformat())
+            )
+        return data
+
+    # Albums
+
+    def _album_images(self, album_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        images: Dict[str, List[Dict[str, Any]]] = {album_id: [] for album_id in album_ids}
+        if not album_ids:
+            return images
+        placeholders = ", ".join("?" for _ in album_ids)
+        rows = self._conn.execute(
+            f"SELECT album_id, image_id, position, added_at FROM album_images "
+            f"WHERE album_id IN ({placeholders}) ORDER BY album_id, position",
+            album_ids
+        ).fetchall()
+        for row in rows:
+            images[row["album_id"]].append({"image_id": row["image_id"], "order": row["position"], "added_at": row["added_at"]})
+        return images
+
+    def list_albums(
+        self,
+        profile_id: str,
+        skip: int = 0,
+        limit: int = 50,
+        search_term: Optional[str] = None,
+        album_type: Optional[str] = None,
+        sort_by: str = "updated_at",
+        sort_order: str = "desc"
+    ) -> List[Dict[str, Any]]:
+        """List a profile's albums with their images, filtered, sorted and paginated"""
+        clauses, params = ["profile_id = ?"], [profile_id]
+        if album_type:
+            clauses.append("type = ?")
+            params.append(album_type)
+        if search_term:
+            clauses.append("(name LIKE ? OR description LIKE ? OR search_query LIKE ?)")
+            params.extend([f"%{search_term}%"] * 3)
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM albums WHERE {' AND '.join(clauses)} {_order_clause(sort_by, sort_order)} LIMIT ? OFFSET ?",
+                (*params, limit, skip)
+            ).fetchall()
+            images = self._album_images([row["id"] for row in rows])
+        return [{**dict(row), "images": images[row["id"]]} for row in rows]
+
+    def get_album(self, profile_id: str, album_id: str) -> Optional[Dict[str, Any]]:
+        """Get an album and its images"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM albums WHERE id = ? AND profile_id = ?", (album_id, profile_id)
+            ).fetchone()
+            if not row:
+                return None
+            return {**dict(row), "images": self._album_images([album_id])[album_id]}
+
+    def save_album(self, album: Dict[str, Any]) -> None:
+        """Insert or replace an album and its image list in one transaction"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO albums (id, profile_id, name, description, type, search_query, cover_image_id, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET name = excluded.name, description = excluded.description, "
+                "type = excluded.type, search_query = excluded.search_query, "
+                "cover_image_id = excluded.cover_image_id, updated_at = excluded.updated_at",
+                (album["id"], album["profile_id"], album["name"], album.get("description"), _enum_value(album.get("type") or "manual"),
+                 album.get("search_query"), album.get("cover_image_id"),
+                 _timestamp(album.get("created_at")), _timestamp(album.get("updated_at")))
+            )
+            if "images" in album:
+                self._conn.execute("DELETE FROM album_images WHERE album_id = ?", (album["id"],))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO album_images (album_id, image_id, position, added_at) VALUES (?, ?, ?, ?)",
+                    [(album["id"], image["image_id"], image.get("order", 0), _timestamp(image.get("added_at")))
+                     for image in album["images"]]
+                )
+
+    def delete_album(self, profile_id: str, album_id: str) -> bool:
+        """Delete an album; its image rows go with it"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM albums WHERE id = ? AND profile_id = ?", (album_id, profile_id)
+            ).rowcount > 0
+
+    # Search sessions
+
+    @staticmethod
+    def _session_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {**dict(row), "queries": json.loads(row["queries"]), "result_ids": json.loads(row["result_ids"])}
+
+    def list_sessions(
+        self,
+        profile_id: str,
+        skip: int = 0,
+        limit: int = 50,
+        search_term: Optional[str] = None,
+        sort_by: str = "updated_at",
+        sort_order: str = "desc"
+    ) -> List[Dict[str, Any]]:
+        """List a profile's search sessions, filtered, sorted and paginated"""
+        clauses, params = ["profile_id = ?"], [profile_id]
+        if search_term:
+            clauses.append("(name LIKE ? OR queries LIKE ?)")
+            params.extend([f"%{search_term}%"] * 2)
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM sessions WHERE {' AND '.join(clauses)} {_order_clause(sort_by, sort_order)} LIMIT ? OFFSET ?",
+                (*params, limit, skip)
+            ).fetchall()
+        return [self._session_from_row(row) for row in rows]
+
+    def get_session(self, profile_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a search session by ID"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM sessions WHERE id = ? AND profile_id = ?", (session_id, profile_id)
+            ).fetchone()
+        return self._session_from_row(row) if row else None
+
+    def get_latest_session(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Get a profile's most recently updated search session"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM sessions WHERE profile_id = ? ORDER BY updated_at DESC LIMIT 1", (profile_id,)
+            ).fetchone()
+        return self._session_from_row(row) if row else None
+
+    def save_session(self, session: Dict[str, Any]) -> None:
+        """Insert or replace a search session"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, profile_id, name, queries, result_ids, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session["id"], session["profile_id"], session.get("name"), _dumps(session.get("queries", [])),
+                 _dumps(session.get("result_ids", [])), _timestamp(session.get("created_at")),
+                 _timestamp(session.get("updated_at")))
+            )
+
+    def delete_session(self, profile_id: str, session_id: str) -> bool:
+        """Delete a search session"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM sessions WHERE id = ? AND profile_id = ?", (session_id, profile_id)
+            ).rowcount > 0
+
+    # Chats
+
+    def create_chat(self, chat: Dict[str, Any]) -> None:
+        """Insert a new chat, with any initial messages, in one transaction"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO chats (id, profile_id, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (chat["id"], chat["profile_id"], chat["title"],
+                 _timestamp(chat.get("created_at")), _timestamp(chat.get("updated_at")))
+            )
+            for message in chat.get("messages", []):
+                self._insert_chat_message(chat["id"], message)
+
+    def get_chat(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """Get a chat's header row (title, timestamps, message count) without its messages"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM chats WHERE id = ?", (chat_id,)).fetchone()
+        return dict(row) if row else None
+
+    def _insert_chat_message(self, chat_id: str, message: Dict[str, Any]) -> Optional[int]:
+        # The chat row carries the message count, so the next sequence number is one keyed read
+        row = self._conn.execute("SELECT message_count FROM chats WHERE id = ?", (chat_id,)).fetchone()
+        if not row:
+            return None
+        seq = row["message_count"] + 1
+        self._conn.execute(
+            "INSERT INTO chat_messages (chat_id, seq, id, type, content, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+            (chat_id, seq, message.get("id") or str(uuid.uuid4()), message.get("type") or "message",
+             _dumps(message.get("content", {})),
+             _timestamp(message.get("timestamp")))
+        )
+        self._conn.execute(
+            "UPDATE chats SET message_count = ?, updated_at = ? WHERE id = ?",
+            (seq, datetime.now().isoformat(), chat_id)
+        )
+        return seq
+
+    def append_chat_message(self, chat_id: str, message: Dict[str, Any]) -> Optional[int]:
+        """Append one message to a chat, returning its sequence number (None if the chat doesn't exist)"""
+        with self._lock, self._conn:
+            return self._insert_chat_message(chat_id, message)
+
+    def get_chat_messages(
+        self,
+        chat_id: str,
+        limit: int = CHAT_PAGE_SIZE,
+        after: Optional[int] = None,
+        before: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Read one page of a chat's messages in sequence order.
+
+        `after` pages forward from a sequence number; `before` pages backward from one.
+        With neither, the newest page is returned. Either way the page is a range scan
+        on the (chat_id, seq) key.
+        """
+        if after is not None:
+            query, params = "SELECT * FROM chat_messages WHERE chat_id = ? AND seq > ? ORDER BY seq LIMIT ?", (chat_id, after, limit)
+        else:
+            query = "SELECT * FROM chat_messages WHERE chat_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?"
+            params = (chat_id, before if before is not None else 2 ** 62, limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        messages = [{**dict(row), "content": json.loads(row["content"])} for row in rows]
+        if after is None:
+            messages.reverse()
+        return messages
+
+    # Bookkeeping
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, value))
+
+def _read_chroma_metadatas(client, collection_name: str) -> List[Dict[str, Any]]:
+    """Read every metadata row of an existing ChromaDB collection, or none if it doesn't exist.
+
+    Rows without an "id" field get their ChromaDB id.
+    """
+    try:
+        collection = client.get_collection(collection_name)
+    except Exception:
+        return []
+    result = collection.get(include=["metadatas"])
+    return [
+        {"id": row_id, **metadata}
+        for row_id, metadata in zip(result.get("ids") or [], result.get("metadatas") or [])
+        if metadata
+    ]
+
+def migrate_from_chroma(store: MetadataStore, client) -> None:
+    """Copy profiles, settings and chats kept in ChromaDB by earlier versions into the store.
+
+    Runs once per store; the source collections are left in place.
+    """
+    if store.get_meta("chroma_migrated"):
+        return
+
+    # Malformed rows are logged and skipped, so one bad document can't block every startup
+    profiles = []
+    for profile in _read_chroma_metadatas(client, "profiles"):
+        try:
+            store.save_profile(profile)
+            profiles.append(profile)
+        except Exception as e:
+            logger.warning(f"Skipping profile {profile.get('id')} during migration: {str(e)}")
+
+    for settings in _read_chroma_metadatas(client, "settings"):
+        # Settings documents were stored under the id "settings_<profile id>"
+        profile_id = settings.get("profile_id") or settings["id"].removeprefix("settings_")
+        try:
+            data = {key: value for key, value in settings.items() if key not in ("profile_id", "id")}
+            if isinstance(data.get("custom_theme_colors"), str):
+                try:
+                    data["custom_theme_colors"] = json.loads(data["custom_theme_colors"])
+                except (ValueError, TypeError):
+                    data["custom_theme_colors"] = {}
+            store.save_settings(profile_id, data)
+        except Exception as e:
+            logger.warning(f"Skipping settings of profile {profile_id} during migration: {str(e)}")
+
+    chats = 0
+    for profile in profiles:
+        for chat in _read_chroma_metadatas(client, f"{profile['id']}_chats"):
+            try:
+                messages = json.loads(chat.get("messages") or "[]")
+            except (ValueError, TypeError):
+                messages = []
+            try:
+                if store.get_chat(chat["id"]) is None:
+                    store.create_chat({**chat, "profile_id": profile["id"], "messages": messages})
+                    chats += 1
+            except Exception as e:
+                logger.warning(f"Skipping chat {chat.get('id')} during migration: {str(e)}")
+
+    store.set_meta("chroma_migrated", datetime.now().isoformat())
+    logger.info(f"Migrated {len(profiles)} profiles and {chats} chats from ChromaDB to the metadata store")
+
+_store: Optional[MetadataStore] = None
+_store_lock = threading.Lock()
+
+def get_metadata_store() -> MetadataStore:
+    """Get the shared metadata store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MetadataStore()
+            logger.info(f"Opened metadata store at {METADATA_DB_PATH}")
+        return _store
+
+def close_metadata_store() -> None:
+    """Close the shared metadata store"""
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
@@ -0,0 +1,377 @@
+import os
+import glob
+import json
+import time
+import hashlib
+import logging
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.database.chroma_client import DB_DIR, add_write_listener
+from app.models.profiles_model import SearchBackend
+from app.database.metadata_store import get_metadata_store
+from app.utils.executors import run_storage
+
+logger = logging.getLogger(__name__)
+
+# Memory-mapped embedding matrices live next to the ChromaDB store
+VECTOR_INDEX_DIR = os.path.join(DB_DIR, "vector_index")
+os.makedirs(VECTOR_INDEX_DIR, exist_ok=True)
+
+# Rows read from ChromaDB per page when (re)building a matrix
+REBUILD_PAGE_SIZE = 5000
+
+# Upserted plus deleted rows, as a fraction of the matrix, kept in memory before they are
+# compacted into a new matrix file; small indexes compact only past COMPACT_MIN_ROWS
+COMPACT_FRACTION = 0.1
+COMPACT_MIN_ROWS = 1000
+
+def search_top_k(
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    exclude: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact top-k cosine search of L2-normalized queries against an L2-normalized matrix.
+
+    One (Q, D) x (D, N) matrix multiply scores every row; `argpartition` selects the k
+    best per query in linear time and only those k are sorted. Rows set in the boolean
+    `exclude` mask score -inf. Returns (Q, k) arrays of row indices and scores, best first.
+    """
+    k = min(k, matrix.shape[0])
+    if k <= 0:
+        return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+
+    scores = queries @ matrix.T
+    if exclude is not None:
+        scores[:, exclude] = -np.inf
+    if k < matrix.shape[0]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(matrix.shape[0]), (len(queries), matrix.shape[0]))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row, leaving all-zero rows untouched"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+def _pair_hash(image_id: str, last_indexed: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{image_id}\0{last_indexed}".encode(), digest_size=16).digest(), "big")
+
+def _digest(pair_hashes: Dict[str, int]) -> str:
+    """Order-independent digest of (id, last_indexed) pairs, so writes can update it one by one"""
+    return format(sum(pair_hashes.values()) % (1 << 128), "032x")
+
+class NumpyVectorIndex:
+    """Brute-force vector search over a profile's image embeddings for one model.
+
+    The embeddings are copied out of ChromaDB into a contiguous float32 `.npy` matrix
+    plus an id array and memory-mapped for search. Writes to the collection are applied
+    as they happen: upserted vectors go to an in-memory delta searched alongside the
+    matrix and replaced or deleted rows are masked out. Once the delta outgrows
+    `COMPACT_FRACTION` of the matrix, both are compacted into a new matrix file without
+    re-reading ChromaDB. Each matrix is written under a new version, so searches still
+    holding the previous map are never affected by the swap.
+
+    Across restarts the matrix on disk is reused only if a digest of its (id,
+    last_indexed) pairs still matches ChromaDB. Methods are blocking; call them through
+    the storage executor from async code.
+    """
+
+    def __init__(self, profile_id: str, suffix: str = ""):
+        self.profile_id = profile_id
+        self.suffix = suffix
+        # Same name as `images_collection_name` gives the model's collection
+        self.collection_name = f"{profile_id}_images{suffix}"
+        self.prefix = os.path.join(VECTOR_INDEX_DIR, f"{profile_id}{suffix}")
+        self.info_path = self.prefix + ".json"
+        self.version = 0
+        self.matrix: Optional[np.ndarray] = None
+        self.ids: Optional[np.ndarray] = None
+        self.rebuilds = 0
+        self.compactions = 0
+        self._rows: Dict[str, int] = {}
+        self._live: Optional[np.ndarray] = None
+        self._dead = 0
+        self._delta: Dict[str, np.ndarray] = {}
+        self._delta_arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._pair_hashes: Dict[str, int] = {}
+        self._stale = False
+        self._lock = threading.Lock()
+        add_write_listener(self.collection_name, self._on_write)
+
+    def _paths(self, version: int) -> Tuple[str, str]:
+        return f"{self.prefix}.{version}.vectors.npy", f"{self.prefix}.{version}.ids.npy"
+
+    def _read_collection(self, collection, include: List[str]):
+        """Page through every stored image, yielding (ids, embeddings or None, metadatas)"""
+        offset = 0
+        while True:
+            page = collection.get(include=include, limit=REBUILD_PAGE_SIZE, offset=offset)
+            ids = page.get("ids") or []
+            if not ids:
+                return
+            embeddings = page.get("embeddings") if "embeddings" in include else None
+            yield ids, embeddings, page.get("metadatas") or [{}] * len(ids)
+            offset += len(ids)
+
+    def _stored_info(self) -> Dict[str, Any]:
+        try:
+            with open(self.info_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _set_base(self, version: int) -> None:
+        """Map a written matrix version and reset the delta on top of it"""
+        matrix_path, ids_path = self._paths(version)
+        self.version = version
+        self.matrix = np.load(matrix_path, mmap_mode="r")
+        self.ids = np.load(ids_path, allow_pickle=False)
+        self._rows = {str(image_id): row for row, image_id in enumerate(self.ids)}
+        self._live = np.ones(len(self.ids), dtype=bool)
+        self._dead = 0
+        self._delta = {}
+        self._delta_arrays = None
+        self._stale = False
+
+    def _write(self, matrix: np.ndarray, ids: List[str]) -> None:
+        """Write a matrix under the next version, switch to it and remove older versions"""
+        version = max(self.version, self._stored_info().get("version", 0)) + 1
+        for path, array in zip(self._paths(version), (matrix, np.asarray(ids, dtype=str))):
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(path + ".tmp", path)
+        with open(self.info_path + ".tmp", "w") as f:
+            json.dump({"version": version, "digest": _digest(self._pair_hashes), "count": len(ids)}, f)
+        os.replace(self.info_path + ".tmp", self.info_path)
+        self._set_base(version)
+        self._remove_old_versions()
+
+    def _remove_old_versions(self) -> None:
+        current = set(self._paths(self.version))
+        # Includes unversioned files written before matrices were versioned
+        for path in glob.glob(glob.escape(self.prefix) + ".*npy"):
+            if path not in current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Still mapped by a search on Windows; the next write retries
+                    pass
+
+    def rebuild(self, collection) -> None:
+        """Copy every embedding out of ChromaDB into a fresh memory-mapped matrix"""
+        start = time.perf_counter()
+        ids: List[str] = []
+        blocks: List[np.ndarray] = []
+        self._pair_hashes = {}
+        for page_ids, embeddings, metadatas in self._read_collection(collection, ["embeddings", "metadatas"]):
+            ids.extend(page_ids)
+            blocks.append(np.asarray(embeddings, dtype=np.float32))
+            for image_id, metadata in zip(page_ids, metadatas):
+                self._pair_hashes[image_id] = _pair_hash(image_id, str((metadata or {}).get("last_indexed", "")))
+
+        matrix = _normalize_rows(np.concatenate(blocks)) if blocks else np.empty((0, 0), dtype=np.float32)
+        self._write(matrix, ids)
+        self.rebuilds += 1
+        logger.info(
+            f"Built vector matrix for profile {self.profile_id}: {len(ids)} embeddings "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+    def _compact(self) -> None:
+        """Fold the delta and deletions into a new matrix without reading ChromaDB"""
+        start = time.perf_counter()
+        live_rows = np.flatnonzero(self._live)
+        blocks = [np.asarray(self.matrix[live_rows], dtype=np.float32)] if len(live_rows) else []
+        ids = [str(image_id) for image_id in self.ids[live_rows]]
+        if self._delta:
+            blocks.append(np.stack(list(self._delta.values())))
+            ids.extend(self._delta)
+        matrix = np.concatenate(blocks) if blocks else np.empty((0, 0), dtype=np.float32)
+        self._write(matrix, ids)
+        self.compactions += 1
+        logger.info(f"Compacted vector matrix for profile {self.profile_id}: {len(ids)} embeddings in {time.perf_counter() - start:.2f}s")
+
+    def _on_write(self, event: str, ids: List[str], embeddings: Any, metadatas: Any) -> None:
+        """Apply a write to the collection; runs on the writing thread"""
+        with self._lock:
+            # Not loaded yet: the first sync checks the stored matrix against ChromaDB
+            if self.matrix is None:
+                return
+            if event == "reset":
+                self._stale = True
+                return
+            
+            vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32)) if event == "upsert" else None
+            for i, image_id in enumerate(ids):
+                row = self._rows.get(image_id)
+                if row is not None and self._live[row]:
+                    self._live[row] = False
+                    self._dead += 1
+                if vectors is not None:
+                    self._delta[image_id] = vectors[i]
+                    last_indexed = str(((metadatas[i] if metadatas else None) or {}).get("last_indexed", ""))
+                    self._pair_hashes[image_id] = _pair_hash(image_id, last_indexed)
+                else:
+                    self._delta.pop(image_id, None)
+                    self._pair_hashes.pop(image_id, None)
+            self._delta_arrays = None
+            
+            if len(self._delta) + self._dead > max(COMPACT_MIN_ROWS, COMPACT_FRACTION * len(self.ids)):
+                self._compact()
+
+    def sync(self, collection) -> None:
+        """Load or build the matrix on first use, or rebuild it after the collection was dropped"""
+        with self._lock:
+            if self.matrix is not None and not self._stale:
+                return
+
+            # First use in this process: trust the file on disk only if ChromaDB still matches it
+            info = self._stored_info()
+            if self.matrix is None and info.get("version") and all(os.path.exists(path) for path in self._paths(info["version"])):
+                self._pair_hashes = {
+                    image_id: _pair_hash(image_id, str((metadata or {}).get("last_indexed", "")))
+                    for page_ids, _, metadatas in self._read_collection(collection, ["metadatas"])
+                    for image_id, metadata in zip(page_ids, metadatas)
+                }
+                if _digest(self._pair_hashes) == info.get("digest"):
+                    self._set_base(info["version"])
+                    logger.info(f"Loaded vector matrix for profile {self.profile_id} ({len(self.ids)} embeddings)")
+                    return
+
+            self.rebuild(collection)
+
+    def _snapshot(self) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], np.ndarray, np.ndarray]:
+        """The matrix, ids, dead-row mask and delta arrays as of now; call under the lock"""
+        if self._delta_arrays is None:
+            delta_ids = np.asarray(list(self._delta), dtype=str)
+            delta_matrix = np.stack(list(self._delta.values())) if self._delta else np.empty((0, 0), dtype=np.float32)
+            self._delta_arrays = (delta_ids, delta_matrix)
+        dead = ~self._live if self._dead else None
+        return self.matrix, self.ids, dead, *self._delta_arrays
+
+    def search(self, collection, queries: Sequence[Sequence[float]], k: int) -> List[List[Tuple[str, float]]]:
+        """Return the k most similar (image id, cosine similarity) pairs for each query"""
+        self.sync(collection)
+        with self._lock:
+            matrix, ids, dead, delta_ids, delta_matrix = self._snapshot()
+        queries = _normalize_rows(np.asarray(queries, dtype=np.float32))
+
+        results: List[List[Tuple[str, float]]] = [[] for _ in queries]
+        for block, block_ids, exclude in ((matrix, ids, dead), (delta_matrix, delta_ids, None)):
+            if block is None or block.shape[0] == 0:
+                continue
+            indices, scores = search_top_k(block, queries, k, exclude)
+            for hits, row_indices, row_scores in zip(results, indices, scores):
+                hits.extend((str(block_ids[index]), float(score)) for index, score in zip(row_indices, row_scores) if score > -np.inf)
+        return [sorted(hits, key=lambda hit: hit[1], reverse=True)[:k] for hits in results]
+
+    def sample_embeddings(self, collection, count: int, seed: int = 0) -> np.ndarray:
+        """Up to `count` live rows of the matrix picked at random, e.g. as benchmark queries"""
+        self.sync(collection)
+        with self._lock:
+            matrix, _, dead, _, _ = self._snapshot()
+        if matrix is None or matrix.shape[0] == 0:
+            return np.empty((0, 0), dtype=np.float32)
+        live = np.flatnonzero(~dead) if dead is not None else np.arange(matrix.shape[0])
+        rows = np.random.default_rng(seed).choice(live, size=min(count, len(live)), replace=False)
+        return np.asarray(matrix[np.sort(rows)], dtype=np.float32)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Size and freshness of the loaded matrix and the changes applied on top of it"""
+        with self._lock:
+            return {
+                "loaded": self.matrix is not None,
+                "count": 0 if self.ids is None else len(self.ids) - self._dead + len(self._delta),
+                "dimension": 0 if self.matrix is None or self.matrix.ndim < 2 else self.matrix.shape[1],
+                "version": self.version,
+                "delta_rows": len(self._delta),
+                "deleted_rows": self._dead,
+                "rebuilds": self.rebuilds,
+                "compactions": self.compactions,
+            }
+
+def benchmark_search_backends(index: NumpyVectorIndex, collection, num_queries: int = 50, k: int = 20) -> Dict[str, Any]:
+    """Compare ChromaDB's HNSW search against exact NumPy search on stored embeddings.
+
+    Queries are embeddings sampled from the index itself. Recall is the fraction of the
+    exact top-k that ChromaDB also returns; latencies are per query, plus one batched
+    NumPy call for all queries.
+    """
+    queries = index.sample_embeddings(collection, num_queries)
+    stats = index.get_stats()
+    if len(queries) == 0:
+        return {"count": 0, "queries": 0}
+    k = min(k, stats["count"])
+
+    numpy_latencies, chroma_latencies, recalls = [], [], []
+    for query in queries:
+        start = time.perf_counter()
+        exact = index.search(collection, [query], k)[0]
+        numpy_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        approximate = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+        chroma_latencies.append(time.perf_counter() - start)
+
+        exact_ids = {image_id for image_id, _ in exact}
+        recalls.append(len(exact_ids.intersection(approximate["ids"][0])) / max(len(exact_ids), 1))
+
+    start = time.perf_counter()
+    index.search(collection, queries, k)
+    batched_seconds = time.perf_counter() - start
+
+    def summarize(latencies: List[float]) -> Dict[str, float]:
+        return {
+            "mean_ms": round(float(np.mean(latencies)) * 1000, 3),
+            "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        }
+
+    return {
+        "count": stats["count"],
+        "dimension": stats["dimension"],
+        "queries": len(queries),
+        "k": k,
+        "chroma_recall_at_k": round(float(np.mean(recalls)), 4),
+        "chroma": summarize(chroma_latencies),
+        "numpy": summarize(numpy_latencies),
+        "numpy_batched_ms_per_query": round(batched_seconds * 1000 / len(queries), 3),
+    }
+
+# One index per profile and model, shared by every repository instance
+_vector_indexes: Dict[Tuple[str, str], NumpyVectorIndex] = {}
+_vector_indexes_lock = threading.Lock()
+
+def get_vector_index(profile_id: str, suffix: str = "") -> NumpyVectorIndex:
+    """Get the NumPy vector index for a profile's index of one model"""
+    with _vector_indexes_lock:
+        if (profile_id, suffix) not in _vector_indexes:
+            _vector_indexes[(profile_id, suffix)] = NumpyVectorIndex(profile_id, suffix)
+        return _vector_indexes[(profile_id, suffix)]
+
+# Search backend chosen in each profile's settings, cached to keep settings reads off the search path
+_profile_backends: Dict[str, SearchBackend] = {}
+
+async def get_profile_search_backend(profile_id: str) -> SearchBackend:
+    """Get the vector search backend configured for a profile"""
+    if profile_id not in _profile_backends:
+        backend = SearchBackend.CHROMA
+        try:
+            settings = await run_storage(get_metadata_store().get_settings, profile_id)
+            if settings and settings.get("search_backend"):
+                backend = SearchBackend(settings["search_backend"])
+        except Exception as e:
+            logger.warning(f"Could not read search backend for profile {profile_id}: {str(e)}")
+        _profile_backends[profile_id] = backend
+    return _profile_backends[profile_id]
+
+def set_profile_search_backend(profile_id: str, backend: SearchBackend) -> None:
+    """Record a profile's newly configured search backend"""
+    _profile_backends[profile_id] = SearchBackend(backend)
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Any
 from datetime import datetime
-import os
+from app.utils.stat_cache import get_stat_cache
 
 class ImageMetadata(BaseModel):
     """Metadata extracted from image files"""
@@ -17,7 +17,7 @@ class ImageMetadata(BaseModel):
     @property
     def exists(self) -> bool:
         """Check if the image file still exists"""
-        return os.path.exists(self.filepath)
+        return get_stat_cache().exists(self.filepath)
 
 class Image(BaseModel):
     """Represents an indexed image"""
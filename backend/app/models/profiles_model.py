@@ -16,6 +16,11 @@ class ModelType(str, Enum):
     DEFAULT = "default"          # Balanced
     QUALITY = "quality"          # Higher quality but slower
 
+class SearchBackend(str, Enum):
+    """Vector search engine used for a profile's image index"""
+    CHROMA = "chroma"  # HNSW approximate search inside ChromaDB
+    NUMPY = "numpy"    # Exact brute-force search over a memory-mapped matrix
+
 class ProfileSettings(BaseModel):
     """User profile settings"""
     similar_image_count: int = 20
@@ -26,6 +31,7 @@ class ProfileSettings(BaseModel):
     nlp_model: ModelType = ModelType.DEFAULT
     vlm_model: ModelType = ModelType.DEFAULT
     auto_index_interval_minutes: int = 60  # How often to check for new images
+    search_backend: SearchBackend = SearchBackend.CHROMA
 
 class Profile(BaseModel):
     """User profile"""
@@ -40,6 +40,9 @@ class SessionUpdateModel(BaseModel):
 class BulkDeleteRequest(BaseModel):
     ids: List[str]
 
+class ImagePropertiesRequest(BaseModel):
+    image_ids: List[str] = Field(..., max_length=500)  # One page of results
+
 class SearchParams(BaseModel):
     query_text: Optional[str] = None
     image_file: Optional[str] = None  # Base64 encoded image
@@ -53,4 +56,7 @@ class SearchResponse(BaseModel):
     primary_results: List[Dict[str, Any]]
     related_results: List[Dict[str, Any]]
     query: Dict[str, Any]
-    session_id: Optional[str] = None
\ No newline at end of file
+    session_id: Optional[str] = None
+    index_updated_at: Optional[str] = None  # When the searched index was last updated
+    pending_files: int = 0  # Files found but not yet indexed; more results may follow
+    indexing: bool = False  # Whether a background index run is in progress
\ No newline at end of file
@@ -1,6 +1,6 @@
 from typing import List, Optional, Dict
 from pydantic import BaseModel
-from app.models.profiles_model import ThemeMode, ModelType
+from app.models.profiles_model import ThemeMode, ModelType, SearchBackend
 
 class SettingsUpdate(BaseModel):
     similar_image_count: Optional[int] = None
@@ -11,6 +11,7 @@ class SettingsUpdate(BaseModel):
     nlp_model: Optional[ModelType] = None
     vlm_model: Optional[ModelType] = None
     auto_index_interval_minutes: Optional[int] = None
+    search_backend: Optional[SearchBackend] = None
 
 class FolderValidationRequest(BaseModel):
     folders: List[str]
\ No newline at end of file
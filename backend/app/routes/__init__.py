@@ -1,2 +1,2 @@
 # Import all routers to make them available from the routes package
-from app.routes import search_router, library_router, albums_router, settings_router, profiles_router
+from app.routes import search_router, library_router, albums_router, settings_router, profiles_router, image_router, indexing_router
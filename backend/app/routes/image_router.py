@@ -1,21 +1,69 @@
-from fastapi import APIRouter, HTTPException, Body, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Body, Query, Request
+from typing import Any, Dict, Optional
 from app.models.image_model import OpenImageRequest
 from app.utils.helpers import open_image_in_native_viewer
+from app.utils.thumbnails import THUMBNAIL_SIZES, get_thumbnail_cache
+from app.utils.executors import run_storage
+from app.utils.file_responses import conditional_file_response
 import os
+import stat
+import logging
 import mimetypes
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Thumbnail URLs name a path rather than content, so clients revalidate by ETag after a day
+THUMBNAIL_CACHE_CONTROL = "private, max-age=86400, must-revalidate"
+
+# Originals are revalidated after a minute; an unchanged file costs one stat and a 304
+IMAGE_CACHE_CONTROL = "private, max-age=60, must-revalidate"
+
 @router.get("/serve")
-async def serve_image(path: str = Query(..., description="Absolute path to the image file")):
-    """Serve a local image file over HTTP so Electron renderer can load it."""
-    if not os.path.exists(path):
+async def serve_image(
+    request: Request,
+    path: str = Query(..., description="Absolute path to the image file"),
+    size: Optional[int] = Query(None, ge=1, le=THUMBNAIL_SIZES[-1], description="Serve a thumbnail fitting this many pixels")
+):
+    """Serve a local image file over HTTP so Electron renderer can load it.
+
+    With `size`, a cached thumbnail no larger than the nearest size bucket is served instead
+    of the original file. Both honour If-None-Match, If-Modified-Since and Range.
+    """
+    # Stat off the event loop: on a slow network share it would stall every other request
+    try:
+        st = await run_storage(os.stat, path)
+    except OSError:
         raise HTTPException(status_code=404, detail="Image file not found")
-    if not os.path.isfile(path):
+    if not stat.S_ISREG(st.st_mode):
         raise HTTPException(status_code=400, detail="Path is not a file")
+    
+    if size:
+        # A concurrent store can evict the file before it is stat-ed; the retry renders it again
+        for attempt in range(2):
+            try:
+                thumbnail = await run_storage(get_thumbnail_cache().get_thumbnail, path, size)
+            except Exception as e:
+                logger.error(f"Error rendering thumbnail for {path}: {str(e)}")
+                raise HTTPException(status_code=422, detail="Cannot render a thumbnail for this file")
+            try:
+                thumbnail_st = await run_storage(os.stat, thumbnail.path)
+                break
+            except FileNotFoundError:
+                if attempt:
+                    raise HTTPException(status_code=503, detail="Thumbnail was evicted before it could be served")
+        
+        return conditional_file_response(
+            request, thumbnail.path, thumbnail.media_type, THUMBNAIL_CACHE_CONTROL, etag=thumbnail.etag, st=thumbnail_st
+        )
+    
     mime, _ = mimetypes.guess_type(path)
-    return FileResponse(path, media_type=mime or "image/jpeg")
+    return conditional_file_response(request, path, mime or "image/jpeg", IMAGE_CACHE_CONTROL, st=st)
+
+@router.get("/thumbnails/stats", response_model=Dict[str, Any])
+async def thumbnail_cache_stats():
+    """Get occupancy and hit rate of the thumbnail cache"""
+    return await run_storage(get_thumbnail_cache().get_stats)
 
 @router.post("/open")
 async def open_image(request: OpenImageRequest):
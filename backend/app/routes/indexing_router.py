@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, Any, List, Optional
+from app.services.indexing_service import (
+    check_for_new_images, get_indexing_status, get_duplicate_groups, check_encoder_accuracy, INDEXING_BATCH_SIZE
+)
+from app.services.watcher_service import get_folder_watcher
+from app.database.vector_index import get_vector_index, benchmark_search_backends
+from app.utils.database import get_images_collection, get_profile_index_model
+from app.utils.model_catalog import index_suffix
+from app.utils.executors import run_storage, get_inference_stats
+from app.utils.onnx_encoder import onnxruntime_available
+
+router = APIRouter()
+
+@router.get("/status", response_model=Dict[str, Any])
+async def indexing_status(profile_id: str = Query(..., description="The profile ID")):
+    """Get the state and throughput of the latest indexing run for a profile, and how
+    background inference shares the CPU with searches"""
+    return {
+        **get_indexing_status(profile_id),
+        "watcher": get_folder_watcher().get_status(profile_id),
+        "inference": get_inference_stats(),
+    }
+
+@router.post("/run", response_model=Dict[str, Any])
+async def run_indexing(
+    profile_id: str = Query(..., description="The profile ID"),
+    batch_size: Optional[int] = Query(None, ge=1, le=512, description="Images per embedding batch")
+):
+    """Scan the profile's monitored folders and index new images"""
+    try:
+        indexed = await check_for_new_images(profile_id, force=True, batch_size=batch_size or INDEXING_BATCH_SIZE)
+        return {**get_indexing_status(profile_id), "indexed_ids": indexed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Indexing error: {str(e)}")
+
+@router.get("/duplicates", response_model=Dict[str, Any])
+async def duplicate_groups(
+    profile_id: str = Query(..., description="The profile ID"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of groups to return"),
+    offset: int = Query(0, ge=0, description="Number of groups to skip")
+):
+    """List groups of byte-identical images, largest wasted space first"""
+    try:
+        return await get_duplicate_groups(profile_id, limit=limit, offset=offset)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Duplicate report error: {str(e)}")
+
+@router.get("/benchmark", response_model=Dict[str, Any])
+async def benchmark_search(
+    profile_id: str = Query(..., description="The profile ID"),
+    queries: int = Query(50, ge=1, le=1000, description="Number of sampled query embeddings"),
+    k: int = Query(20, ge=1, le=500, description="Results per query")
+):
+    """Compare recall and latency of the ChromaDB and NumPy search backends"""
+    try:
+        model_type, backend = await get_profile_index_model(profile_id)
+        collection = await get_images_collection(profile_id, model_type, backend)
+        index = get_vector_index(profile_id, index_suffix(model_type, backend))
+        return await run_storage(benchmark_search_backends, index, collection, queries, k)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Benchmark error: {str(e)}")
+
+@router.get("/encoder-check", response_model=Dict[str, Any])
+async def encoder_accuracy_check(
+    profile_id: str = Query(..., description="The profile ID"),
+    backend: str = Query("onnx-int8", description="ONNX backend to compare with PyTorch: onnx or onnx-int8"),
+    sample: int = Query(64, ge=2, le=512, description="Number of sampled indexed images"),
+    k: int = Query(10, ge=1, le=100, description="Neighbours compared per query"),
+    queries: Optional[List[str]] = Query(None, description="Text queries; a built-in set when omitted")
+):
+    """Compare an ONNX encoder backend's embeddings with PyTorch's by cosine agreement and top-k overlap"""
+    if backend not in ("onnx", "onnx-int8"):
+        raise HTTPException(status_code=400, detail=f"Unknown ONNX backend: {backend}")
+    if not onnxruntime_available():
+        raise HTTPException(status_code=400, detail="ONNX backends need onnxruntime; please run: pip install onnxruntime onnx")
+    if sample <= k:
+        raise HTTPException(status_code=400, detail=f"Sample must be larger than k to compare top-{k} neighbours")
+    try:
+        return await check_encoder_accuracy(profile_id, backend, sample, k, queries)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Encoder check error: {str(e)}")
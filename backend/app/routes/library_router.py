@@ -3,6 +3,8 @@ from typing import List, Optional
 import logging
 from app.models.search_model import Session, BulkDeleteRequest
 from app.services.library_service import get_sessions, get_session, create_session, update_session, delete_session
+from app.database.chat_repository import ChatRepository
+from app.database.metadata_store import CHAT_PAGE_SIZE
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -101,3 +103,29 @@ async def bulk_delete_sessions(
             logger.error(f"Error deleting session {session_id}: {str(e)}")
     
     return {"success": True, "deleted_count": deleted_count}
+
+@router.get("/chats/{id}")
+async def get_chat_detail(
+    id: str,
+    profile_id: str = Query(..., description="The profile ID"),
+    limit: int = Query(CHAT_PAGE_SIZE, ge=1, le=500, description="Messages in the first page")
+):
+    """Get a search chat with its newest page of messages"""
+    chat = await ChatRepository(profile_id).get_chat(id, message_limit=limit)
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return chat
+
+@router.get("/chats/{id}/messages")
+async def get_chat_messages(
+    id: str,
+    profile_id: str = Query(..., description="The profile ID"),
+    limit: int = Query(CHAT_PAGE_SIZE, ge=1, le=500),
+    before: Optional[int] = Query(None, description="Return messages older than this sequence number"),
+    after: Optional[int] = Query(None, description="Return messages newer than this sequence number")
+):
+    """Page through a search chat's messages by sequence-number cursor"""
+    repo = ChatRepository(profile_id)
+    if not await repo.get_chat_info(id):
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return await repo.get_messages(id, limit=limit, after=after, before=before)
@@ -1,79 +1,198 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Body, Path
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Body, Path, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any, Tuple
 import json
 import base64
+import binascii
 import os
-import uuid
-import tempfile
-import io
-from PIL import Image
-from app.models.search_model import SearchParams, SearchResponse
+from app.models.search_model import SearchParams, SearchResponse, ImagePropertiesRequest
 from app.services.search_service import (
-    get_image_details, process_search_query
+    get_image_details, get_images_details, process_search_query, stream_search_query,
+    get_search_cache_stats, PRIMARY_RESULT_COUNT
 )
+from app.utils.embedding_cache import get_query_embedding_cache
+from app.utils.stat_cache import get_stat_cache
+from app.utils.event_streams import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE, STREAM_HEADERS, encode_events, wants_sse
 
 router = APIRouter()
 
+# Largest query image accepted as base64, multipart upload or raw request body
+MAX_QUERY_IMAGE_BYTES = int(float(os.environ.get("LIF_MAX_QUERY_IMAGE_MB", "32")) * 1024 * 1024)
+
+def _check_image_size(size: int) -> None:
+    if size > MAX_QUERY_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Query image exceeds {MAX_QUERY_IMAGE_BYTES} bytes")
+
+def _query_images(search_params: SearchParams) -> Tuple[List[str], List[bytes]]:
+    """Collect query image paths and the encoded bytes of a base64 image; returns (paths, data)"""
+    image_paths = [search_params.image_path] if search_params.image_path else []
+    
+    # A base64 image is decoded to its encoded bytes only; the search decodes it in memory
+    image_data = []
+    if search_params.image_file:
+        encoded = search_params.image_file
+        if "," in encoded:  # Remove data URL prefix if present
+            encoded = encoded.split(",", 1)[1]
+        try:
+            image_data.append(base64.b64decode(encoded, validate=True))
+        except binascii.Error as e:
+            raise HTTPException(status_code=400, detail=f"Invalid base64 image: {str(e)}")
+        _check_image_size(len(image_data[0]))
+    return image_paths, image_data
+
+def _session_fields(session: Dict[str, Any]) -> Dict[str, Any]:
+    """Response fields describing the saved chat session and index freshness"""
+    freshness = session.get("index_freshness", {})
+    return {
+        "query": session.get("query", {}),
+        "session_id": session.get("chat_id"),
+        "index_updated_at": freshness.get("indexed_at"),
+        "pending_files": freshness.get("pending_files", 0),
+        "indexing": freshness.get("indexing", False),
+    }
+
+def _validate_search_params(search_params: SearchParams) -> None:
+    if not search_params.query_text and not search_params.image_file and not search_params.image_path:
+        raise HTTPException(status_code=400, detail="Either query text, image file, or image path must be provided")
+
+async def _search_response(
+    profile_id: str,
+    query_text: Optional[str],
+    image_paths: List[str],
+    image_data: List[bytes],
+    limit: int
+) -> SearchResponse:
+    """Run a search query and split its results into primary and related"""
+    results = await process_search_query(
+        profile_id=profile_id,
+        query_text=query_text,
+        image_paths=image_paths or None,
+        limit=limit,
+        image_data=image_data or None
+    )
+    
+    # Format response
+    if "error" in results:
+        raise HTTPException(status_code=500, detail=results["error"])
+    
+    # Split results into primary and related
+    all_results = results.get("results", [])
+    return SearchResponse(
+        primary_results=all_results[:PRIMARY_RESULT_COUNT],
+        related_results=all_results[PRIMARY_RESULT_COUNT:],
+        **_session_fields(results)
+    )
+
 @router.post("/query", response_model=SearchResponse)
 async def process_query(search_params: SearchParams):
     """Process a search query with text and/or images"""
     try:
         # Validate request
-        if not search_params.query_text and not search_params.image_file and not search_params.image_path:
-            raise HTTPException(status_code=400, detail="Either query text, image file, or image path must be provided")
+        _validate_search_params(search_params)
         
         # Process query
-        image_paths = []
-        if search_params.image_path:
-            image_paths.append(search_params.image_path)
-        
-        # If base64 image is provided, decode and save temporarily
-        temp_image_path = None
-        if search_params.image_file:
-            # Decode base64 image
-            if "," in search_params.image_file:  # Remove data URL prefix if present
-                search_params.image_file = search_params.image_file.split(",", 1)[1]
-            
-            image_data = base64.b64decode(search_params.image_file)
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Save to temp file
-            temp_dir = tempfile.gettempdir()
-            temp_image_path = os.path.join(temp_dir, f"search_image_{uuid.uuid4()}.jpg")
-            image.save(temp_image_path)
-            image_paths.append(temp_image_path)
-        
-        # Process the search query
-        results = await process_search_query(
-            profile_id=search_params.profile_id,
-            query_text=search_params.query_text,
-            image_paths=image_paths if image_paths else None,
-            limit=search_params.limit
-        )
-        
-        # Clean up temp file if created
-        if temp_image_path and os.path.exists(temp_image_path):
-            os.remove(temp_image_path)
-        
-        # Format response
-        if "error" in results:
-            raise HTTPException(status_code=500, detail=results["error"])
-        
-        # Split results into primary and related
-        all_results = results.get("results", [])
-        primary_count = min(5, len(all_results))
-        primary_results = all_results[:primary_count]
-        related_results = all_results[primary_count:]
-        
-        return SearchResponse(
-            primary_results=primary_results,
-            related_results=related_results,
-            query=results.get("query", {}),
-            session_id=results.get("chat_id")
+        image_paths, image_data = _query_images(search_params)
+        return await _search_response(
+            search_params.profile_id, search_params.query_text, image_paths, image_data, search_params.limit
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+@router.post("/query/upload", response_model=SearchResponse)
+async def process_query_upload(
+    profile_id: str = Form(...),
+    query_text: Optional[str] = Form(None),
+    image_path: Optional[str] = Form(None),
+    limit: int = Form(20),
+    images: List[UploadFile] = File(default=[])
+):
+    """Process a search query with images sent as multipart file uploads"""
+    image_data = []
+    for image in images:
+        data = await image.read(MAX_QUERY_IMAGE_BYTES + 1)
+        _check_image_size(len(data))
+        image_data.append(data)
+    
+    if not query_text and not image_path and not image_data:
+        raise HTTPException(status_code=400, detail="Either query text, an image upload, or image path must be provided")
+    try:
+        return await _search_response(profile_id, query_text, [image_path] if image_path else [], image_data, limit)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
 
+@router.post("/query/image", response_model=SearchResponse)
+async def process_query_image(
+    request: Request,
+    profile_id: str = Query(..., description="The profile ID"),
+    query_text: Optional[str] = Query(None, description="Optional text to combine with the image"),
+    limit: int = Query(20, ge=1)
+):
+    """Process a search query whose request body is the raw encoded query image"""
+    _check_image_size(int(request.headers.get("content-length") or 0))
+    data = await request.body()
+    _check_image_size(len(data))
+    if not data:
+        raise HTTPException(status_code=400, detail="Request body must contain the query image")
+    try:
+        return await _search_response(profile_id, query_text, [], [data], limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+@router.post("/query/stream")
+async def process_query_stream(search_params: SearchParams, request: Request):
+    """Stream a search query's response as it is produced.
+
+    Sends a "primary" event with the top results, "related" events with the rest, then a
+    "session" event with the chat session ID and index freshness, or an "error" event.
+    Responds with NDJSON (`{"event": ..., "data": ...}` per line) unless the client
+    accepts `text/event-stream`, in which case Server-Sent Events are used.
+    """
+    _validate_search_params(search_params)
+    image_paths, image_data = _query_images(search_params)
+    
+    async def events():
+        async for event, data in stream_search_query(
+            profile_id=search_params.profile_id,
+            query_text=search_params.query_text,
+            image_paths=image_paths or None,
+            limit=search_params.limit,
+            image_data=image_data or None
+        ):
+            yield event, _session_fields(data) if event == "session" else data
+    
+    sse = wants_sse(request)
+    return StreamingResponse(
+        encode_events(events(), sse=sse),
+        media_type=SSE_MEDIA_TYPE if sse else NDJSON_MEDIA_TYPE,
+        headers=STREAM_HEADERS
+    )
+
+@router.get("/cache", response_model=Dict[str, Any])
+async def query_cache_stats():
+    """Get hit/miss counters for the query embedding, search result and file stat caches"""
+    return {
+        "query_embeddings": get_query_embedding_cache().get_stats(),
+        "results": get_search_cache_stats(),
+        "file_stats": get_stat_cache().get_stats(),
+    }
+
+@router.post("/properties/batch", response_model=Dict[str, Dict[str, Any]])
+async def get_image_properties_batch(
+    request: ImagePropertiesRequest,
+    profile_id: str = Query(..., description="The profile ID")
+):
+    """Get properties of several images by ID in one request; unknown IDs are omitted"""
+    try:
+        return await get_images_details(profile_id, request.image_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving image properties: {str(e)}")
+
 @router.get("/properties/{image_id}")
 async def get_image_properties_by_id(
     image_id: str = Path(..., description="The ID of the image"), 
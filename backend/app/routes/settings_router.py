@@ -4,7 +4,7 @@ from pydantic import BaseModel
 from app.models.profiles_model import ProfileSettings
 from app.models.settings_model import SettingsUpdate, FolderValidationRequest
 from app.services.settings_service import get_profile_settings, update_profile_settings
-from app.utils.embeddings import TEXT_MODELS, IMAGE_MODELS
+from app.utils.embeddings import TEXT_MODELS, IMAGE_MODELS, get_model_status
 import os
 
 router = APIRouter()
@@ -52,3 +52,8 @@ async def get_available_models():
         "text_models": text_models,
         "image_models": image_models
     }
+
+@router.get("/settings/models/status", response_model=Dict[str, Any])
+async def get_models_status():
+    """Get the resident models with their load and warm-up times and memory use"""
+    return get_model_status()
@@ -3,10 +3,18 @@ from datetime import datetime
 import logging
 from app.models.album_model import Album, AlbumImage, AlbumType
 from app.services.search_service import search_by_text
-from app.utils.database import get_albums_collection
+from app.database.metadata_store import get_metadata_store
+from app.utils.executors import run_storage
 
 logger = logging.getLogger(__name__)
 
+async def _save_album(album: Album, include_images: bool = True) -> None:
+    """Write an album row, and optionally its full image list, in one transaction"""
+    album_dict = album.dict()
+    if not include_images:
+        album_dict.pop("images")
+    await run_storage(get_metadata_store().save_album, album_dict)
+
 async def get_albums(
     profile_id: str,
     skip: int = 0,
@@ -17,30 +25,16 @@ async def get_albums(
     sort_order: str = "desc"
 ) -> List[Album]:
     """Get all albums for a user profile with filtering and sorting"""
-    collection = await get_albums_collection()
-    
-    # Build query
-    query = {"profile_id": profile_id}
-    
-    # Add album type filter if provided
-    if album_type:
-        query["type"] = album_type
-    
-    # Add search term filter if provided
-    if search_term:
-        query["$or"] = [
-            {"name": {"$regex": search_term, "$options": "i"}},
-            {"description": {"$regex": search_term, "$options": "i"}},
-            {"search_query": {"$regex": search_term, "$options": "i"}}
-        ]
-    
-    # Set sort order
-    sort_direction = -1 if sort_order.lower() == "desc" else 1
-    sort_options = {sort_by: sort_direction}
-    
-    # Execute query
-    cursor = collection.find(query).sort(sort_options).skip(skip).limit(limit)
-    albums_data = await cursor.to_list(length=limit)
+    albums_data = await run_storage(
+        get_metadata_store().list_albums,
+        profile_id,
+        skip,
+        limit,
+        search_term,
+        album_type.value if album_type else None,
+        sort_by,
+        sort_order
+    )
     
     # Convert to model objects
     albums = [Album(**album_data) for album_data in albums_data]
@@ -48,8 +42,7 @@ async def get_albums(
 
 async def get_album(profile_id: str, album_id: str) -> Optional[Album]:
     """Get a specific album"""
-    collection = await get_albums_collection()
-    album_data = await collection.find_one({"profile_id": profile_id, "id": album_id})
+    album_data = await run_storage(get_metadata_store().get_album, profile_id, album_id)
     
     if album_data:
         return Album(**album_data)
@@ -57,50 +50,41 @@ async def get_album(profile_id: str, album_id: str) -> Optional[Album]:
 
 async def create_album(profile_id: str, album: Album) -> Album:
     """Create a new album"""
-    collection = await get_albums_collection()
-    
     # Set profile_id if not already set
     if not album.profile_id:
         album.profile_id = profile_id
     
-    album_dict = album.dict()
-    await collection.insert_one(album_dict)
+    await _save_album(album)
     
     return album
 
 async def update_album(profile_id: str, album_id: str, updates: Dict[str, Any]) -> Optional[Album]:
     """Update an existing album"""
-    collection = await get_albums_collection()
+    album = await get_album(profile_id, album_id)
+    if not album:
+        return None
     
-    # Add updated_at timestamp
-    updates["updated_at"] = datetime.now()
+    for key, value in updates.items():
+        if hasattr(album, key) and key != "images":
+            setattr(album, key, value)
     
-    result = await collection.find_one_and_update(
-        {"profile_id": profile_id, "id": album_id},
-        {"$set": updates},
-        return_document=True
-    )
+    # Add updated_at timestamp
+    album.updated_at = datetime.now()
     
-    if result:
-        return Album(**result)
-    return None
+    await _save_album(album, include_images=False)
+    return album
 
 async def delete_album(profile_id: str, album_id: str) -> bool:
     """Delete an album"""
-    collection = await get_albums_collection()
-    result = await collection.delete_one({"profile_id": profile_id, "id": album_id})
-    return result.deleted_count > 0
+    return await run_storage(get_metadata_store().delete_album, profile_id, album_id)
 
 async def add_image_to_album(profile_id: str, album_id: str, image_id: str) -> Album:
     """Add an image to an album"""
-    collection = await get_albums_collection()
-    album_data = await collection.find_one({"profile_id": profile_id, "id": album_id})
+    album = await get_album(profile_id, album_id)
     
-    if not album_data:
+    if not album:
         raise ValueError("Album not found")
     
-    album = Album(**album_data)
-    
     # Check if image already exists in album
     if any(img.image_id == image_id for img in album.images):
         return album  # Image already exists
@@ -120,27 +104,17 @@ async def add_image_to_album(profile_id: str, album_id: str, image_id: str) -> A
         album.cover_image_id = image_id
     
     # Update in database
-    await collection.update_one(
-        {"id": album_id},
-        {"$set": {
-            "images": [img.dict() for img in album.images],
-            "cover_image_id": album.cover_image_id,
-            "updated_at": album.updated_at
-        }}
-    )
+    await _save_album(album)
     
     return album
 
 async def remove_image_from_album(profile_id: str, album_id: str, image_id: str) -> Album:
     """Remove an image from an album"""
-    collection = await get_albums_collection()
-    album_data = await collection.find_one({"profile_id": profile_id, "id": album_id})
+    album = await get_album(profile_id, album_id)
     
-    if not album_data:
+    if not album:
         raise ValueError("Album not found")
     
-    album = Album(**album_data)
-    
     # Remove image
     album.images = [img for img in album.images if img.image_id != image_id]
     album.updated_at = datetime.now()
@@ -150,27 +124,17 @@ async def remove_image_from_album(profile_id: str, album_id: str, image_id: str)
         album.cover_image_id = album.images[0].image_id if album.images else None
     
     # Update in database
-    await collection.update_one(
-        {"id": album_id},
-        {"$set": {
-            "images": [img.dict() for img in album.images],
-            "cover_image_id": album.cover_image_id,
-            "updated_at": album.updated_at
-        }}
-    )
+    await _save_album(album)
     
     return album
 
 async def reorder_album_images(profile_id: str, album_id: str, image_orders: Dict[str, int]) -> Album:
     """Reorder images in an album"""
-    collection = await get_albums_collection()
-    album_data = await collection.find_one({"profile_id": profile_id, "id": album_id})
+    album = await get_album(profile_id, album_id)
     
-    if not album_data:
+    if not album:
         raise ValueError("Album not found")
     
-    album = Album(**album_data)
-    
     # Update orders
     for img in album.images:
         if img.image_id in image_orders:
@@ -181,13 +145,7 @@ async def reorder_album_images(profile_id: str, album_id: str, image_orders: Dic
     album.updated_at = datetime.now()
     
     # Update in database
-    await collection.update_one(
-        {"id": album_id},
-        {"$set": {
-            "images": [img.dict() for img in album.images],
-            "updated_at": album.updated_at
-        }}
-    )
+    await _save_album(album)
     
     return album
 
@@ -201,7 +159,7 @@ async def create_album_from_session(
 ) -> Album:
     """Create an album from a search query"""
     # Perform search
-    search_results = await search_by_text(search_query, profile_id, limit=result_limit or 20)
+    search_results = await search_by_text(profile_id, search_query, limit=result_limit or 20)
     
     # Create album
     album = Album(
@@ -215,7 +173,7 @@ async def create_album_from_session(
     
     # Add images to album
     for i, result in enumerate(search_results):
-        album_image = AlbumImage(image_id=result.image.id, order=i)
+        album_image = AlbumImage(image_id=result["id"], order=i)
         album.images.append(album_image)
     
     # Set cover image if available
@@ -223,7 +181,6 @@ async def create_album_from_session(
         album.cover_image_id = album.images[0].image_id
     
     # Save album to database
-    collection = await get_albums_collection()
-    await collection.insert_one(album.dict())
+    await _save_album(album)
     
     return album
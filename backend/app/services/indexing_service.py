@@ -4,13 +4,27 @@ import hashlib
 import asyncio
 import logging
 import time
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any, Set, Optional, Tuple
-from PIL import Image as PILImage
-from PIL.ExifTags import TAGS
-import chromadb
-from app.utils.database import get_chroma_collection, get_settings_collection
-from app.utils.embeddings import generate_image_embedding
+from typing import List, Dict, Any, Set, Optional, Tuple, Iterable, Iterator, NamedTuple
+from app.utils.database import (
+    bump_index_generation, get_images_collection,
+    get_profile_index_model, set_profile_index_model
+)
+from app.models.profiles_model import ModelType
+from app.utils.model_catalog import IMAGE_MODELS, get_encoder_backend, index_suffix
+from app.database.metadata_store import get_metadata_store
+from app.utils.embeddings import generate_image_embeddings_from_pixels, get_image_preprocess_config, compare_encoder_backends
+from app.utils.image_preprocessing import (
+    DecodedImage, decode_image_for_embedding, extract_image_metadata, extract_file_metadata,
+    try_compute_content_hash
+)
+from app.database.manifest_repository import ManifestEntry, ManifestRepository, get_manifest
+from app.utils.thumbnails import INDEX_THUMBNAIL_SIZE, get_thumbnail_cache, thumbnail_bucket
+from app.utils.stat_cache import get_stat_cache
+from app.utils.executors import run_inference, run_background_inference, run_storage
 from app.services.profile_service import get_profiles
 
 logger = logging.getLogger(__name__)
@@ -18,103 +32,536 @@ logger = logging.getLogger(__name__)
 # Global variable to track indexing state
 indexing_tasks = {}
 indexing_lock = asyncio.Lock()
+_profile_locks: Dict[str, asyncio.Lock] = {}
+# Background runs re-embedding a profile's library with a newly chosen model
+_migration_tasks: Dict[str, asyncio.Task] = {}
+_migration_targets: Dict[str, ModelType] = {}
 
-def extract_image_metadata(image_path: str) -> Dict[str, Any]:
-    """Extract metadata from an image file"""
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Image not found: {image_path}")
-    
-    stats = os.stat(image_path)
-    filename = os.path.basename(image_path)
-    
-    # Basic file metadata
-    metadata = {
-        "filename": filename,
-        "filepath": image_path,
-        "filesize": stats.st_size,
-        "creation_date": datetime.fromtimestamp(stats.st_ctime).isoformat(),
-        "modified_date": datetime.fromtimestamp(stats.st_mtime).isoformat(),
+# Supported image file extensions
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
+
+# Number of images embedded per CLIP forward pass and written per upsert
+INDEXING_BATCH_SIZE = 32
+
+# Worker processes that decode and preprocess images for the embedder
+DECODE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# Maximum number of decoded images waiting for the model consumer
+INDEXING_QUEUE_SIZE = 4 * INDEXING_BATCH_SIZE
+
+# Files handed to each decode worker at a time when fingerprinting
+HASH_CHUNK_FILES = 16
+
+_decode_pool: Optional[ProcessPoolExecutor] = None
+
+def get_decode_pool() -> ProcessPoolExecutor:
+    """Get the process pool used to decode and preprocess images for indexing"""
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ProcessPoolExecutor(max_workers=DECODE_WORKERS)
+        logger.info(f"Started image decode pool with {DECODE_WORKERS} workers")
+    return _decode_pool
+
+def shutdown_decode_pool():
+    """Stop the image decode worker processes"""
+    global _decode_pool
+    if _decode_pool is not None:
+        _decode_pool.shutdown(wait=False, cancel_futures=True)
+        _decode_pool = None
+
+def _image_id_for_path(image_path: str) -> str:
+    """Build the stable collection ID for an image path"""
+    image_hash = hashlib.md5(image_path.encode()).hexdigest()
+    return f"img_{image_hash}"
+
+def _new_pipeline_stats() -> Dict[str, Any]:
+    """Create the live counters reported for an indexing pipeline run"""
+    return {
+        'queued': 0,
+        'queue_depth': 0,
+        'queue_capacity': INDEXING_QUEUE_SIZE,
+        'decode_workers': DECODE_WORKERS,
+        'decoded': 0,
+        'embedded': 0,
+        'reused': 0,
+        'failed': 0,
+        'decode_seconds': 0.0,
+        'inference_seconds': 0.0,
+        'upsert_seconds': 0.0,
     }
+
+async def _store_decoded_batch(
+    batch: List[DecodedImage],
+    collection,
+    stats: Dict[str, Any],
+    model_type: ModelType = ModelType.DEFAULT,
+    backend: Optional[str] = None
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """Embed a batch of decoded images in one forward pass and store it with one upsert"""
+    ids = [_image_id_for_path(item.path) for item in batch]
+    metadatas = [item.metadata for item in batch]
     
     try:
-        # Extract image specific metadata
-        with PILImage.open(image_path) as img:
-            metadata["width"] = img.width
-            metadata["height"] = img.height
-            
-            # Extract EXIF data if available
-            exif_data = {}
-            if hasattr(img, '_getexif') and img._getexif():
-                exif_info = img._getexif()
-                if exif_info:
-                    for tag, value in exif_info.items():
-                        tag_name = TAGS.get(tag, tag)
-                        exif_data[str(tag_name)] = str(value)
-            
-            if exif_data:
-                metadata["exif"] = exif_data
+        inference_start = time.perf_counter()
+        embeddings = await generate_image_embeddings_from_pixels(
+            np.stack([item.pixel_values for item in batch]), model_type, background=True, backend=backend
+        )
+        stats['inference_seconds'] += time.perf_counter() - inference_start
+        
+        upsert_start = time.perf_counter()
+        await collection.upsert_async(
+            ids=ids,
+            embeddings=embeddings.tolist(),
+            metadatas=metadatas
+        )
+        stats['upsert_seconds'] += time.perf_counter() - upsert_start
+        stats['embedded'] += len(ids)
+        
+        logger.debug(f"Indexed batch of {len(ids)} images")
     except Exception as e:
-        logger.warning(f"Error extracting metadata from {image_path}: {str(e)}")
+        logger.error(f"Failed to index batch of {len(ids)} images: {str(e)}")
+        stats['failed'] += len(ids)
+        return []
     
-    return metadata
+    # Thumbnails rendered by the decoders; the UI can still render them lazily if this fails
+    thumbnails = [(item.path, item.metadata["content_hash"], item.thumbnail) for item in batch if item.thumbnail]
+    if thumbnails:
+        try:
+            await run_storage(get_thumbnail_cache().put_many, thumbnails)
+        except Exception as e:
+            logger.warning(f"Failed to cache thumbnails for batch: {str(e)}")
+    
+    return list(zip(ids, metadatas))
 
-async def index_image(image_path: str, collection) -> Tuple[str, Dict[str, Any]]:
+async def index_image_batch(
+    image_paths: List[str],
+    collection,
+    model_type: ModelType = ModelType.DEFAULT,
+    backend: Optional[str] = None
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """Decode a small batch of images in the decode pool and index them with one forward pass"""
+    config = await run_background_inference(get_image_preprocess_config, model_type, backend)
+    stats = _new_pipeline_stats()
+    
+    loop = asyncio.get_running_loop()
+    decoded = await asyncio.gather(
+        *(loop.run_in_executor(get_decode_pool(), decode_image_for_embedding, path, config) for path in image_paths),
+        return_exceptions=True
+    )
+    batch = []
+    for image_path, item in zip(image_paths, decoded):
+        if isinstance(item, Exception):
+            logger.error(f"Failed to load image {image_path}: {str(item)}")
+        else:
+            batch.append(item)
+    
+    if not batch:
+        return []
+    return await _store_decoded_batch(batch, collection, stats, model_type, backend)
+
+async def index_image(
+    image_path: str,
+    collection,
+    model_type: ModelType = ModelType.DEFAULT,
+    backend: Optional[str] = None
+) -> Tuple[str, Dict[str, Any]]:
     """Process a single image and add to ChromaDB"""
-    # Generate a unique ID for this image
-    image_hash = hashlib.md5(image_path.encode()).hexdigest()
-    image_id = f"img_{image_hash}"
+    results = await index_image_batch([image_path], collection, model_type, backend)
+    if not results:
+        raise ValueError(f"Failed to index image {image_path}")
+    
+    logger.debug(f"Indexed image: {image_path}")
+    return results[0]
+
+async def run_indexing_pipeline(
+    image_paths: List[str],
+    collection,
+    batch_size: int = INDEXING_BATCH_SIZE,
+    stats: Optional[Dict[str, Any]] = None,
+    model_type: ModelType = ModelType.DEFAULT,
+    backend: Optional[str] = None
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """Index images with a producer/consumer pipeline.
+
+    Decode workers in a process pool open, downsize and preprocess images into pixel
+    arrays and push them onto a bounded queue; a single consumer drains the queue in
+    batches, running one forward pass and one upsert per batch. The queue bounds
+    memory and applies backpressure to the decoders when inference falls behind.
+    """
+    if stats is None:
+        stats = _new_pipeline_stats()
+    if not image_paths:
+        return []
+    stats['queued'] += len(image_paths)
+    
+    loop = asyncio.get_running_loop()
+    pool = get_decode_pool()
+    config = await run_background_inference(get_image_preprocess_config, model_type, backend)
+    thumbnail_size = thumbnail_bucket(INDEX_THUMBNAIL_SIZE) if INDEX_THUMBNAIL_SIZE > 0 else 0
+    queue: asyncio.Queue = asyncio.Queue(maxsize=INDEXING_QUEUE_SIZE)
+    path_iter = iter(image_paths)
+    batch_size = max(1, batch_size)
+    indexed: List[Tuple[str, Dict[str, Any]]] = []
     
-    # Extract metadata
-    metadata = extract_image_metadata(image_path)
-    metadata["last_indexed"] = datetime.now().isoformat()
+    async def producer():
+        # Producers share one iterator, so each path is decoded exactly once
+        for image_path in path_iter:
+            try:
+                item = await loop.run_in_executor(pool, decode_image_for_embedding, image_path, config, thumbnail_size)
+            except Exception as e:
+                logger.error(f"Failed to decode image {image_path}: {str(e)}")
+                stats['failed'] += 1
+                continue
+            stats['decoded'] += 1
+            stats['decode_seconds'] += item.decode_seconds
+            await queue.put(item)
+            stats['queue_depth'] = queue.qsize()
+    
+    async def produce_all():
+        try:
+            # Two in-flight images per worker keeps every decoder busy
+            await asyncio.gather(*(producer() for _ in range(DECODE_WORKERS * 2)))
+        finally:
+            await queue.put(None)
+    
+    async def consumer():
+        batch: List[DecodedImage] = []
+        while True:
+            item = await queue.get()
+            stats['queue_depth'] = queue.qsize()
+            if item is None:
+                break
+            batch.append(item)
+            if len(batch) >= batch_size:
+                indexed.extend(await _store_decoded_batch(batch, collection, stats, model_type, backend))
+                batch = []
+        if batch:
+            indexed.extend(await _store_decoded_batch(batch, collection, stats, model_type, backend))
     
+    producer_task = asyncio.create_task(produce_all())
     try:
-        # Generate embedding
-        with PILImage.open(image_path) as img:
-            embedding = await generate_image_embedding(img)
-        
-        # Store in ChromaDB
-        collection.upsert(
-            ids=[image_id],
-            embeddings=[embedding],
-            metadatas=[metadata]
-        )
+        await consumer()
+    finally:
+        if not producer_task.done():
+            producer_task.cancel()
+    
+    return indexed
+
+class ManifestDiff(NamedTuple):
+    """Result of diffing the monitored folders against the file manifest"""
+    added: List[str]
+    updated: List[str]
+    removed: List[ManifestEntry]
+    touched: List[ManifestEntry]  # stats changed but content identical; no re-embed needed
+    stats: Dict[str, Tuple[int, int, int]]  # path -> (size, mtime_ns, inode) for new/changed files
+
+def _walk_images(directory: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """Yield (absolute path, stat) for every image file under a directory"""
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.warning(f"Cannot read directory {current}: {str(e)}")
+            continue
+        
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield os.path.abspath(entry.path), entry.stat()
+            except OSError:
+                continue
+
+def _is_under(path: str, folder: str) -> bool:
+    """Check whether a path lies inside a folder"""
+    return path.startswith(folder.rstrip(os.sep) + os.sep)
+
+def _new_manifest_diff() -> ManifestDiff:
+    """Create an empty manifest diff"""
+    return ManifestDiff(added=[], updated=[], removed=[], touched=[], stats={})
+
+def _classify_file(path: str, st: os.stat_result, entry: Optional[ManifestEntry], diff: ManifestDiff) -> None:
+    """Record how a file on disk differs from its manifest entry"""
+    stat_key = (st.st_size, st.st_mtime_ns, st.st_ino)
+    if entry is None:
+        diff.added.append(path)
+        diff.stats[path] = stat_key
+    elif (entry.size, entry.mtime_ns, entry.inode) != stat_key:
+        # Touched or copied over with the same bytes: refresh stats, keep the embedding. A file
+        # that vanished or is locked since the walk hashes to None and is treated as updated
+        if entry.content_hash and entry.size == st.st_size and try_compute_content_hash(path) == entry.content_hash:
+            diff.touched.append(entry._replace(size=st.st_size, mtime_ns=st.st_mtime_ns, inode=st.st_ino))
+        else:
+            diff.updated.append(path)
+            diff.stats[path] = stat_key
+
+def scan_directory(
+    directory: str,
+    known: Dict[str, ManifestEntry],
+    seen: Set[str],
+    diff: ManifestDiff
+) -> None:
+    """Stat every image under a directory and record how it differs from the manifest"""
+    for path, st in _walk_images(directory):
+        # Monitored folders may overlap
+        if path in seen:
+            continue
+        seen.add(path)
+        _classify_file(path, st, known.get(path), diff)
+
+def _diff_against_manifest(folders: List[str], known: Dict[str, ManifestEntry]) -> ManifestDiff:
+    """Diff the monitored folders against the manifest (blocking; runs on the storage executor)"""
+    diff = _new_manifest_diff()
+    seen: Set[str] = set()
+    unreachable: List[str] = []
+    
+    for folder in folders:
+        if not os.path.exists(folder) or not os.path.isdir(folder):
+            logger.warning(f"Folder does not exist or is not accessible: {folder}")
+            unreachable.append(os.path.abspath(folder))
+            continue
         
-        logger.debug(f"Indexed image: {image_path}")
-        return image_id, metadata
+        logger.info(f"Scanning folder: {folder}")
+        scan_directory(folder, known, seen, diff)
     
-    except Exception as e:
-        logger.error(f"Failed to index image {image_path}: {str(e)}")
-        raise
+    # A folder that is temporarily unreachable (e.g. an unmounted share) must not wipe its index
+    diff.removed.extend(
+        entry for path, entry in known.items()
+        if path not in seen and not any(_is_under(path, folder) for folder in unreachable)
+    )
+    return diff
 
-async def scan_directory(directory: str, collection, processed_paths: Set[str]) -> List[str]:
-    """Scan a directory for images and index them"""
-    indexed_files = []
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
+def _diff_changed_paths(paths: Iterable[str], manifest: ManifestRepository) -> ManifestDiff:
+    """Diff only the given paths against the manifest, without walking the monitored folders.
+
+    Paths come from filesystem events: a path that no longer exists removes its entry
+    (and everything under it, for deleted or moved-away directories); a directory that
+    appeared is walked on its own.
+    """
+    diff = _new_manifest_diff()
+    seen: Set[str] = set()
+    
+    for path in {os.path.abspath(p) for p in paths}:
+        try:
+            if os.path.isdir(path):
+                # Directory created or moved in: only its own subtree is walked
+                known = {entry.path: entry for entry in manifest.entries_under(path)}
+                for file_path, st in _walk_images(path):
+                    if file_path not in seen:
+                        seen.add(file_path)
+                        _classify_file(file_path, st, known.get(file_path), diff)
+                diff.removed.extend(entry for entry in known.values() if entry.path not in seen)
+            elif os.path.isfile(path):
+                if path in seen or os.path.splitext(path)[1].lower() not in IMAGE_EXTENSIONS:
+                    continue
+                seen.add(path)
+                _classify_file(path, os.stat(path), manifest.get_entries([path]).get(path), diff)
+            else:
+                # Deleted or moved away: drop the file itself or everything that was under the directory
+                diff.removed.extend(manifest.get_entries([path]).values())
+                diff.removed.extend(manifest.entries_under(path))
+        except OSError as e:
+            logger.warning(f"Cannot stat changed path {path}: {str(e)}")
     
+    return diff
+
+def _hash_files_blocking(pool: ProcessPoolExecutor, image_paths: List[str]) -> Dict[str, Optional[str]]:
+    """Fingerprint files across the decode pool (blocking; runs on the storage executor)"""
+    return dict(zip(image_paths, pool.map(try_compute_content_hash, image_paths, chunksize=HASH_CHUNK_FILES)))
+
+def _file_metadata_blocking(image_paths: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Read filesystem metadata for several files, skipping any that vanished"""
+    metadata = {}
+    for image_path in image_paths:
+        try:
+            metadata[image_path] = extract_file_metadata(image_path)
+        except OSError as e:
+            logger.warning(f"Cannot stat {image_path}: {str(e)}")
+    return metadata
+
+async def _reuse_embeddings(
+    collection,
+    hashes: Dict[str, str],
+    sources: Dict[str, str],
+    batch_size: int,
+    stats: Dict[str, Any]
+) -> Tuple[List[Tuple[str, Dict[str, Any]]], Dict[str, str]]:
+    """Index files whose content already has a stored embedding by copying it instead of running CLIP.
+
+    `hashes` maps paths to their content fingerprint and `sources` maps fingerprints to the
+    image ID holding that embedding. Returns the indexed (image_id, metadata) pairs and the
+    path -> fingerprint mapping of files that still need embedding.
+    """
+    remaining = {path: content_hash for path, content_hash in hashes.items() if content_hash not in sources}
+    reusable = [(path, content_hash) for path, content_hash in hashes.items() if content_hash in sources]
+    indexed: List[Tuple[str, Dict[str, Any]]] = []
+    
+    for start in range(0, len(reusable), max(1, batch_size)):
+        chunk = reusable[start:start + max(1, batch_size)]
+        try:
+            stored = await collection.get_async(
+                ids=sorted({sources[content_hash] for _, content_hash in chunk}),
+                include=["embeddings", "metadatas"]
+            )
+            by_id = {
+                image_id: (embedding, metadata)
+                for image_id, embedding, metadata in zip(stored["ids"], stored["embeddings"], stored["metadatas"])
+            }
+            file_metadata = await run_storage(_file_metadata_blocking, [path for path, _ in chunk])
+            
+            ids, embeddings, metadatas = [], [], []
+            for path, content_hash in chunk:
+                source = by_id.get(sources[content_hash])
+                if source is None or path not in file_metadata:
+                    # Source vector is gone; fall back to embedding the file
+                    remaining[path] = content_hash
+                    continue
+                embedding, source_metadata = source
+                # Same bytes, so image dimensions and EXIF carry over; only file details differ
+                metadata = {**(source_metadata or {}), **file_metadata[path]}
+                metadata["content_hash"] = content_hash
+                metadata["last_indexed"] = datetime.now().isoformat()
+                ids.append(_image_id_for_path(path))
+                embeddings.append(np.asarray(embedding, dtype=np.float32).tolist())
+                metadatas.append(metadata)
+            
+            if ids:
+                upsert_start = time.perf_counter()
+                await collection.upsert_async(ids=ids, embeddings=embeddings, metadatas=metadatas)
+                stats['upsert_seconds'] += time.perf_counter() - upsert_start
+                stats['reused'] += len(ids)
+                indexed.extend(zip(ids, metadatas))
+        except Exception as e:
+            logger.error(f"Failed to reuse embeddings for {len(chunk)} images: {str(e)}")
+            remaining.update(chunk)
+    
+    return indexed, remaining
+
+async def _apply_manifest_diff(
+    collection,
+    manifest: ManifestRepository,
+    diff: ManifestDiff,
+    batch_size: int,
+    stats: Dict[str, Any],
+    model_type: ModelType = ModelType.DEFAULT,
+    backend: Optional[str] = None
+) -> List[str]:
+    """Embed new and changed files, refresh the manifest and drop vectors for removed files.
+
+    Files are fingerprinted first: content that is already embedded under another path
+    (moved, renamed or copied files) reuses the stored vector, and identical new files
+    are embedded only once.
+    """
+    pending = diff.added + diff.updated
     try:
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if os.path.splitext(file)[1].lower() in image_extensions:
-                    full_path = os.path.abspath(os.path.join(root, file))
-                    
-                    # Skip already processed files
-                    if full_path in processed_paths:
-                        continue
-                    
-                    try:
-                        image_id, _ = await index_image(full_path, collection)
-                        indexed_files.append(image_id)
-                        processed_paths.add(full_path)
-                    except Exception as e:
-                        logger.error(f"Error indexing {full_path}: {str(e)}")
-    except Exception as e:
-        logger.error(f"Error scanning directory {directory}: {str(e)}")
+        hashes = await run_storage(_hash_files_blocking, get_decode_pool(), pending) if pending else {}
+        fingerprinted = {path: content_hash for path, content_hash in hashes.items() if content_hash}
+        
+        # Must run before removed entries are deleted, so renames find their old vectors
+        known = await run_storage(manifest.find_by_hashes, set(fingerprinted.values()))
+        results, remaining = await _reuse_embeddings(
+            collection, fingerprinted, {content_hash: entry.image_id for content_hash, entry in known.items()},
+            batch_size, stats
+        )
+        
+        # Embed one file per new fingerprint; unreadable files go through so failures are counted
+        representatives: Dict[str, str] = {}
+        for path, content_hash in remaining.items():
+            representatives.setdefault(content_hash, path)
+        to_embed = list(representatives.values()) + [path for path in pending if path not in fingerprinted]
+        embedded = await run_indexing_pipeline(to_embed, collection, batch_size, stats, model_type, backend)
+        results.extend(embedded)
+        
+        # Copies of a file embedded in this run reuse its fresh vector
+        copies = {path: content_hash for path, content_hash in remaining.items() if representatives[content_hash] != path}
+        if copies:
+            fresh = {metadata.get("content_hash"): image_id for image_id, metadata in embedded}
+            copied, _ = await _reuse_embeddings(collection, copies, fresh, batch_size, stats)
+            results.extend(copied)
+        
+        indexed_files = [image_id for image_id, _ in results]
+        entries = [
+            ManifestEntry(metadata["filepath"], *diff.stats[metadata["filepath"]], metadata.get("content_hash"), image_id)
+            for image_id, metadata in results
+        ]
+        entries.extend(diff.touched)
+        if entries:
+            await run_storage(manifest.upsert_entries, entries)
+        
+        # The scan just stat-ed these files, so searches needn't
+        get_stat_cache().record_many(diff.stats.keys(), True)
+        get_stat_cache().record_many((entry.path for entry in diff.touched), True)
+        
+        # Drop vectors and manifest rows for files that disappeared
+        if diff.removed:
+            await collection.delete_async([entry.image_id for entry in diff.removed])
+            await run_storage(manifest.delete_paths, [entry.path for entry in diff.removed])
+            get_stat_cache().record_many((entry.path for entry in diff.removed), False)
+    finally:
+        # Invalidate cached search results whenever the index may have changed
+        if pending or diff.removed:
+            bump_index_generation(manifest.profile_id, manifest.suffix)
     
     return indexed_files
 
-async def check_for_new_images(profile_id: str, force: bool = False) -> List[str]:
-    """Check monitored folders for new images and index them"""
+def _bootstrap_manifest(collection, manifest: ManifestRepository) -> Dict[str, ManifestEntry]:
+    """Seed an empty manifest from the image metadata already stored in ChromaDB.
+
+    Files whose size and modification time still match their metadata are trusted;
+    anything else is recorded with sentinel stats so the next diff re-embeds it.
+    """
+    results = collection.get(include=["metadatas"])
+    entries = []
+    if results and results.get("ids"):
+        for image_id, metadata in zip(results["ids"], results["metadatas"]):
+            path = metadata.get("filepath")
+            if not path:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                st = None
+            
+            if (st is not None and st.st_size == metadata.get("filesize")
+                    and datetime.fromtimestamp(st.st_mtime).isoformat() == metadata.get("modified_date")):
+                entries.append(ManifestEntry(path, st.st_size, st.st_mtime_ns, st.st_ino, metadata.get("content_hash"), image_id))
+            else:
+                entries.append(ManifestEntry(path, -1, -1, -1, None, image_id))
+    
+    if entries:
+        manifest.upsert_entries(entries)
+        logger.info(f"Seeded file manifest for profile {manifest.profile_id} with {len(entries)} entries")
+    return {entry.path: entry for entry in entries}
+
+def _get_profile_lock(profile_id: str) -> asyncio.Lock:
+    """Lock serializing index writes (full rescans and watcher updates) for a profile"""
+    if profile_id not in _profile_locks:
+        _profile_locks[profile_id] = asyncio.Lock()
+    return _profile_locks[profile_id]
+
+async def _open_manifest(
+    profile_id: str,
+    collection,
+    model_type: ModelType = ModelType.DEFAULT,
+    backend: Optional[str] = None
+) -> ManifestRepository:
+    """Open the file manifest of a profile's index for a model and encoder backend, seeding it from ChromaDB the first time"""
+    manifest = await run_storage(get_manifest, profile_id, index_suffix(model_type, backend))
+    if await run_storage(manifest.count) == 0:
+        await run_storage(_bootstrap_manifest, collection, manifest)
+    return manifest
+
+async def check_for_new_images(
+    profile_id: str,
+    force: bool = False,
+    batch_size: int = INDEXING_BATCH_SIZE
+) -> List[str]:
+    """Rescan monitored folders against the file manifest, indexing new and changed
+    images and removing vectors for deleted ones"""
     global indexing_tasks
     
     # Don't start new indexing if already in progress for this profile
@@ -123,55 +570,76 @@ async def check_for_new_images(profile_id: str, force: bool = False) -> List[str
         return []
     
     # Set indexing state
+    pipeline_stats = _new_pipeline_stats()
     async with indexing_lock:
-        indexing_tasks[profile_id] = {'running': True, 'start_time': time.time()}
+        # Updated in place: migration progress and the last change-driven update live here too
+        status = indexing_tasks.setdefault(profile_id, {})
+        status.pop('end_time', None)
+        status.update(running=True, start_time=time.time(), pipeline=pipeline_stats)
     
     try:
-        # Get monitored folders from profile settings (global settings collection)
-        settings_collection = await get_settings_collection()
-        settings = settings_collection.find_one({"profile_id": profile_id})
-        
-        if not settings or "monitored_folders" not in settings:
-            logger.warning(f"No monitored folders found for profile {profile_id}")
-            return []
-        
-        monitored_folders = settings.get("monitored_folders", [])
-        if not monitored_folders:
-            logger.info(f"No folders to monitor for profile {profile_id}")
-            return []
-        
-        # Get the images collection
-        collection = await get_chroma_collection(f"{profile_id}_images")
-        
-        # Get all existing image paths
-        existing_results = collection.get(include=["metadatas"])
-        processed_paths = set()
-        if existing_results and "metadatas" in existing_results:
-            for metadata in existing_results["metadatas"]:
-                if "filepath" in metadata:
-                    processed_paths.add(metadata["filepath"])
-        
-        # Scan each monitored folder
-        indexed_files = []
-        for folder in monitored_folders:
-            if not os.path.exists(folder) or not os.path.isdir(folder):
-                logger.warning(f"Folder does not exist or is not accessible: {folder}")
-                continue
+        # Serialize with watcher-driven updates for the same profile
+        async with _get_profile_lock(profile_id):
+            # Get monitored folders from profile settings
+            settings = await run_storage(get_metadata_store().get_settings, profile_id)
             
-            logger.info(f"Scanning folder: {folder}")
-            folder_files = await scan_directory(folder, collection, processed_paths)
-            indexed_files.extend(folder_files)
-        
-        # Update last indexed timestamp
-        if settings:
-            current_time = datetime.now()
-            settings_collection.update_one(
-                {"profile_id": profile_id},
-                {"$set": {"last_indexed": current_time.isoformat()}}
+            if not settings or "monitored_folders" not in settings:
+                logger.warning(f"No monitored folders found for profile {profile_id}")
+                return []
+            
+            monitored_folders = settings.get("monitored_folders", [])
+            if not monitored_folders:
+                logger.info(f"No folders to monitor for profile {profile_id}")
+                return []
+            
+            # Get the images collection and the file manifest of the index the profile searches
+            model_type, backend = await get_profile_index_model(profile_id)
+            collection = await get_images_collection(profile_id, model_type, backend)
+            manifest = await _open_manifest(profile_id, collection, model_type, backend)
+            known = await run_storage(manifest.load)
+            
+            # Diff filesystem state against the manifest
+            scan_start = time.time()
+            diff = await run_storage(_diff_against_manifest, monitored_folders, known)
+            
+            indexed_files = await _apply_manifest_diff(
+                collection, manifest, diff, batch_size, pipeline_stats, model_type, backend
             )
-        
-        logger.info(f"Indexing completed for profile {profile_id}. Indexed {len(indexed_files)} new files.")
-        return indexed_files
+            
+            # Record change counts and throughput for this run
+            elapsed = time.time() - scan_start
+            images_per_second = len(indexed_files) / elapsed if elapsed > 0 else 0.0
+            indexing_tasks[profile_id].update({
+                'added': len(diff.added),
+                'updated': len(diff.updated),
+                'removed': len(diff.removed),
+                'indexed_count': len(indexed_files),
+                'reused_count': pipeline_stats['reused'],
+                'batch_size': batch_size,
+                'elapsed_seconds': round(elapsed, 3),
+                'images_per_second': round(images_per_second, 2),
+                'model': model_type.value,
+                'encoder_backend': backend,
+            })
+            
+            # Re-embed the library in the background if the profile switched models or
+            # its model's encoder backend was reconfigured
+            if index_suffix(_configured_model(settings)) != index_suffix(model_type, backend):
+                start_index_migration(profile_id, _configured_model(settings))
+            
+            # Update last indexed timestamp
+            if settings:
+                current_time = datetime.now()
+                await run_storage(
+                    get_metadata_store().update_settings, profile_id, {"last_indexed": current_time.isoformat()}
+                )
+            
+            logger.info(
+                f"Indexing completed for profile {profile_id}: {len(diff.added)} added, "
+                f"{len(diff.updated)} updated, {len(diff.removed)} removed. Indexed {len(indexed_files)} files "
+                f"({pipeline_stats['reused']} reused existing embeddings) in {elapsed:.1f}s ({images_per_second:.2f} images/sec, batch size {batch_size})."
+            )
+            return indexed_files
     
     except Exception as e:
         logger.error(f"Error during indexing for profile {profile_id}: {str(e)}")
@@ -184,6 +652,195 @@ async def check_for_new_images(profile_id: str, force: bool = False) -> List[str
                 indexing_tasks[profile_id]['running'] = False
                 indexing_tasks[profile_id]['end_time'] = time.time()
 
+async def index_changed_paths(
+    profile_id: str,
+    paths: Iterable[str],
+    batch_size: int = INDEXING_BATCH_SIZE
+) -> List[str]:
+    """Apply filesystem changes reported by the folder watcher without walking the monitored folders"""
+    stats = _new_pipeline_stats()
+    try:
+        async with _get_profile_lock(profile_id):
+            model_type, backend = await get_profile_index_model(profile_id)
+            collection = await get_images_collection(profile_id, model_type, backend)
+            manifest = await _open_manifest(profile_id, collection, model_type, backend)
+            diff = await run_storage(_diff_changed_paths, list(paths), manifest)
+            indexed_files = await _apply_manifest_diff(collection, manifest, diff, batch_size, stats, model_type, backend)
+        
+        async with indexing_lock:
+            status = indexing_tasks.setdefault(profile_id, {'running': False})
+            status['last_change_update'] = {
+                'time': time.time(),
+                'added': len(diff.added),
+                'updated': len(diff.updated),
+                'removed': len(diff.removed),
+                'indexed_count': len(indexed_files),
+                'pipeline': stats,
+            }
+        
+        logger.info(
+            f"Applied file changes for profile {profile_id}: {len(diff.added)} added, "
+            f"{len(diff.updated)} updated, {len(diff.removed)} removed"
+        )
+        return indexed_files
+    except Exception as e:
+        logger.error(f"Error applying file changes for profile {profile_id}: {str(e)}")
+        return []
+
+def _configured_model(settings: Optional[Dict[str, Any]]) -> ModelType:
+    """Image model chosen in a profile's settings"""
+    try:
+        return ModelType((settings or {}).get("vlm_model") or ModelType.DEFAULT)
+    except ValueError:
+        return ModelType.DEFAULT
+
+async def migrate_profile_index(profile_id: str, batch_size: int = INDEXING_BATCH_SIZE) -> List[str]:
+    """Re-embed a profile's library with the model chosen in its settings, on that model
+    tier's configured encoder backend; a backend change alone re-embeds too.
+
+    The new model's vectors go to their own collection and manifest while searches keep
+    using the current index. The bulk pass runs without the profile lock, since only this
+    job writes the new index; a final catch-up pass under the lock picks up files changed
+    in the meantime, and then the profile's searches switch to the new index. Earlier
+    models' indexes are kept, so switching back only has to catch up on changes.
+    """
+    stats = _new_pipeline_stats()
+    async with indexing_lock:
+        status = indexing_tasks.setdefault(profile_id, {'running': False})
+    try:
+        settings = await run_storage(get_metadata_store().get_settings, profile_id) or {}
+        target = _configured_model(settings)
+        target_backend = get_encoder_backend(target)
+        current, current_backend = await get_profile_index_model(profile_id)
+        if index_suffix(target, target_backend) == index_suffix(current, current_backend):
+            if (target, target_backend) != (current, current_backend):
+                # Tiers sharing a model and backend share its index, so there is nothing to re-embed
+                await run_storage(set_profile_index_model, profile_id, target, target_backend)
+            return []
+        
+        status['migration'] = {
+            'running': True,
+            'from': current.value,
+            'to': target.value,
+            'from_backend': current_backend,
+            'to_backend': target_backend,
+            'model': IMAGE_MODELS[target],
+            'start_time': time.time(),
+            'pipeline': stats,
+        }
+        logger.info(f"Re-embedding profile {profile_id} with {IMAGE_MODELS[target]} on {target_backend}")
+        
+        folders = settings.get("monitored_folders", [])
+        collection = await get_images_collection(profile_id, target, target_backend)
+        manifest = await _open_manifest(profile_id, collection, target, target_backend)
+        known = await run_storage(manifest.load)
+        diff = await run_storage(_diff_against_manifest, folders, known)
+        indexed_files = await _apply_manifest_diff(collection, manifest, diff, batch_size, stats, target, target_backend)
+        
+        async with _get_profile_lock(profile_id):
+            known = await run_storage(manifest.load)
+            diff = await run_storage(_diff_against_manifest, folders, known)
+            indexed_files += await _apply_manifest_diff(collection, manifest, diff, batch_size, stats, target, target_backend)
+            await run_storage(set_profile_index_model, profile_id, target, target_backend)
+        
+        status['migration'].update({'indexed_count': len(indexed_files), 'completed': True})
+        logger.info(
+            f"Profile {profile_id} now searches with {IMAGE_MODELS[target]}: "
+            f"{len(indexed_files)} images embedded ({stats['reused']} reused)"
+        )
+        return indexed_files
+    except asyncio.CancelledError:
+        logger.info(f"Re-embedding of profile {profile_id} cancelled")
+        raise
+    except Exception as e:
+        logger.error(f"Error re-embedding profile {profile_id}: {str(e)}")
+        if 'migration' in status:
+            status['migration']['error'] = str(e)
+        return []
+    finally:
+        if 'migration' in status:
+            status['migration']['running'] = False
+            status['migration']['end_time'] = time.time()
+
+def start_index_migration(profile_id: str, target: ModelType) -> None:
+    """Re-embed a profile's library with its configured model, `target`, in the background.
+
+    A run already migrating to `target` is left alone; one migrating to another model is
+    replaced (the model choice changed again).
+    """
+    task = _migration_tasks.get(profile_id)
+    if task is not None and not task.done():
+        if _migration_targets.get(profile_id) == target:
+            return
+        task.cancel()
+    task = asyncio.get_running_loop().create_task(migrate_profile_index(profile_id))
+    _migration_tasks[profile_id] = task
+    _migration_targets[profile_id] = target
+    task.add_done_callback(lambda done: _migration_tasks.pop(profile_id, None) if _migration_tasks.get(profile_id) is done else None)
+
+async def get_duplicate_groups(profile_id: str, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+    """Report groups of byte-identical images in a profile's monitored folders"""
+    model_type, backend = await get_profile_index_model(profile_id)
+    manifest = await run_storage(get_manifest, profile_id, index_suffix(model_type, backend))
+    groups = await run_storage(manifest.duplicate_groups, limit, offset)
+    total = await run_storage(manifest.count_duplicate_groups)
+    
+    return {
+        "profile_id": profile_id,
+        "total_groups": total,
+        "groups": [
+            {
+                "content_hash": group[0].content_hash,
+                "count": len(group),
+                "size": group[0].size,
+                "wasted_bytes": (len(group) - 1) * max(group[0].size, 0),
+                "files": [{"id": entry.image_id, "path": entry.path} for entry in group],
+            }
+            for group in groups
+        ],
+    }
+
+# Text queries of the encoder accuracy check when none are given
+ENCODER_CHECK_QUERIES = (
+    "a photo of a person", "a landscape with mountains", "a dog",
+    "food on a plate", "a screenshot of text", "a city street at night",
+)
+
+async def check_encoder_accuracy(
+    profile_id: str,
+    backend: str = "onnx-int8",
+    sample: int = 64,
+    k: int = 10,
+    queries: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """Compare an ONNX encoder backend with PyTorch on a random sample of a profile's indexed images"""
+    model_type, index_backend = await get_profile_index_model(profile_id)
+    manifest = await run_storage(get_manifest, profile_id, index_suffix(model_type, index_backend))
+    paths = list(await run_storage(manifest.load))
+    paths = random.sample(paths, min(sample, len(paths)))
+    
+    config = await run_inference(get_image_preprocess_config, model_type, index_backend)
+    loop = asyncio.get_running_loop()
+    decoded = await asyncio.gather(
+        *(loop.run_in_executor(get_decode_pool(), decode_image_for_embedding, path, config) for path in paths),
+        return_exceptions=True
+    )
+    pixel_values = [item.pixel_values for item in decoded if isinstance(item, DecodedImage)]
+    if not pixel_values:
+        raise ValueError(f"Profile {profile_id} has no readable indexed images to sample")
+    
+    report = await run_inference(
+        compare_encoder_backends, np.stack(pixel_values), list(queries or ENCODER_CHECK_QUERIES), model_type, backend, k
+    )
+    return {"profile_id": profile_id, **report}
+
+def get_indexing_status(profile_id: str) -> Dict[str, Any]:
+    """Get the state and statistics of the latest indexing run for a profile"""
+    status = indexing_tasks.get(profile_id)
+    if not status:
+        return {"profile_id": profile_id, "running": False}
+    return {"profile_id": profile_id, **status}
+
 async def index_all_profiles():
     """Run indexing for all profiles"""
     profiles = await get_profiles()
@@ -191,19 +848,3 @@ async def index_all_profiles():
     for profile in profiles:
         logger.info(f"Starting indexing for profile: {profile.name} ({profile.id})")
         await check_for_new_images(profile.id)
-
-def start_indexing_scheduler():
-    """Start a background task that periodically checks for new images"""
-    async def indexing_task():
-        while True:
-            try:
-                await index_all_profiles()
-            except Exception as e:
-                logger.error(f"Error in indexing scheduler: {str(e)}")
-            
-            # Sleep for an hour before next check
-            await asyncio.sleep(3600)  # 1 hour
-    
-    # Start background task
-    asyncio.create_task(indexing_task())
-    logger.info("Started background indexing scheduler")
@@ -2,10 +2,14 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
 from app.models.search_model import Session, SearchQuery
-from app.utils.database import get_sessions_collection, get_profile_collection
+from app.database.metadata_store import get_metadata_store
+from app.utils.executors import run_storage
 
 logger = logging.getLogger(__name__)
 
+# Queries made within this many seconds of a session's last update are added to it
+SESSION_IDLE_SECONDS = 3600
+
 async def get_sessions(
     profile_id: str,
     skip: int = 0,
@@ -15,25 +19,15 @@ async def get_sessions(
     sort_order: str = "desc"
 ) -> List[Session]:
     """Get all search sessions for a user profile with filtering and sorting"""
-    collection = await get_sessions_collection()
-    
-    # Build query
-    query = {"profile_id": profile_id}
-    
-    # Add search term filter if provided
-    if search_term:
-        query["$or"] = [
-            {"name": {"$regex": search_term, "$options": "i"}},
-            {"queries.text": {"$regex": search_term, "$options": "i"}}
-        ]
-    
-    # Set sort order
-    sort_direction = -1 if sort_order.lower() == "desc" else 1
-    sort_options = {sort_by: sort_direction}
-    
-    # Execute query
-    cursor = collection.find(query).sort(sort_options).skip(skip).limit(limit)
-    sessions_data = await cursor.to_list(length=limit)
+    sessions_data = await run_storage(
+        get_metadata_store().list_sessions,
+        profile_id,
+        skip,
+        limit,
+        search_term,
+        sort_by,
+        sort_order
+    )
     
     # Convert to model objects
     sessions = [Session(**session_data) for session_data in sessions_data]
@@ -41,8 +35,7 @@ async def get_sessions(
 
 async def get_session(profile_id: str, session_id: str) -> Optional[Session]:
     """Get a specific search session"""
-    collection = await get_sessions_collection()
-    session_data = await collection.find_one({"profile_id": profile_id, "id": session_id})
+    session_data = await run_storage(get_metadata_store().get_session, profile_id, session_id)
     
     if session_data:
         return Session(**session_data)
@@ -50,8 +43,6 @@ async def get_session(profile_id: str, session_id: str) -> Optional[Session]:
 
 async def create_session(profile_id: str, session: Session) -> Session:
     """Create a new search session"""
-    collection = await get_sessions_collection()
-    
     # Set profile_id if not already set
     if not session.profile_id:
         session.profile_id = profile_id
@@ -60,59 +51,41 @@ async def create_session(profile_id: str, session: Session) -> Session:
     if not session.name and session.queries:
         session.name = session.get_preview_text()
     
-    session_dict = session.dict()
-    await collection.insert_one(session_dict)
+    await run_storage(get_metadata_store().save_session, session.dict())
     
     return session
 
 async def update_session(profile_id: str, session_id: str, updates: Dict[str, Any]) -> Optional[Session]:
     """Update an existing search session"""
-    collection = await get_sessions_collection()
-    
-    # Add updated_at timestamp
-    updates["updated_at"] = datetime.now()
+    session = await get_session(profile_id, session_id)
+    if not session:
+        return None
     
-    result = await collection.find_one_and_update(
-        {"profile_id": profile_id, "id": session_id},
-        {"$set": updates},
-        return_document=True
-    )
+    session_dict = session.dict()
+    session_dict.update(updates)
+    session_dict["updated_at"] = datetime.now()
+    session = Session(**session_dict)
     
-    if result:
-        return Session(**result)
-    return None
+    await run_storage(get_metadata_store().save_session, session.dict())
+    return session
 
 async def delete_session(profile_id: str, session_id: str) -> bool:
     """Delete a search session"""
-    collection = await get_sessions_collection()
-    result = await collection.delete_one({"profile_id": profile_id, "id": session_id})
-    return result.deleted_count > 0
+    return await run_storage(get_metadata_store().delete_session, profile_id, session_id)
 
 async def save_search_query(profile_id: str, query: SearchQuery, result_ids: List[str]) -> Session:
     """Save a search query to history and create or update a session"""
-    collection = await get_sessions_collection()
+    store = get_metadata_store()
     
     # Check if there's an active session for this profile
-    active_session = await collection.find_one(
-        {"profile_id": profile_id},
-        sort=[("updated_at", -1)]
-    )
+    active_session = await run_storage(store.get_latest_session, profile_id)
     
-    if active_session and (datetime.now() - active_session["updated_at"]).total_seconds() < 3600:
+    if active_session and (datetime.now() - datetime.fromisoformat(active_session["updated_at"])).total_seconds() < SESSION_IDLE_SECONDS:
         # Update existing session if less than an hour old
         session = Session(**active_session)
         session.queries.append(query)
         session.result_ids.extend(result_ids)
         session.updated_at = datetime.now()
-        
-        await collection.update_one(
-            {"id": session.id},
-            {"$set": {
-                "queries": [q.dict() for q in session.queries],
-                "result_ids": session.result_ids,
-                "updated_at": session.updated_at
-            }}
-        )
     else:
         # Create a new session
         session = Session(
@@ -123,7 +96,7 @@ async def save_search_query(profile_id: str, query: SearchQuery, result_ids: Lis
         
         # Generate name from query
         session.name = session.get_preview_text()
-        
-        await collection.insert_one(session.dict())
+    
+    await run_storage(store.save_session, session.dict())
     
     return session
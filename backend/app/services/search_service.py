@@ -1,409 +1,332 @@
-from typing import List, Optional, Dict, Any, Union, Tuple
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator
 import os
-import tempfile
-import numpy as np
-from PIL import Image as PILImage
-from io import BytesIO
+from pathlib import Path
+from collections import OrderedDict
 from datetime import datetime
 import logging
-from app.models.image_model import Image, ImageMetadata, ImageSearchResult
 from app.models.profiles_model import ModelType
-from app.utils.database import get_chroma_collection, get_settings_collection, get_profile_collection
-from app.utils.embeddings import (
-    get_text_embedding_model, get_image_embedding_model,
-    generate_text_embedding, generate_image_embedding, 
-    combine_embeddings
-)
-from app.services.indexing_service import check_for_new_images
+from app.utils.database import get_index_generation, get_profile_index_model
+from app.utils.model_catalog import index_suffix
+from app.utils.embedding_cache import normalize_query_text
+from app.utils.image_preprocessing import compute_bytes_hash
+from app.utils.executors import run_storage
+from app.database.metadata_store import get_metadata_store
+from app.utils.embeddings import generate_query_embeddings, combine_embeddings
+from app.services.watcher_service import nudge_profile_indexing, get_index_freshness, verify_result_paths
+from app.utils.stat_cache import paths_exist
+from app.utils.rank_fusion import FUSION_METHODS, fuse_rankings
 from app.database.image_repository import ImageRepository
 from app.database.chat_repository import ChatRepository
 
 logger = logging.getLogger(__name__)
 
-async def search_by_text(query: str, profile_id: str, limit: int = 20) -> List[ImageSearchResult]:
-    """Search for images using a text query"""
-    # Get user settings for threshold
-    settings_collection = await get_settings_collection()
-    profile_settings = await settings_collection.find_one({"profile_id": profile_id})
-    similarity_threshold = profile_settings.get("similarity_threshold", 0.7) if profile_settings else 0.7
-    
-    # Check for any new images before performing search
-    await check_for_new_images(profile_id)
-    
-    # Generate text embedding
-    embedding = await generate_text_embedding(query)
-    
-    # Search in ChromaDB
-    collection = await get_chroma_collection("images")
-    results = collection.query(
-        query_embeddings=[embedding],
-        n_results=limit,
-        include=["metadatas", "distances"]
-    )
-    
-    # Process results
-    search_results = []
-    if results and 'ids' in results and len(results['ids']) > 0:
-        for i in range(len(results['ids'][0])):
-            image_id = results['ids'][0][i]
-            metadata = results['metadatas'][0][i]
-            distance = float(results['distances'][0][i]) if 'distances' in results else 1.0
-            
-            # Convert distance to similarity score (1.0 is exact match, 0.0 is completely different)
-            similarity_score = 1.0 - distance
-            
-            # Skip if below threshold
-            if similarity_score < similarity_threshold:
-                continue
-                
-            # Create ImageMetadata
-            img_metadata = ImageMetadata(**metadata)
-            
-            # Check if file still exists
-            exists = img_metadata.exists
-            
-            # Create Image object
-            image = Image(
-                id=image_id,
-                metadata=img_metadata,
-                embedding_id=f"embedding_{image_id}",
-                last_indexed=datetime.fromisoformat(metadata.get("last_indexed", datetime.now().isoformat()))
-            )
-            
-            # Add to results
-            search_results.append(ImageSearchResult(
-                image=image,
-                similarity_score=similarity_score,
-                exists=exists
-            ))
-    
-    # Sort by similarity score
-    search_results.sort(key=lambda x: x.similarity_score, reverse=True)
-    return search_results
+# Number of result lists kept in the search result cache; 0 disables it
+SEARCH_CACHE_SIZE = max(0, int(os.environ.get("LIF_SEARCH_CACHE_SIZE", "256")))
 
-async def search_by_image(image_content: bytes, profile_id: str, limit: int = 20) -> List[ImageSearchResult]:
-    """Search for images using an image input"""
-    # Get user settings
-    settings_collection = await get_settings_collection()
-    profile_settings = await settings_collection.find_one({"profile_id": profile_id})
-    similarity_threshold = profile_settings.get("similarity_threshold", 0.7) if profile_settings else 0.7
-    
-    # Check for any new images before performing search
-    await check_for_new_images(profile_id)
-    
-    # Generate image embedding
-    image = PILImage.open(BytesIO(image_content))
-    embedding = await generate_image_embedding(image)
-    
-    # Search in ChromaDB
-    collection = await get_chroma_collection("images")
-    results = collection.query(
-        query_embeddings=[embedding],
-        n_results=limit,
-        include=["metadatas", "distances"]
-    )
-    
-    # Process results (same logic as search_by_text)
-    search_results = []
-    if results and 'ids' in results and len(results['ids']) > 0:
-        for i in range(len(results['ids'][0])):
-            image_id = results['ids'][0][i]
-            metadata = results['metadatas'][0][i]
-            distance = float(results['distances'][0][i]) if 'distances' in results else 1.0
-            
-            similarity_score = 1.0 - distance
-            if similarity_score < similarity_threshold:
-                continue
-                
-            img_metadata = ImageMetadata(**metadata)
-            exists = img_metadata.exists
-            
-            image = Image(
-                id=image_id,
-                metadata=img_metadata,
-                embedding_id=f"embedding_{image_id}",
-                last_indexed=datetime.fromisoformat(metadata.get("last_indexed", datetime.now().isoformat()))
-            )
-            
-            search_results.append(ImageSearchResult(
-                image=image,
-                similarity_score=similarity_score,
-                exists=exists
-            ))
-    
-    search_results.sort(key=lambda x: x.similarity_score, reverse=True)
-    return search_results
+# (profile, index suffix, query kind, query fingerprint, limit, index generation) -> results
+_search_cache: "OrderedDict[Tuple[str, str, str, str, int, int], List[Dict[str, Any]]]" = OrderedDict()
+_search_cache_stats = {"hits": 0, "misses": 0}
+
+# How results for several query inputs are merged: "rrf", "weighted" or "vector"
+QUERY_FUSION = os.environ.get("LIF_QUERY_FUSION", "rrf").lower()
+if QUERY_FUSION not in FUSION_METHODS:
+    logger.warning(f"Unknown LIF_QUERY_FUSION {QUERY_FUSION!r}, using rrf")
+    QUERY_FUSION = "rrf"
+
+# Leading results returned as primary hits; the rest of a query's results are related
+PRIMARY_RESULT_COUNT = 5
+
+def _search_cache_key(
+    profile_id: str,
+    index_model: Tuple[ModelType, str],
+    kind: str,
+    fingerprint: str,
+    limit: int
+) -> Tuple[str, str, str, str, int, int]:
+    """Build a result cache key; the generation of the searched (model, backend) index
+    makes it stale as soon as that index is written"""
+    suffix = index_suffix(*index_model)
+    return (profile_id, suffix, kind, fingerprint, limit, get_index_generation(profile_id, suffix))
+
+def _get_cached_results(key: Tuple[str, str, str, str, int, int]) -> Optional[List[Dict[str, Any]]]:
+    """Look up cached search results, returning copies callers may modify"""
+    results = _search_cache.get(key)
+    if results is None:
+        _search_cache_stats["misses"] += 1
+        return None
+    _search_cache.move_to_end(key)
+    _search_cache_stats["hits"] += 1
+    return [dict(result) for result in results]
+
+def _cache_results(key: Tuple[str, str, str, str, int, int], results: List[Dict[str, Any]]) -> None:
+    """Store search results, dropping entries from older generations of the same index"""
+    # Empty lists may come from a swallowed query error, so they are not worth pinning
+    if SEARCH_CACHE_SIZE <= 0 or not results:
+        return
+    profile_id, suffix, generation = key[0], key[1], key[5]
+    for stale in [k for k in _search_cache if k[:2] == (profile_id, suffix) and k[5] != generation]:
+        del _search_cache[stale]
+    _search_cache[key] = [dict(result) for result in results]
+    while len(_search_cache) > SEARCH_CACHE_SIZE:
+        _search_cache.popitem(last=False)
+
+def get_search_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and occupancy of the search result cache"""
+    lookups = _search_cache_stats["hits"] + _search_cache_stats["misses"]
+    return {
+        "size": len(_search_cache),
+        "capacity": SEARCH_CACHE_SIZE,
+        **_search_cache_stats,
+        "hit_rate": round(_search_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
+
+async def _mark_existence(profile_id: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Set each result's `exists` flag from the stat cache, verifying unknown files in the
+    background when existence checks are deferred"""
+    exists, unverified = await paths_exist([result.get("path", "") for result in results])
+    for result, path_exists in zip(results, exists):
+        result["exists"] = path_exists
+    verify_result_paths(profile_id, unverified)
+    return results
 
 async def search_combined(
     text: Optional[str], 
     image_contents: List[bytes], 
     profile_id: str, 
     limit: int = 20
-) -> List[ImageSearchResult]:
+) -> List[Dict[str, Any]]:
     """Search using both text and image inputs"""
     # Get user settings
-    settings_collection = await get_settings_collection()
-    profile_settings = await settings_collection.find_one({"profile_id": profile_id})
+    profile_settings = await run_storage(get_metadata_store().get_settings, profile_id)
     similarity_threshold = profile_settings.get("similarity_threshold", 0.7) if profile_settings else 0.7
     
-    # Check for any new images before performing search
-    await check_for_new_images(profile_id)
+    # Bring the index up to date in the background; search the current index now
+    nudge_profile_indexing(profile_id)
     
-    # Generate embeddings
-    embeddings = []
-    
-    if text:
-        text_embedding = await generate_text_embedding(text)
-        embeddings.append(text_embedding)
-    
-    for img_content in image_contents:
-        image = PILImage.open(BytesIO(img_content))
-        img_embedding = await generate_image_embedding(image)
-        embeddings.append(img_embedding)
-    
-    # Combine embeddings if there are multiple
-    if len(embeddings) > 1:
-        final_embedding = combine_embeddings(embeddings)
-    else:
-        final_embedding = embeddings[0]
-    
-    # Search in ChromaDB
-    collection = await get_chroma_collection("images")
-    results = collection.query(
-        query_embeddings=[final_embedding],
-        n_results=limit,
-        include=["metadatas", "distances"]
-    )
+    if not text and not image_contents:
+        return []
     
-    # Process results
-    search_results = []
-    if results and 'ids' in results and len(results['ids']) > 0:
-        for i in range(len(results['ids'][0])):
-            image_id = results['ids'][0][i]
-            metadata = results['metadatas'][0][i]
-            distance = float(results['distances'][0][i]) if 'distances' in results else 1.0
-            
-            similarity_score = 1.0 - distance
-            if similarity_score < similarity_threshold:
-                continue
-                
-            img_metadata = ImageMetadata(**metadata)
-            exists = img_metadata.exists
-            
-            image = Image(
-                id=image_id,
-                metadata=img_metadata,
-                embedding_id=f"embedding_{image_id}",
-                last_indexed=datetime.fromisoformat(metadata.get("last_indexed", datetime.now().isoformat()))
-            )
-            
-            search_results.append(ImageSearchResult(
-                image=image,
-                similarity_score=similarity_score,
-                exists=exists
-            ))
+    image_repo = ImageRepository(profile_id)
+    await image_repo.initialize()
     
-    search_results.sort(key=lambda x: x.similarity_score, reverse=True)
+    # Embed every input in one inference call, then search with their normalized mean
+    embeddings = await generate_query_embeddings(text, image_contents, image_repo.model_type, image_repo.backend)
+    final_embedding = combine_embeddings(embeddings.tolist())
     
-    # Split into closest matches and related
-    closest_matches = search_results[:min(5, len(search_results))]
-    related = search_results[min(5, len(search_results)):]
+    results = await image_repo.search_by_embedding(final_embedding, limit)
+    results = [result for result in results if result["similarity_score"] >= similarity_threshold]
     
-    # Return both groups combined
-    return closest_matches + related
+    return await _mark_existence(profile_id, results)
 
-async def get_related_images(image_id: str, profile_id: str, limit: int = 10) -> List[ImageSearchResult]:
+async def get_related_images(image_id: str, profile_id: str, limit: int = 10) -> List[Dict[str, Any]]:
     """Get related images based on an existing image"""
     # Get the embedding for the image
-    collection = await get_chroma_collection("images")
-    results = collection.get(ids=[image_id], include=["embeddings", "metadatas"])
+    image_repo = ImageRepository(profile_id)
+    collection = await image_repo.initialize()
+    stored = await collection.get_async(ids=[image_id], include=["embeddings"])
     
-    if not results or not results["embeddings"] or len(results["embeddings"]) == 0:
+    if not stored or stored.get("embeddings") is None or len(stored["embeddings"]) == 0:
         return []
     
-    embedding = results["embeddings"][0]
+    # +1 because the original image will be included
+    results = await image_repo.search_by_embedding(list(stored["embeddings"][0]), limit + 1)
+    results = [result for result in results if result["id"] != image_id][:limit]
+    
+    return await _mark_existence(profile_id, results)
+
+def _query_cache_key(
+    profile_id: str,
+    index_model: Tuple[ModelType, str],
+    query_text: Optional[str],
+    image_data: List[bytes],
+    limit: int
+) -> Tuple[str, str, str, str, int, int]:
+    """Result cache key of a query; single-input queries share keys whatever the fusion method"""
+    parts = ([normalize_query_text(query_text)] if query_text else []) + [compute_bytes_hash(data) for data in image_data]
+    if len(parts) == 1:
+        return _search_cache_key(profile_id, index_model, "text" if query_text else "image", parts[0], limit)
+    return _search_cache_key(profile_id, index_model, f"fused:{QUERY_FUSION}", "|".join(parts), limit)
+
+async def _rank_query(
+    profile_id: str,
+    query_text: Optional[str],
+    image_data: List[bytes],
+    limit: int
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, str, str, str, int, int]]]:
+    """Rank the profile's index against a query without checking the result files.
+
+    Returns the ranked results and, unless they came from the result cache, the key to
+    cache them under once their files are checked.
+    """
+    # Bring the index up to date in the background; search the current index now
+    nudge_profile_indexing(profile_id)
+    
+    # Repeated searches against an unchanged index of the profile's model are served from the cache
+    model_type, backend = await get_profile_index_model(profile_id)
+    cache_key = _query_cache_key(profile_id, (model_type, backend), query_text, image_data, limit)
+    cached = _get_cached_results(cache_key)
+    if cached is not None:
+        return cached, None
     
-    # Use embedding to find similar images
-    similar_results = collection.query(
-        query_embeddings=[embedding],
-        n_results=limit + 1,  # +1 because the original image will be included
-        include=["metadatas", "distances"]
-    )
+    image_repo = ImageRepository(profile_id, model_type, backend)
+    await image_repo.initialize()
     
-    # Process results (excluding the original image)
-    search_results = []
-    if similar_results and 'ids' in similar_results and len(similar_results['ids']) > 0:
-        for i in range(len(similar_results['ids'][0])):
-            result_id = similar_results['ids'][0][i]
-            
-            # Skip the original image
-            if result_id == image_id:
-                continue
-                
-            metadata = similar_results['metadatas'][0][i]
-            distance = float(similar_results['distances'][0][i]) if 'distances' in similar_results else 1.0
-            
-            similarity_score = 1.0 - distance
-            
-            img_metadata = ImageMetadata(**metadata)
-            exists = img_metadata.exists
-            
-            image = Image(
-                id=result_id,
-                metadata=img_metadata,
-                embedding_id=f"embedding_{result_id}",
-                last_indexed=datetime.fromisoformat(metadata.get("last_indexed", datetime.now().isoformat()))
-            )
-            
-            search_results.append(ImageSearchResult(
-                image=image,
-                similarity_score=similarity_score,
-                exists=exists
-            ))
+    # Cached per input on normalized text or content hash; images decode straight to model size
+    embeddings = await generate_query_embeddings(query_text, image_data, model_type, backend)
     
-    return search_results[:limit]
+    if len(embeddings) == 1 or QUERY_FUSION == "vector":
+        results = await image_repo.search_by_embedding(combine_embeddings(embeddings.tolist()), limit)
+    else:
+        result_lists = await image_repo.search_by_embeddings(embeddings.tolist(), limit)
+        results = fuse_rankings(result_lists, QUERY_FUSION, limit)
+    logger.info(f"Search with {len(embeddings)} inputs found {len(results)} results for profile {profile_id}")
+    return results, cache_key
 
-async def search_by_text(profile_id: str, query_text: str, limit: int = 20) -> List[Dict[str, Any]]:
-    """Search for images using a text query"""
+async def search_by_query(profile_id: str, query_text: Optional[str], image_data: List[bytes], limit: int = 20) -> List[Dict[str, Any]]:
+    """Search with any mix of query text and encoded images.
+
+    All inputs are embedded in one inference call and searched with one vector query:
+    a multi-vector query whose result lists are rank-fused, or with the "vector" method
+    a single query on the normalized mean embedding.
+    """
     try:
-        # Always check for new images before search
-        await check_for_new_images(profile_id)
+        if not query_text and not image_data:
+            return []
         
-        # Generate embedding for the text query
-        embedding = await generate_text_embedding(query_text)
+        results, cache_key = await _rank_query(profile_id, query_text, image_data, limit)
         
-        # Use the repository for consistent access
-        image_repo = ImageRepository(profile_id)
-        await image_repo.initialize()
-        results = await image_repo.search_by_embedding(embedding, limit)
-
-        # Verify images still exist
-        verified_results = []
-        for result in results:
-            image_path = result.get("path", "")
-            result["exists"] = os.path.exists(image_path)
-            verified_results.append(result)
-
-        logger.info(f"Text search found {len(verified_results)} results for profile {profile_id}")
+        # Check files through the stat cache rather than one stat per result
+        verified_results = await _mark_existence(profile_id, results)
+        if cache_key:
+            _cache_results(cache_key, verified_results)
         return verified_results
         
     except Exception as e:
-        logger.error(f"Error searching by text: {str(e)}")
+        logger.error(f"Error searching: {str(e)}")
         return []
 
+async def search_by_text(profile_id: str, query_text: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Search for images using a text query"""
+    return await search_by_query(profile_id, query_text, [], limit)
+
 async def search_by_image(profile_id: str, image_path: str, limit: int = 20) -> List[Dict[str, Any]]:
-    """Search for similar images to a provided image"""
+    """Search for similar images to an image file"""
     try:
-        # Always check for new images before search
-        await check_for_new_images(profile_id)
-        
-        if not os.path.exists(image_path):
+        exists, _ = await paths_exist([image_path], defer=False)
+        if not exists[0]:
             raise FileNotFoundError(f"Image not found: {image_path}")
-        
-        # Generate embedding for the image
-        from PIL import Image as PILImage
-        with PILImage.open(image_path) as img:
-            embedding = await generate_image_embedding(img)
-        
-        # Use the repository for search
-        image_repo = ImageRepository(profile_id)
-        await image_repo.initialize()
-        results = await image_repo.search_by_embedding(embedding, limit)
-
-        # Verify images still exist
-        verified_results = []
-        for result in results:
-            result_path = result.get("path", "")
-            result["exists"] = os.path.exists(result_path)
-            verified_results.append(result)
-        
-        logger.info(f"Image search found {len(verified_results)} results for profile {profile_id}")
-        return verified_results
-        
+        data = await run_storage(Path(image_path).read_bytes)
     except Exception as e:
         logger.error(f"Error searching by image: {str(e)}")
         return []
+    return await search_by_image_bytes(profile_id, data, limit)
 
-async def process_search_query(profile_id: str, query_text: Optional[str] = None,
+async def search_by_image_bytes(profile_id: str, data: bytes, limit: int = 20) -> List[Dict[str, Any]]:
+    """Search for similar images to an encoded image held in memory"""
+    return await search_by_query(profile_id, None, [data], limit)
+
+async def stream_search_query(profile_id: str, query_text: Optional[str] = None,
                               image_paths: Optional[List[str]] = None,
-                              limit: int = 20) -> Dict[str, Any]:
-    """Process a search query with text and/or images and save to chat history"""
+                              limit: int = 20,
+                              image_data: Optional[List[bytes]] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """Run a search query, yielding `(event, data)` pairs as parts of the response are ready.
+
+    Query images are given as file paths or, for uploads, as encoded bytes that are decoded
+    in memory; all inputs are searched together by `search_by_query`. The first
+    `PRIMARY_RESULT_COUNT` results are sent as a "primary" event, the rest as a "related"
+    event, and a "session" event with the chat ID and index freshness follows once the query is
+    saved to chat history. Failures end the stream with an "error" event.
+
+    Only the primary results' files are checked before they are sent; the rest are checked,
+    sent and cached while the client paints the first hits, and the chat is saved last.
+    """
     try:
         query_content: Dict[str, Any] = {}
         if query_text:
             query_content["text"] = query_text
         if image_paths:
             query_content["image_paths"] = image_paths
-
-        # Run search
-        results: List[Dict[str, Any]] = []
-        if query_text:
-            text_results = await search_by_text(profile_id, query_text, limit)
-            results.extend(text_results)
-
+        if image_data:
+            query_content["uploaded_images"] = len(image_data)
+        
+        # Every input goes into one fused search
+        images = list(image_data or [])
         if image_paths:
-            for image_path in image_paths:
-                if os.path.exists(image_path):
-                    image_results = await search_by_image(profile_id, image_path, limit)
-                    results.extend(image_results)
-
-        # Deduplicate
-        seen: Dict[str, Dict[str, Any]] = {}
-        for r in results:
-            if r["id"] not in seen:
-                seen[r["id"]] = r
-        final_results = list(seen.values())[:limit]
-
+            # Answered from the stat cache where possible; misses are stat-ed on the storage executor
+            exists, _ = await paths_exist(image_paths, defer=False)
+            for image_path, path_exists in zip(image_paths, exists):
+                if path_exists:
+                    images.append(await run_storage(Path(image_path).read_bytes))
+        results, cache_key = [], None
+        if query_text or images:
+            try:
+                results, cache_key = await _rank_query(profile_id, query_text, images, limit)
+            except Exception as e:
+                logger.error(f"Error searching: {str(e)}")
+        
+        primary = await _mark_existence(profile_id, results[:PRIMARY_RESULT_COUNT])
+        yield "primary", {"results": primary}
+        related = await _mark_existence(profile_id, results[PRIMARY_RESULT_COUNT:])
+        if related:
+            yield "related", {"results": related}
+        final_results = primary + related
+        if cache_key:
+            _cache_results(cache_key, final_results)
+        
         # Persist chat session — failures here must not block search results
         chat_id: Optional[str] = None
         try:
             chat_repo = ChatRepository(profile_id)
             chat_id = await chat_repo.create_chat(title=query_text[:30] if query_text else "Image Search")
             if chat_id:
-                embedding = await generate_text_embedding(query_text) if query_text else None
-                await chat_repo.add_message(chat_id, "query", {"text": query_text or ""}, embedding)
+                await chat_repo.add_message(chat_id, "query", {"text": query_text or ""})
                 await chat_repo.add_message(chat_id, "result", {"count": len(final_results)})
         except Exception as chat_err:
             logger.warning(f"Chat persistence failed (non-fatal): {chat_err}")
-
+        
         logger.info(f"Search returned {len(final_results)} results for profile {profile_id}")
-        return {
+        yield "session", {
             "chat_id": chat_id or "",
-            "results": final_results,
             "query": query_content,
             "timestamp": datetime.now().isoformat(),
+            "index_freshness": get_index_freshness(profile_id),
         }
-
+    
     except Exception as e:
         logger.error(f"Error processing search query: {str(e)}")
-        return {"error": str(e)}
+        yield "error", {"error": str(e)}
+
+async def process_search_query(profile_id: str, query_text: Optional[str] = None,
+                              image_paths: Optional[List[str]] = None,
+                              limit: int = 20,
+                              image_data: Optional[List[bytes]] = None) -> Dict[str, Any]:
+    """Process a search query with text and/or images and save to chat history"""
+    results: List[Dict[str, Any]] = []
+    response: Dict[str, Any] = {}
+    async for event, data in stream_search_query(profile_id, query_text, image_paths, limit, image_data):
+        if event == "error":
+            return data
+        if event == "session":
+            response = data
+        else:
+            results.extend(data["results"])
+    return {**response, "results": results}
 
 async def get_image_details(profile_id: str, image_id: str) -> Dict[str, Any]:
     """Get detailed information about a specific image"""
+    details = await get_images_details(profile_id, [image_id])
+    if image_id not in details:
+        logger.warning(f"Image with ID {image_id} not found")
+        return {}
+    return details[image_id]
+
+async def get_images_details(profile_id: str, image_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Get detailed information about several images, keyed by image ID"""
     try:
         # Use the repository for consistent access
         image_repo = ImageRepository(profile_id)
-        
-        # Get image by ID
-        result = image_repo.collection.get(ids=[image_id], include=["metadatas"])
-        
-        if not result or not result["ids"]:
-            logger.warning(f"Image with ID {image_id} not found")
-            return {}
-        
-        metadata = result["metadatas"][0]
-        image_path = metadata.get("filepath", "")
-        
-        # Check if image still exists
-        exists = os.path.exists(image_path) if image_path else False
-        
-        return {
-            "id": image_id,
-            "metadata": metadata,
-            "path": image_path,
-            "exists": exists
-        }
-        
+        await image_repo.initialize()
+        return await image_repo.get_images(image_ids)
     except Exception as e:
         logger.error(f"Error getting image details: {str(e)}")
         return {}
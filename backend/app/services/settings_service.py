@@ -4,22 +4,20 @@ import os
 from typing import Dict, Any, Optional
 
 from app.models.profiles_model import ProfileSettings
-from app.utils.database import get_settings_collection
-from app.services.indexing_service import check_for_new_images
+from app.database.metadata_store import get_metadata_store
+from app.utils.executors import run_storage
+from app.services.indexing_service import check_for_new_images, start_index_migration
+from app.services.watcher_service import configure_profile_indexing
+from app.database.vector_index import set_profile_search_backend
+from app.utils.database import get_profile_index_model
+from app.utils.model_catalog import get_encoder_backend
 
 logger = logging.getLogger(__name__)
 
 
-def _settings_to_metadata(profile_id: str, settings: ProfileSettings) -> dict:
-    d = settings.dict()
-    d["custom_theme_colors"] = json.dumps(d.get("custom_theme_colors", {}))
-    d["profile_id"] = profile_id
-    return d
-
-
-def _metadata_to_settings(metadata: dict) -> ProfileSettings:
-    data = {k: v for k, v in metadata.items() if k not in ("profile_id", "id")}
-    if "custom_theme_colors" in data and isinstance(data["custom_theme_colors"], str):
+def _data_to_settings(data: dict) -> ProfileSettings:
+    """Build ProfileSettings from a stored settings document"""
+    if isinstance(data.get("custom_theme_colors"), str):
         try:
             data["custom_theme_colors"] = json.loads(data["custom_theme_colors"])
         except (json.JSONDecodeError, TypeError):
@@ -30,10 +28,9 @@ def _metadata_to_settings(metadata: dict) -> ProfileSettings:
 async def get_profile_settings(profile_id: str) -> Optional[ProfileSettings]:
     """Get settings for a specific profile"""
     try:
-        collection = await get_settings_collection()
-        result = collection.find_one({"profile_id": profile_id})
-        if result:
-            return _metadata_to_settings(result)
+        data = await run_storage(get_metadata_store().get_settings, profile_id)
+        if data:
+            return _data_to_settings(data)
         return ProfileSettings()
     except Exception as e:
         logger.error(f"Error fetching settings for profile {profile_id}: {str(e)}")
@@ -53,10 +50,10 @@ async def update_profile_settings(profile_id: str, updates: Dict[str, Any]) -> O
                     raise ValueError(f"Folder not found or not accessible: {folder}")
 
         # Load current settings
-        collection = await get_settings_collection()
-        existing = collection.find_one({"profile_id": profile_id})
+        store = get_metadata_store()
+        existing = await run_storage(store.get_settings, profile_id)
         if existing:
-            current = _metadata_to_settings(existing)
+            current = _data_to_settings(existing)
         else:
             current = ProfileSettings()
 
@@ -65,16 +62,27 @@ async def update_profile_settings(profile_id: str, updates: Dict[str, Any]) -> O
         current_dict.update(updates)
         updated = ProfileSettings(**current_dict)
 
-        # Persist
-        collection.upsert(
-            ids=[f"settings_{profile_id}"],
-            metadatas=[_settings_to_metadata(profile_id, updated)],
-            embeddings=[[0.0] * 10]
-        )
+        # Persist only the updated fields, so values the indexer writes meanwhile
+        # (such as last_indexed) aren't overwritten with the ones read above
+        changed = {key: value for key, value in updated.dict().items() if key in updates}
+        await run_storage(store.update_settings, profile_id, changed)
+
+        if "search_backend" in updates:
+            set_profile_search_backend(profile_id, updated.search_backend)
+
+        if "monitored_folders" in updates or "auto_index_interval_minutes" in updates:
+            await configure_profile_indexing(profile_id)
 
         if "monitored_folders" in updates:
             await check_for_new_images(profile_id, force=True)
 
+        if "vlm_model" in updates:
+            # Re-embed only if the model changed or the profile doesn't search with it (on its
+            # configured backend) yet; searches keep using the current index until the new one is filled
+            indexed = await get_profile_index_model(profile_id)
+            if updated.vlm_model != current.vlm_model or (updated.vlm_model, get_encoder_backend(updated.vlm_model)) != indexed:
+                start_index_migration(profile_id, updated.vlm_model)
+
         return updated
     except (ValueError, Exception) as e:
         logger.error(f"Error updating settings for profile {profile_id}: {str(e)}")
@@ -0,0 +1,370 @@
+import os
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Set
+
+from app.database.metadata_store import get_metadata_store
+from app.utils.executors import run_storage
+from app.utils.stat_cache import get_stat_cache, paths_exist
+from app.services.indexing_service import (
+    IMAGE_EXTENSIONS, check_for_new_images, index_changed_paths, index_all_profiles, get_indexing_status
+)
+from app.services.profile_service import get_profiles
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Quiet period after the last event before a batch of changes is indexed
+DEBOUNCE_SECONDS = 2.0
+
+# Upper bound on how long a continuous stream of events can postpone indexing
+MAX_DEBOUNCE_SECONDS = 10.0
+
+# Past this many coalesced paths a full manifest rescan is cheaper than per-path diffs
+MAX_PENDING_PATHS = 5000
+
+# How often the supervisor checks that the observer thread is still alive
+SUPERVISOR_INTERVAL_SECONDS = 60
+
+# Rescan interval for profiles that don't set auto_index_interval_minutes
+DEFAULT_INTERVAL_MINUTES = 60
+
+# Indexing modes reported per profile
+MODE_WATCH = "watch"
+MODE_INTERVAL = "interval"
+
+# Event types that can change what is indexed ("closed" is a close-after-write on inotify)
+_RELEVANT_EVENTS = {"created", "modified", "deleted", "moved", "closed"}
+
+def _interval_seconds(settings: Dict[str, Any]) -> int:
+    """A profile's rescan interval in interval mode"""
+    minutes = settings.get("auto_index_interval_minutes") or DEFAULT_INTERVAL_MINUTES
+    return max(1, int(minutes)) * 60
+
+class _FolderEventHandler(FileSystemEventHandler):
+    """Forwards relevant watchdog events for one profile to the watcher"""
+
+    def __init__(self, watcher: "FolderWatcher", profile_id: str):
+        super().__init__()
+        self.watcher = watcher
+        self.profile_id = profile_id
+
+    @staticmethod
+    def _is_relevant(path: str, is_directory: bool) -> bool:
+        return is_directory or os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS
+
+    def on_any_event(self, event):
+        if event.event_type not in _RELEVANT_EVENTS:
+            return
+        # A directory "modified" event fires for every child change and carries no new information
+        if event.is_directory and event.event_type in ("modified", "closed"):
+            return
+
+        paths = [event.src_path]
+        if event.event_type == "moved":
+            paths.append(event.dest_path)
+        paths = [p for p in paths if self._is_relevant(p, event.is_directory)]
+        if paths:
+            if not event.is_directory:
+                # Keep searches from reporting files that just appeared or went away
+                get_stat_cache().record(event.src_path, event.event_type not in ("deleted", "moved"))
+                if event.event_type == "moved":
+                    get_stat_cache().record(event.dest_path, True)
+            self.watcher.enqueue_threadsafe(self.profile_id, paths)
+
+class FolderWatcher:
+    """Watches monitored folders and turns debounced, coalesced filesystem events into
+    targeted index updates.
+
+    Falls back to interval-based rescans (honouring each profile's
+    `auto_index_interval_minutes`) when watchdog is unavailable, a folder cannot be
+    watched, the event backlog overflows, or the observer thread dies.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._observer = None
+        self._watches: Dict[str, List[Any]] = {}
+        self._modes: Dict[str, str] = {}
+        self._pending: Dict[str, Optional[Set[str]]] = {}  # None marks an overflowed backlog
+        self._first_event_at: Dict[str, float] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._overflows: Dict[str, int] = {}
+        self._interval_tasks: Dict[str, asyncio.Task] = {}
+        self._intervals: Dict[str, int] = {}  # seconds, as last read from each profile's settings
+        self._supervisor: Optional[asyncio.Task] = None
+        self._background_tasks: Set[asyncio.Task] = set()
+
+    def start(self):
+        """Start the observer thread (if watchdog is installed) and its supervisor"""
+        self._loop = asyncio.get_running_loop()
+        if WATCHDOG_AVAILABLE:
+            try:
+                self._observer = Observer()
+                self._observer.start()
+                self._supervisor = asyncio.create_task(self._supervise())
+                logger.info("Started filesystem watcher")
+            except Exception as e:
+                logger.warning(f"Filesystem watcher unavailable, using interval rescans: {str(e)}")
+                self._observer = None
+        else:
+            logger.warning("watchdog is not installed, using interval rescans")
+
+    def stop(self):
+        """Stop watching and cancel all scheduled work"""
+        for timer in self._timers.values():
+            timer.cancel()
+        for task in self._interval_tasks.values():
+            task.cancel()
+        if self._supervisor:
+            self._supervisor.cancel()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        self._timers.clear()
+        self._interval_tasks.clear()
+
+    async def configure_profile(self, profile_id: str):
+        """(Re)apply a profile's monitored folders and indexing interval"""
+        settings = await run_storage(get_metadata_store().get_settings, profile_id) or {}
+        folders = [os.path.abspath(f) for f in settings.get("monitored_folders", []) or [] if os.path.isdir(f)]
+        self._intervals[profile_id] = _interval_seconds(settings)
+
+        self._unwatch(profile_id)
+        if not folders:
+            self._stop_interval(profile_id)
+            self._modes.pop(profile_id, None)
+            return
+
+        if self._observer is not None and self._watch(profile_id, folders):
+            self._stop_interval(profile_id)
+            self._modes[profile_id] = MODE_WATCH
+        else:
+            self._start_interval(profile_id)
+
+    def get_status(self, profile_id: str) -> Dict[str, Any]:
+        """Describe how a profile's folders are being kept up to date"""
+        pending = self._pending.get(profile_id, set())
+        return {
+            "mode": self._modes.get(profile_id),
+            "watchdog_available": WATCHDOG_AVAILABLE,
+            "pending_paths": len(pending) if pending is not None else None,
+            "full_rescan_pending": pending is None,
+            "overflows": self._overflows.get(profile_id, 0),
+        }
+
+    def nudge(self, profile_id: str):
+        """Bring a profile's index up to date in the background if it is due.
+
+        Watched profiles index their debounced changes now; profiles on interval rescans
+        are rescanned once their `auto_index_interval_minutes` has passed since the last run.
+        """
+        if self._modes.get(profile_id) == MODE_WATCH:
+            # Index debounced changes now instead of waiting out the quiet period
+            timer = self._timers.pop(profile_id, None)
+            if timer:
+                timer.cancel()
+                self._start_flush(profile_id)
+            return
+
+        status = get_indexing_status(profile_id)
+        if status.get("running"):
+            return
+        last_run = status.get("end_time")
+        interval = self._intervals.get(profile_id, DEFAULT_INTERVAL_MINUTES * 60)
+        if last_run is None or time.time() - last_run >= interval:
+            self._spawn(check_for_new_images(profile_id))
+
+    def verify_paths(self, profile_id: str, paths: List[str]):
+        """Stat paths in the background, queueing any that are missing for removal from the index"""
+        self._spawn(self._verify(profile_id, paths))
+
+    async def _verify(self, profile_id: str, paths: List[str]):
+        try:
+            exists, _ = await paths_exist(paths, defer=False)
+            missing = [path for path, path_exists in zip(paths, exists) if not path_exists]
+            if missing:
+                logger.info(f"{len(missing)} search results for profile {profile_id} no longer exist")
+                await index_changed_paths(profile_id, missing)
+        except Exception as e:
+            logger.error(f"Error verifying result paths for profile {profile_id}: {str(e)}")
+
+    def _spawn(self, coro):
+        """Run a coroutine in the background, keeping a reference until it finishes"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def enqueue_threadsafe(self, profile_id: str, paths: List[str]):
+        """Queue changed paths from the observer thread"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._enqueue, profile_id, paths)
+
+    def _watch(self, profile_id: str, folders: List[str]) -> bool:
+        """Schedule recursive watches for a profile; False if any folder cannot be watched"""
+        handler = _FolderEventHandler(self, profile_id)
+        watches = []
+        try:
+            for folder in folders:
+                watches.append(self._observer.schedule(handler, folder, recursive=True))
+        except Exception as e:
+            # e.g. inotify watch limit reached
+            logger.warning(f"Cannot watch folders for profile {profile_id}, using interval rescans: {str(e)}")
+            for watch in watches:
+                self._observer.unschedule(watch)
+            return False
+        self._watches[profile_id] = watches
+        logger.info(f"Watching {len(folders)} folders for profile {profile_id}")
+        return True
+
+    def _unwatch(self, profile_id: str):
+        for watch in self._watches.pop(profile_id, []):
+            try:
+                self._observer.unschedule(watch)
+            except Exception:
+                pass
+
+    def _enqueue(self, profile_id: str, paths: List[str]):
+        pending = self._pending.setdefault(profile_id, set())
+        now = time.monotonic()
+        first = self._first_event_at.setdefault(profile_id, now)
+
+        if pending is not None:
+            pending.update(paths)
+            if len(pending) > MAX_PENDING_PATHS:
+                # Too many changes to track individually; a single rescan covers them all
+                logger.warning(f"Change backlog overflowed for profile {profile_id}, scheduling full rescan")
+                self._overflows[profile_id] = self._overflows.get(profile_id, 0) + 1
+                self._pending[profile_id] = None
+
+        # Coalesce bursts, but never postpone indexing past MAX_DEBOUNCE_SECONDS
+        timer = self._timers.pop(profile_id, None)
+        if timer:
+            timer.cancel()
+        delay = min(DEBOUNCE_SECONDS, max(0.0, first + MAX_DEBOUNCE_SECONDS - now))
+        self._timers[profile_id] = self._loop.call_later(delay, self._start_flush, profile_id)
+
+    def _start_flush(self, profile_id: str):
+        self._timers.pop(profile_id, None)
+        self._spawn(self._flush(profile_id))
+
+    async def _flush(self, profile_id: str):
+        paths = self._pending.pop(profile_id, set())
+        self._first_event_at.pop(profile_id, None)
+        try:
+            if paths is None:
+                await check_for_new_images(profile_id, force=True)
+            elif paths:
+                await index_changed_paths(profile_id, paths)
+        except Exception as e:
+            logger.error(f"Error indexing watched changes for profile {profile_id}: {str(e)}")
+
+    def _start_interval(self, profile_id: str):
+        self._modes[profile_id] = MODE_INTERVAL
+        if profile_id not in self._interval_tasks:
+            self._interval_tasks[profile_id] = asyncio.create_task(self._interval_loop(profile_id))
+
+    def _stop_interval(self, profile_id: str):
+        task = self._interval_tasks.pop(profile_id, None)
+        if task:
+            task.cancel()
+
+    async def _interval_loop(self, profile_id: str):
+        """Periodic full rescan, re-reading the profile's interval on every cycle"""
+        while True:
+            try:
+                settings = await run_storage(get_metadata_store().get_settings, profile_id) or {}
+                self._intervals[profile_id] = _interval_seconds(settings)
+            except Exception as e:
+                logger.error(f"Error reading indexing interval for profile {profile_id}: {str(e)}")
+
+            await asyncio.sleep(self._intervals.get(profile_id, DEFAULT_INTERVAL_MINUTES * 60))
+            try:
+                await check_for_new_images(profile_id)
+            except Exception as e:
+                logger.error(f"Error in interval rescan for profile {profile_id}: {str(e)}")
+
+    async def _supervise(self):
+        """Fall back to interval rescans if the observer thread dies"""
+        while self._observer is not None:
+            await asyncio.sleep(SUPERVISOR_INTERVAL_SECONDS)
+            if self._observer is not None and not self._observer.is_alive():
+                logger.error("Filesystem watcher stopped, falling back to interval rescans")
+                self._observer = None
+                for profile_id in list(self._watches):
+                    self._watches.pop(profile_id, None)
+                    self._start_interval(profile_id)
+
+_watcher = FolderWatcher()
+
+def get_folder_watcher() -> FolderWatcher:
+    """Get the process-wide folder watcher"""
+    return _watcher
+
+async def configure_profile_indexing(profile_id: str):
+    """Re-apply watches and intervals after a profile's folder settings change"""
+    try:
+        await _watcher.configure_profile(profile_id)
+    except Exception as e:
+        logger.error(f"Error configuring indexing for profile {profile_id}: {str(e)}")
+
+def nudge_profile_indexing(profile_id: str):
+    """Request a background index update for a profile without waiting for it"""
+    try:
+        _watcher.nudge(profile_id)
+    except Exception as e:
+        logger.error(f"Error scheduling background indexing for profile {profile_id}: {str(e)}")
+
+def verify_result_paths(profile_id: str, paths: List[str]):
+    """Check search result files that were returned unverified, dropping missing ones from the index"""
+    if paths:
+        _watcher.verify_paths(profile_id, paths)
+
+def get_index_freshness(profile_id: str) -> Dict[str, Any]:
+    """Describe how current a profile's index is: when it was last updated and how many
+    files are still waiting to be indexed"""
+    status = get_indexing_status(profile_id)
+    update_times = [t for t in (status.get("end_time"), (status.get("last_change_update") or {}).get("time")) if t]
+
+    pending_files = 0
+    if status.get("running"):
+        pipeline = status.get("pipeline", {})
+        pending_files += max(0, pipeline.get("queued", 0) - pipeline.get("embedded", 0) - pipeline.get("failed", 0))
+    pending_files += _watcher.get_status(profile_id)["pending_paths"] or 0
+
+    return {
+        "indexed_at": datetime.fromtimestamp(max(update_times)).isoformat() if update_times else None,
+        "pending_files": pending_files,
+        "indexing": bool(status.get("running")),
+    }
+
+def start_indexing_scheduler():
+    """Start watching monitored folders and run an initial incremental rescan"""
+    async def indexing_task():
+        _watcher.start()
+        try:
+            # Watch first so changes made during the initial rescan are not missed
+            for profile in await get_profiles():
+                await configure_profile_indexing(profile.id)
+            # Catch up on changes made while the app was not running
+            await index_all_profiles()
+        except Exception as e:
+            logger.error(f"Error in indexing scheduler: {str(e)}")
+
+    # Start background task
+    asyncio.create_task(indexing_task())
+    logger.info("Started background indexing scheduler")
+
+def stop_indexing_scheduler():
+    """Stop the folder watcher and interval rescans"""
+    _watcher.stop()
@@ -1,13 +1,17 @@
 import os
 import logging
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import json
 
 logger = logging.getLogger(__name__)
 
 # Import the ChromaDB client singleton and wrapper classes
 from app.database.chroma_client import get_chroma_client, ChromaCollectionWrapper, serialize_datetime, deserialize_datetime
+from app.database.metadata_store import get_metadata_store, migrate_from_chroma
+from app.utils.executors import run_storage
+from app.models.profiles_model import ModelType
+from app.utils.model_catalog import index_suffix
 
 # Constants for database paths
 DB_DIR = os.path.join(os.path.expanduser("~"), ".local-image-finder")
@@ -20,136 +24,18 @@ os.makedirs(CHROMA_DIR, exist_ok=True)
 # Dictionary to cache collection instances
 _collections = {}
 
-class ChromaCollectionWrapper:
-    """Wrapper class for ChromaDB collection with helper methods for CRUD operations"""
-    
-    def __init__(self, collection):
-        self.collection = collection
-    
-    def get(self, ids=None, include=None, limit=None):
-        """Direct pass-through to the underlying collection's get method"""
-        return self.collection.get(ids=ids, include=include, limit=limit)
+# Counters bumped whenever one model's image index of a profile is written, so caches
+# derived from that index can tell when they are stale; keyed by (profile, index suffix)
+_index_generations: Dict[Tuple[str, str], int] = {}
 
-    def query(self, query_embeddings=None, n_results=None, include=None):
-        """Direct pass-through to the underlying collection's query method"""
-        return self.collection.query(
-            query_embeddings=query_embeddings,
-            n_results=n_results,
-            include=include
-        )
-        
-    def add(self, ids, embeddings, metadatas=None, documents=None):
-        """Direct pass-through to the underlying collection's add method"""
-        return self.collection.add(
-            ids=ids,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            documents=documents
-        )
-        
-    def update(self, ids, embeddings=None, metadatas=None, documents=None):
-        """Direct pass-through to the underlying collection's update method"""
-        return self.collection.update(
-            ids=ids,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            documents=documents
-        )
-        
-    def upsert(self, ids, embeddings, metadatas=None, documents=None):
-        """Direct pass-through to the underlying collection's upsert method"""
-        return self.collection.upsert(
-            ids=ids,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            documents=documents
-        )
-        
-    def delete(self, ids):
-        """Direct pass-through to the underlying collection's delete method"""
-        return self.collection.delete(ids=ids)
-    
-    def find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Find a single document by query"""
-        # ChromaDB doesn't have direct query by metadata fields, so we get all and filter
-        results = self.collection.get(include=["metadatas"])
-        
-        if results and "metadatas" in results and results["metadatas"]:
-            for i, metadata in enumerate(results["metadatas"]):
-                # Check if all query criteria match
-                if all(metadata.get(k) == v for k, v in query.items()):
-                    result = {
-                        "id": results["ids"][i],
-                        **metadata
-                    }
-                    return result
-        return None
-    
-    def find(self, query: Dict[str, Any] = None, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
-        """Find documents by query with pagination"""
-        results = self.collection.get(include=["metadatas", "ids"], limit=limit + skip)
-        
-        documents = []
-        if results and "metadatas" in results and results["metadatas"]:
-            for i, metadata in enumerate(results["metadatas"]):
-                if i < skip:
-                    continue
-                    
-                if query is None or all(metadata.get(k) == v for k, v in query.items()):
-                    documents.append({
-                        "id": results["ids"][i],
-                        **metadata
-                    })
-                
-                if len(documents) >= limit:
-                    break
-        
-        return documents
-    
-    def update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> bool:
-        """Update a single document"""
-        doc = self.find_one(query)
-        if not doc:
-            return False
-            
-        doc_id = doc["id"]
-        metadata = {**doc}
-        
-        # Apply updates
-        for key, value in update.items():
-            if key.startswith("$set"):
-                # Handle $set operator
-                for set_key, set_val in value.items():
-                    metadata[set_key] = set_val
-            else:
-                # Direct field update
-                metadata[key] = value
-        
-        # Remove id as it's not part of metadata
-        if "id" in metadata:
-            del metadata["id"]
-            
-        # Get original embedding
-        original = self.collection.get(ids=[doc_id], include=["embeddings"])
-        embedding = original["embeddings"][0] if original and "embeddings" in original else [0.0] * 10
-            
-        # Upsert with updated metadata
-        self.collection.upsert(
-            ids=[doc_id],
-            metadatas=[metadata],
-            embeddings=[embedding]
-        )
-        
-        return True
-    
-    def delete_one(self, query: Dict[str, Any]) -> bool:
-        """Delete a single document"""
-        doc = self.find_one(query)
-        if not doc:
-            return False
-            
-        self.collection.delete(ids=[doc["id"]])
-        return True
+def get_index_generation(profile_id: str, suffix: str = "") -> int:
+    """Get the current write generation of a profile's image index for one model"""
+    return _index_generations.get((profile_id, suffix), 0)
+
+def bump_index_generation(profile_id: str, suffix: str = "") -> int:
+    """Record a write to a profile's image index for one model, invalidating caches built on it"""
+    _index_generations[(profile_id, suffix)] = _index_generations.get((profile_id, suffix), 0) + 1
+    return _index_generations[(profile_id, suffix)]
 
 async def get_chroma_collection(collection_name: str):
     """Get or create a ChromaDB collection"""
@@ -157,8 +43,9 @@ async def get_chroma_collection(collection_name: str):
         return _collections[collection_name]
     
     try:
-        client = get_chroma_client()
-        collection = client.get_or_create_collection(collection_name)
+        # Client start-up and collection creation hit disk, so keep them off the event loop
+        client = await run_storage(get_chroma_client)
+        collection = await run_storage(client.get_or_create_collection, collection_name)
         _collections[collection_name] = collection
         return collection
     except Exception as e:
@@ -195,57 +82,93 @@ async def reset_chroma_collection(collection_name: str):
     collection = client.create_collection(name=collection_name)
     return ChromaCollectionWrapper(collection)
 
-async def get_profile_collection():
-    """Get or create profiles collection in ChromaDB"""
-    return await get_chroma_collection("profiles")
+def images_collection_name(profile_id: str, model_type: ModelType = ModelType.DEFAULT, backend: Optional[str] = None) -> str:
+    """Name of the collection holding a profile's image vectors for a model and encoder backend"""
+    return f"{profile_id}_images{index_suffix(model_type, backend)}"
 
-async def get_settings_collection(profile_id: str = None):
-    """Get or create settings collection in ChromaDB"""
-    if profile_id:
-        return await get_chroma_collection(f"{profile_id}_settings")
-    else:
-        return await get_chroma_collection("settings")
+async def get_images_collection(profile_id: str, model_type: ModelType = ModelType.DEFAULT, backend: Optional[str] = None):
+    """Get or create a profile's images collection for a model and encoder backend in ChromaDB"""
+    return await get_chroma_collection(images_collection_name(profile_id, model_type, backend))
 
-async def get_sessions_collection(profile_id: str):
-    """Get or create sessions collection in ChromaDB"""
-    return await get_chroma_collection(f"{profile_id}_sessions")
+# Model and encoder backend whose index each profile searches, cached to keep store reads
+# off the search path. They only change once a re-embedding run has filled the new index.
+_profile_index_models: Dict[str, Tuple[ModelType, str]] = {}
 
-async def get_albums_collection(profile_id: str):
-    """Get or create albums collection in ChromaDB"""
-    return await get_chroma_collection(f"{profile_id}_albums")
+def _index_model_key(profile_id: str) -> str:
+    return f"index_model:{profile_id}"
 
-async def get_images_collection(profile_id: str):
-    """Get or create images collection in ChromaDB"""
-    return await get_chroma_collection(f"{profile_id}_images")
+def _parse_index_model(stored: str) -> Tuple[ModelType, str]:
+    # Stored as "tier" for PyTorch indexes, as they were before other backends, else "tier@backend"
+    model_type, _, backend = stored.partition("@")
+    return ModelType(model_type), backend or "torch"
 
-async def initialize_database():
-    """Initialize all database collections"""
-    try:
-        # Check for required dependencies first
+async def get_profile_index_model(profile_id: str) -> Tuple[ModelType, str]:
+    """Get the model whose vectors a profile's searches use, and the encoder backend that embedded them"""
+    if profile_id not in _profile_index_models:
+        index_model = (ModelType.DEFAULT, "torch")
         try:
-            import chromadb
-            import dateutil
-        except ImportError as e:
-            if "dateutil" in str(e):
-                logger.error("Missing dependency: python-dateutil. Please run: pip install python-dateutil")
-            elif "chromadb" in str(e):
-                logger.error("Missing dependency: chromadb. Please run: pip install chromadb")
-            else:
-                logger.error(f"Missing dependency: {str(e)}")
-            raise
+            stored = await run_storage(get_metadata_store().get_meta, _index_model_key(profile_id))
+            if stored:
+                index_model = _parse_index_model(stored)
+        except Exception as e:
+            logger.warning(f"Could not read index model for profile {profile_id}: {str(e)}")
+        _profile_index_models[profile_id] = index_model
+    return _profile_index_models[profile_id]
+
+def set_profile_index_model(profile_id: str, model_type: ModelType, backend: str = "torch") -> None:
+    """Switch a profile's searches to another model's or backend's index (blocking; runs on the storage executor)"""
+    model_type = ModelType(model_type)
+    stored = model_type.value if backend == "torch" else f"{model_type.value}@{backend}"
+    get_metadata_store().set_meta(_index_model_key(profile_id), stored)
+    # Result caches are keyed by the index suffix, so switching needs no invalidation
+    _profile_index_models[profile_id] = (model_type, backend)
+
+async def initialize_metadata_store():
+    """Open the metadata store, carrying over profiles and settings kept in ChromaDB by earlier versions.
+
+    Only the first start after upgrading needs ChromaDB for this; later starts leave it to
+    `initialize_vector_store` so profiles and settings are served without waiting for it.
+    """
+    try:
+        store = await run_storage(get_metadata_store)
+        if not await run_storage(store.get_meta, "chroma_migrated"):
+            client = await initialize_vector_store()
+            await run_storage(migrate_from_chroma, store, client.get_client())
+        logger.info("Metadata store initialized")
+    except Exception as e:
+        logger.error(f"Error initializing metadata store: {str(e)}")
+        raise
+
+def _open_chroma_client():
+    """Import ChromaDB and open its persistent client (blocking; runs on the storage executor)"""
+    # Check for required dependencies first
+    try:
+        import chromadb
+        import dateutil
+    except ImportError as e:
+        if "dateutil" in str(e):
+            logger.error("Missing dependency: python-dateutil. Please run: pip install python-dateutil")
+        elif "chromadb" in str(e):
+            logger.error("Missing dependency: chromadb. Please run: pip install chromadb")
+        else:
+            logger.error(f"Missing dependency: {str(e)}")
+        raise
+    return get_chroma_client()
 
-        # Initialize basic collections
-        await get_chroma_collection("profiles")
-        await get_chroma_collection("settings")
-        
-        # Create default profile if needed
-        # This will be handled by the profile service
-        
-        logger.info("ChromaDB collections initialized")
+async def initialize_vector_store():
+    """Open the ChromaDB client; importing chromadb is slow, so this runs in the background at startup"""
+    try:
+        return await run_storage(_open_chroma_client)
     except Exception as e:
         logger.error(f"Error initializing ChromaDB collections: {str(e)}")
         raise
 
+async def initialize_database():
+    """Initialize all database collections"""
+    await initialize_metadata_store()
+    await initialize_vector_store()
+    logger.info("Databases initialized")
+
 def serialize_datetime(obj):
     """Helper function to serialize datetime objects to ISO format for ChromaDB"""
     if isinstance(obj, datetime):
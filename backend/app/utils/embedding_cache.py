@@ -0,0 +1,132 @@
+import os
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Number of query embeddings kept in memory; 0 disables the cache
+QUERY_CACHE_SIZE = max(0, int(os.environ.get("LIF_QUERY_CACHE_SIZE", "1024")))
+
+# Optional file the cache is restored from on start-up and saved to on shutdown
+QUERY_CACHE_PATH = os.environ.get("LIF_QUERY_CACHE_PATH")
+
+def normalize_query_text(text: str) -> str:
+    """Normalize query text for cache keys.
+
+    CLIP's tokenizer lowercases text and collapses whitespace, so queries that differ
+    only in case or spacing produce the same embedding.
+    """
+    return " ".join(text.split()).lower()
+
+class EmbeddingCache:
+    """Thread-safe LRU cache of query embeddings keyed on (model name, kind, key).
+
+    Entries belong to the model that produced them, so several resident models share
+    one LRU without ever serving each other's vectors.
+    """
+
+    def __init__(self, capacity: int = QUERY_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str, Hashable], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str, kind: str, key: Hashable) -> Optional[np.ndarray]:
+        """Look up an embedding, counting the hit or miss"""
+        with self._lock:
+            embedding = self._entries.get((model_name, kind, key))
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((model_name, kind, key))
+            self.hits += 1
+            return embedding
+
+    def put(self, model_name: str, kind: str, key: Hashable, embedding) -> None:
+        """Store an embedding, evicting the least recently used entries beyond capacity"""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[(model_name, kind, key)] = np.asarray(embedding, dtype=np.float32)
+            self._entries.move_to_end((model_name, kind, key))
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached embedding and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "models": len({model_name for model_name, _, _ in self._entries}),
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def save(self, path: str) -> None:
+        """Write the cached embeddings to an .npz file"""
+        with self._lock:
+            if not self._entries:
+                return
+            keys = list(self._entries.keys())
+            vectors = np.stack(list(self._entries.values()))
+        # Write through a file object so numpy doesn't append ".npz" to the configured path
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                models=np.array([model_name for model_name, _, _ in keys]),
+                kinds=np.array([kind for _, kind, _ in keys]),
+                keys=np.array([str(key) for _, _, key in keys]),
+                vectors=vectors,
+            )
+        logger.info(f"Saved {len(keys)} query embeddings to {path}")
+
+    def load(self, path: str) -> None:
+        """Restore cached embeddings saved by `save`, oldest first"""
+        with np.load(path, allow_pickle=False) as data:
+            # Files saved before entries recorded their own model hold a single "model"
+            models = data["models"] if "models" in data else np.full(len(data["keys"]), str(data["model"]))
+            with self._lock:
+                for model_name, kind, key, vector in zip(models, data["kinds"], data["keys"], data["vectors"]):
+                    self._entries[(str(model_name), str(kind), str(key))] = vector.astype(np.float32)
+                while len(self._entries) > self.capacity:
+                    self._entries.popitem(last=False)
+        logger.info(f"Restored {len(self._entries)} query embeddings from {path}")
+
+_query_cache: Optional[EmbeddingCache] = None
+_query_cache_lock = threading.Lock()
+
+def get_query_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide query embedding cache, restoring it from disk if configured"""
+    global _query_cache
+    with _query_cache_lock:
+        if _query_cache is None:
+            _query_cache = EmbeddingCache()
+            if QUERY_CACHE_PATH and os.path.exists(QUERY_CACHE_PATH):
+                try:
+                    _query_cache.load(QUERY_CACHE_PATH)
+                except Exception as e:
+                    logger.warning(f"Could not restore query embedding cache: {str(e)}")
+        return _query_cache
+
+def save_query_embedding_cache() -> None:
+    """Persist the query embedding cache if a cache path is configured"""
+    if not QUERY_CACHE_PATH or _query_cache is None:
+        return
+    try:
+        _query_cache.save(QUERY_CACHE_PATH)
+    except Exception as e:
+        logger.error(f"Error saving query embedding cache: {str(e)}")
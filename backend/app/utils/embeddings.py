@@ -1,113 +1,491 @@
+import io
 import os
+import time
+import asyncio
 import logging
+import importlib
 import numpy as np
-from typing import List, Dict, Any, Union, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Union, Optional, Tuple
 from PIL import Image
-from sentence_transformers import SentenceTransformer
-from transformers import CLIPProcessor, CLIPModel
-import torch
 from app.models.profiles_model import ModelType
+from app.utils.model_catalog import TEXT_MODELS, IMAGE_MODELS, get_encoder_backend, embedding_space
+from app.utils.executors import run_inference, run_background_inference, run_storage, get_inference_gate
+from app.utils.embedding_cache import get_query_embedding_cache, normalize_query_text
+from app.utils.image_preprocessing import compute_bytes_hash, preprocess_for_clip
+from app.utils.model_registry import ModelRegistry
+from app.utils.onnx_encoder import (
+    OnnxClipEncoder, onnx_model_paths, export_clip_towers, quantize_towers, embedding_agreement
+)
+from app.database.metadata_store import get_metadata_store
+from app.utils.database import get_profile_index_model
+
+if TYPE_CHECKING:
+    import torch
 
 logger = logging.getLogger(__name__)
 
-# Models are loaded lazily when needed
-_text_model = None
-_image_model = None
-_clip_processor = None
+# Models that stay loaded at once; switching between resident models costs nothing
+MAX_RESIDENT_MODELS = max(1, int(os.environ.get("LIF_MAX_RESIDENT_MODELS", "2")))
 
-# Set device based on availability
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# Combined parameter memory of resident models before the least recently used are
+# unloaded; 0 only limits their number
+MODEL_MEMORY_BUDGET = int(float(os.environ.get("LIF_MODEL_MEMORY_MB", "0")) * 1024 * 1024)
 
-# Models to use based on quality setting
-TEXT_MODELS = {
-    ModelType.PERFORMANCE: "all-MiniLM-L6-v2",  # Faster, smaller model
-    ModelType.DEFAULT: "all-MiniLM-L6-v2",      # Default - balanced
-    ModelType.QUALITY: "all-mpnet-base-v2"      # Slower but better quality
-}
+# Load the image models of all profiles in the background at startup
+PRELOAD_MODELS = os.environ.get("LIF_PRELOAD_MODELS", "1").lower() in ("1", "true", "yes")
 
-IMAGE_MODELS = {
-    ModelType.PERFORMANCE: "openai/clip-vit-base-patch32",  # Faster
-    ModelType.DEFAULT: "openai/clip-vit-base-patch32",      # Default
-    ModelType.QUALITY: "openai/clip-vit-large-patch14"      # Higher quality
-}
+# torch, transformers and sentence-transformers take seconds to import, so they are
+# imported where they are used and the app can serve requests before they load
+ML_LIBRARIES = ("torch", "transformers", "sentence_transformers")
 
 # Cache directory for downloaded models
 MODELS_DIR = os.path.join(os.path.expanduser("~"), ".local-image-finder", "models")
 os.makedirs(MODELS_DIR, exist_ok=True)
 
+# CLIP towers exported to ONNX, one directory per model
+ONNX_DIR = os.path.join(MODELS_DIR, "onnx")
+
+# Images per forward pass of background (indexing) inference; it checks for waiting
+# searches between passes, so smaller chunks bound search latency more tightly
+BACKGROUND_CHUNK_SIZE = max(1, int(os.environ.get("LIF_BACKGROUND_CHUNK_SIZE", "8")))
+
+# Intra-op threads of ONNX Runtime sessions; 0 lets ONNX Runtime use every core
+ONNX_THREADS = max(0, int(os.environ.get("LIF_ONNX_THREADS", "0")))
+
+_device: Optional[str] = None
+
+def get_device() -> str:
+    """The device models run on, importing torch on first call"""
+    global _device
+    if _device is None:
+        import torch
+        _device = "cuda" if torch.cuda.is_available() else "cpu"
+    return _device
+
+def load_ml_libraries() -> Dict[str, Any]:
+    """Import the ML libraries ahead of the first model load, timing each (blocking)"""
+    import_seconds = {}
+    for module in ML_LIBRARIES:
+        start = time.perf_counter()
+        importlib.import_module(module)
+        import_seconds[module] = round(time.perf_counter() - start, 3)
+        logger.info(f"Imported {module} in {import_seconds[module]:.2f}s")
+    return {"device": get_device(), "import_seconds": import_seconds}
+
+def _model_memory_bytes(model) -> int:
+    """Bytes held by a torch module's parameters and buffers"""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+def _release_model(name: str, model) -> None:
+    # Dropping the registry's reference frees host memory; the CUDA allocator keeps its cache
+    if get_device() == "cuda":
+        import torch
+        torch.cuda.empty_cache()
+
+_models = ModelRegistry(MAX_RESIDENT_MODELS, MODEL_MEMORY_BUDGET, on_evict=_release_model)
+_preload_task: Optional["asyncio.Task"] = None
+
+def get_model_registry() -> ModelRegistry:
+    """Get the registry of resident embedding models"""
+    return _models
+
+def get_model_status() -> Dict[str, Any]:
+    """Resident models, their load times and memory use, and startup preload progress"""
+    preload = "disabled"
+    if _preload_task is not None:
+        preload = "done" if _preload_task.done() else "running"
+    elif PRELOAD_MODELS:
+        preload = "pending"
+    return {**_models.get_stats(), "device": _device, "preload": preload}
+
 def get_text_embedding_model(model_type: ModelType = ModelType.DEFAULT):
     """Get or load the text embedding model"""
-    global _text_model
-    
     # Select model name based on quality setting
     model_name = TEXT_MODELS[model_type]
     
-    if _text_model is None or _text_model.model_name != model_name:
-        try:
-            logger.info(f"Loading text embedding model: {model_name}")
-            _text_model = SentenceTransformer(model_name, cache_folder=MODELS_DIR)
-            # Store model name for future reference
-            _text_model.model_name = model_name
-            logger.info("Text embedding model loaded successfully")
-        except Exception as e:
-            logger.error(f"Error loading text embedding model: {str(e)}")
-            raise
-    return _text_model
+    def load():
+        from sentence_transformers import SentenceTransformer
+        logger.info(f"Loading text embedding model: {model_name}")
+        return SentenceTransformer(model_name, cache_folder=MODELS_DIR)
+    
+    try:
+        return _models.get(f"text:{model_name}", load, _model_memory_bytes)
+    except Exception as e:
+        logger.error(f"Error loading text embedding model: {str(e)}")
+        raise
+
+def _warm_up_clip(loaded) -> None:
+    """Run one text and one image forward pass so the first query doesn't pay for
+    kernel selection and allocator growth"""
+    import torch
+    model, processor = loaded
+    device = get_device()
+    with torch.no_grad():
+        text_inputs = processor(text=["a photo"], return_tensors="pt", padding=True)
+        model.get_text_features(**{k: v.to(device) for k, v in text_inputs.items()})
+        image_inputs = processor(images=[Image.new("RGB", (224, 224))], return_tensors="pt")
+        model.get_image_features(pixel_values=image_inputs["pixel_values"].to(device))
 
 def get_image_embedding_model(model_type: ModelType = ModelType.DEFAULT):
     """Get or load the image embedding model and processor"""
-    global _image_model, _clip_processor
-    
     # Select model name based on quality setting
     model_name = IMAGE_MODELS[model_type]
     
-    if _image_model is None or _image_model.config._name_or_path != model_name:
+    def load():
+        from transformers import CLIPModel, CLIPProcessor
+        logger.info(f"Loading image embedding model: {model_name}")
+        model = CLIPModel.from_pretrained(model_name, cache_dir=MODELS_DIR).to(get_device())
+        model.eval()
+        processor = CLIPProcessor.from_pretrained(model_name, cache_dir=MODELS_DIR)
+        return model, processor
+    
+    try:
+        return _models.get(f"clip:{model_name}", load, lambda loaded: _model_memory_bytes(loaded[0]), _warm_up_clip)
+    except Exception as e:
+        logger.error(f"Error loading image embedding model: {str(e)}")
+        raise
+
+def _warm_up_onnx(encoder: OnnxClipEncoder) -> None:
+    """Run one text and one image pass so the first query doesn't pay for session setup"""
+    text_inputs = encoder.processor(text=["a photo"], return_tensors="np", padding=True)
+    encoder.encode_text(text_inputs["input_ids"], text_inputs["attention_mask"])
+    image_inputs = encoder.processor(images=[Image.new("RGB", (224, 224))], return_tensors="np")
+    encoder.encode_pixels(image_inputs["pixel_values"])
+
+def _export_onnx(model_name: str, export_dir: str, quantized: bool) -> None:
+    """Export a model's towers from a CPU copy of the PyTorch model, then quantize them if asked"""
+    if not all(os.path.exists(path) for path in onnx_model_paths(export_dir, quantized=False)):
+        from transformers import CLIPModel
+        logger.info(f"Exporting {model_name} to ONNX")
+        model = CLIPModel.from_pretrained(model_name, cache_dir=MODELS_DIR)
+        model.eval()
+        export_clip_towers(model, export_dir)
+        del model
+    if quantized:
+        quantize_towers(export_dir)
+
+def get_onnx_encoder(model_type: ModelType = ModelType.DEFAULT, backend: Optional[str] = None) -> OnnxClipEncoder:
+    """Get or load a model's ONNX Runtime encoder, exporting and quantizing it on first use"""
+    backend = backend or get_encoder_backend(model_type)
+    model_name = IMAGE_MODELS[model_type]
+    quantized = backend == "onnx-int8"
+    
+    def load():
+        from transformers import CLIPProcessor
+        export_dir = os.path.join(ONNX_DIR, model_name.replace("/", "--"))
+        vision_path, text_path = onnx_model_paths(export_dir, quantized)
+        if not (os.path.exists(vision_path) and os.path.exists(text_path)):
+            _export_onnx(model_name, export_dir, quantized)
+        logger.info(f"Loading ONNX encoder: {vision_path}")
+        processor = CLIPProcessor.from_pretrained(model_name, cache_dir=MODELS_DIR)
+        return OnnxClipEncoder(vision_path, text_path, processor, ONNX_THREADS)
+    
+    try:
+        return _models.get(f"{backend}:{model_name}", load, lambda encoder: encoder.memory_bytes, _warm_up_onnx)
+    except Exception as e:
+        logger.error(f"Error loading ONNX encoder: {str(e)}")
+        raise
+
+def get_clip_processor(model_type: ModelType = ModelType.DEFAULT, backend: Optional[str] = None):
+    """The CLIP processor of a tier's encoder, loading the encoder on first use"""
+    backend = backend or get_encoder_backend(model_type)
+    if backend == "torch":
+        return get_image_embedding_model(model_type)[1]
+    return get_onnx_encoder(model_type, backend).processor
+
+def load_image_encoder(model_type: ModelType = ModelType.DEFAULT, backend: Optional[str] = None) -> None:
+    """Load and warm up a tier's image encoder on a backend, its configured one by default"""
+    backend = backend or get_encoder_backend(model_type)
+    if backend == "torch":
+        get_image_embedding_model(model_type)
+    else:
+        get_onnx_encoder(model_type, backend)
+
+def preload_image_models(indexes: List[Tuple[ModelType, str]]) -> None:
+    """Load and warm up the encoders of (model, backend) indexes ahead of the first query;
+    runs on the inference executor"""
+    by_space: Dict[str, Tuple[ModelType, str]] = {}
+    for model_type, backend in indexes:
+        by_space.setdefault(embedding_space(model_type, backend), (model_type, backend))
+    
+    # Never preload more than stay resident, or the first ones would be evicted again
+    for space, (model_type, backend) in list(by_space.items())[:MAX_RESIDENT_MODELS]:
         try:
-            logger.info(f"Loading image embedding model: {model_name}")
-            _image_model = CLIPModel.from_pretrained(model_name, cache_dir=MODELS_DIR).to(DEVICE)
-            _clip_processor = CLIPProcessor.from_pretrained(model_name, cache_dir=MODELS_DIR)
-            logger.info("Image embedding model loaded successfully")
+            load_image_encoder(model_type, backend)
         except Exception as e:
-            logger.error(f"Error loading image embedding model: {str(e)}")
-            raise
-    return _image_model, _clip_processor
+            logger.error(f"Error preloading {space}: {str(e)}")
 
-async def generate_text_embedding(text: str, model_type: ModelType = ModelType.DEFAULT) -> List[float]:
-    """Generate text embedding using CLIP text encoder so it's in the same space as image embeddings."""
-    model, processor = get_image_embedding_model(model_type)
+async def _preload_profile_models() -> None:
     try:
-        with torch.no_grad():
-            inputs = processor(text=[text], return_tensors="pt", padding=True, truncation=True)
-            pixel_values = inputs.get("input_ids")
-            if pixel_values is not None:
-                inputs = {k: v.to(DEVICE) for k, v in inputs.items()}
-            text_features = model.get_text_features(**inputs)
-            # Handle both tensor and dataclass return types (transformers API changed in v5)
-            if not isinstance(text_features, torch.Tensor):
-                text_features = text_features.pooler_output
-            embedding = text_features / text_features.norm(dim=1, keepdim=True)
-            return embedding.cpu().numpy()[0].tolist()
+        store = get_metadata_store()
+        profiles = await run_storage(store.list_profiles)
+        # The default profile first, then the most recently used
+        profiles.sort(key=lambda profile: profile.get("last_accessed") or "", reverse=True)
+        profiles.sort(key=lambda profile: not profile.get("is_default"))
+        
+        # The index each profile searches, not one it may still be migrating to
+        indexes = [await get_profile_index_model(profile["id"]) for profile in profiles]
+        await run_background_inference(
+            preload_image_models, indexes or [(ModelType.DEFAULT, get_encoder_backend(ModelType.DEFAULT))]
+        )
     except Exception as e:
-        logger.error(f"Error generating text embedding: {str(e)}")
-        raise
+        logger.error(f"Error preloading models: {str(e)}")
+
+def start_model_preload() -> Optional["asyncio.Task"]:
+    """Start loading the profiles' image models in the background so the first search
+    doesn't wait for them; call from the running event loop. Returns the preload task,
+    or None when preloading is disabled"""
+    global _preload_task
+    if PRELOAD_MODELS and _preload_task is None:
+        _preload_task = asyncio.get_running_loop().create_task(_preload_profile_models())
+    return _preload_task
+
+def _generate_text_embedding_sync(text: str, model_type: ModelType, backend: Optional[str] = None) -> List[float]:
+    """Blocking CLIP text-tower forward pass; runs on the inference executor"""
+    backend = backend or get_encoder_backend(model_type)
+    if backend != "torch":
+        encoder = get_onnx_encoder(model_type, backend)
+        inputs = encoder.processor(text=[text], return_tensors="np", padding=True, truncation=True)
+        return encoder.encode_text(inputs["input_ids"], inputs["attention_mask"])[0].tolist()
+    
+    import torch
+    model, processor = get_image_embedding_model(model_type)
+    with torch.no_grad():
+        inputs = processor(text=[text], return_tensors="pt", padding=True, truncation=True)
+        pixel_values = inputs.get("input_ids")
+        if pixel_values is not None:
+            inputs = {k: v.to(get_device()) for k, v in inputs.items()}
+        text_features = model.get_text_features(**inputs)
+        # Handle both tensor and dataclass return types (transformers API changed in v5)
+        if not isinstance(text_features, torch.Tensor):
+            text_features = text_features.pooler_output
+        embedding = text_features / text_features.norm(dim=1, keepdim=True)
+        return embedding.cpu().numpy()[0].tolist()
+
+async def generate_text_embedding(text: str, model_type: ModelType = ModelType.DEFAULT) -> List[float]:
+    """Generate text embedding using CLIP text encoder so it's in the same space as image embeddings.
+
+    Results are cached per model on the normalized query text.
+    """
+    embeddings = await generate_query_embeddings(text, [], model_type)
+    return embeddings[0].tolist()
 
 async def generate_image_embedding(image: Image.Image, model_type: ModelType = ModelType.DEFAULT) -> List[float]:
     """Generate image embedding using CLIP."""
-    model, processor = get_image_embedding_model(model_type)
+    embeddings = await generate_image_embeddings([image], model_type)
+    return embeddings[0].tolist()
+
+def _generate_query_embeddings_sync(
+    text: Optional[str],
+    images: List[bytes],
+    model_type: ModelType,
+    backend: Optional[str] = None
+) -> np.ndarray:
+    """Encode a query's text and encoded images in one executor call; runs on the inference executor.
+
+    Images are decoded straight to CLIP input size with the same draft decode and
+    preprocessing as indexing, and share a single vision-tower forward pass.
+    Returns one row per input, text first.
+    """
+    rows = []
+    if text:
+        rows.append(np.asarray(_generate_text_embedding_sync(text, model_type, backend), dtype=np.float32))
+    if images:
+        config = get_image_preprocess_config(model_type, backend)
+        pixel_values = []
+        for data in images:
+            with Image.open(io.BytesIO(data)) as image:
+                pixel_values.append(preprocess_for_clip(image, config))
+        rows.extend(_generate_pixel_embeddings_sync(np.stack(pixel_values), model_type, backend))
+    return np.stack(rows)
+
+async def generate_query_embeddings(
+    text: Optional[str],
+    images: List[bytes],
+    model_type: ModelType = ModelType.DEFAULT,
+    backend: Optional[str] = None
+) -> np.ndarray:
+    """Embed a query's text and encoded images, returning an (N, D) float32 array with the
+    text row (if any) first and then one row per image. `backend` is the encoder backend
+    of the searched index, the tier's configured one by default.
+
+    Each input is cached per model on its normalized text or content hash; whatever is
+    not cached is encoded together in a single inference call.
+    """
+    cache = get_query_embedding_cache()
+    model_name = embedding_space(model_type, backend)
+    keys = ([("text", normalize_query_text(text))] if text else []) + [("image", compute_bytes_hash(data)) for data in images]
+    rows: List[Optional[np.ndarray]] = [cache.get(model_name, kind, key) for kind, key in keys]
+    
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        missing_text = text if text and missing[0] == 0 else None
+        offset = 1 if text else 0
+        missing_images = [images[i - offset] for i in missing if i >= offset]
+        try:
+            embedded = await run_inference(_generate_query_embeddings_sync, missing_text, missing_images, model_type, backend)
+        except Exception as e:
+            logger.error(f"Error generating query embeddings: {str(e)}")
+            raise
+        for i, embedding in zip(missing, embedded):
+            rows[i] = embedding
+            cache.put(model_name, keys[i][0], keys[i][1], embedding)
+    return np.stack(rows).astype(np.float32, copy=False)
+
+async def generate_image_bytes_embedding(data: bytes, model_type: ModelType = ModelType.DEFAULT) -> List[float]:
+    """Generate the embedding of an encoded query image, cached per model on its content hash"""
+    embeddings = await generate_query_embeddings(None, [data], model_type)
+    return embeddings[0].tolist()
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def generate_image_file_embedding(image_path: str, model_type: ModelType = ModelType.DEFAULT) -> List[float]:
+    """Generate the embedding of a query image file, cached per model on its content hash"""
+    data = await run_storage(_read_file, image_path)
+    return await generate_image_bytes_embedding(data, model_type)
+
+def _encode_pixel_values(model, pixel_values: "torch.Tensor") -> np.ndarray:
+    """Run the CLIP vision tower on preprocessed pixels and return normalized float32 embeddings"""
+    import torch
+    with torch.no_grad():
+        image_features = model.get_image_features(pixel_values=pixel_values.to(get_device()))
+        # Handle both tensor and dataclass return types (transformers API changed in v5)
+        if not isinstance(image_features, torch.Tensor):
+            image_features = image_features.pooler_output
+        embeddings = image_features / image_features.norm(dim=1, keepdim=True)
+        return embeddings.cpu().numpy().astype(np.float32, copy=False)
+
+def _generate_image_embeddings_sync(images: List[Image.Image], model_type: ModelType) -> np.ndarray:
+    """Blocking CLIP preprocessing and vision-tower forward pass; runs on the inference executor"""
+    inputs = get_clip_processor(model_type)(images=images, return_tensors="np")
+    return _generate_pixel_embeddings_sync(inputs["pixel_values"], model_type)
+
+def _generate_pixel_embeddings_sync(pixel_values: np.ndarray, model_type: ModelType, backend: Optional[str] = None) -> np.ndarray:
+    """Blocking CLIP vision-tower forward pass on preprocessed pixels; runs on the inference executor"""
+    backend = backend or get_encoder_backend(model_type)
+    if backend != "torch":
+        return get_onnx_encoder(model_type, backend).encode_pixels(pixel_values)
+    
+    import torch
+    model, _ = get_image_embedding_model(model_type)
+    return _encode_pixel_values(model, torch.from_numpy(np.ascontiguousarray(pixel_values, dtype=np.float32)))
+
+async def generate_image_embeddings(images: List[Image.Image], model_type: ModelType = ModelType.DEFAULT) -> np.ndarray:
+    """Generate CLIP embeddings for a batch of images in a single forward pass.
+
+    Returns an (N, D) float32 array of L2-normalized embeddings, one row per input image.
+    """
+    if not images:
+        return np.empty((0, 0), dtype=np.float32)
+    
     try:
-        with torch.no_grad():
-            inputs = processor(images=image, return_tensors="pt")
-            pixel_values = inputs["pixel_values"].to(DEVICE)
-            image_features = model.get_image_features(pixel_values=pixel_values)
-            # Handle both tensor and dataclass return types (transformers API changed in v5)
-            if not isinstance(image_features, torch.Tensor):
-                image_features = image_features.pooler_output
-            embedding = image_features / image_features.norm(dim=1, keepdim=True)
-            return embedding.cpu().numpy()[0].tolist()
+        return await run_inference(_generate_image_embeddings_sync, images, model_type)
     except Exception as e:
-        logger.error(f"Error generating image embedding: {str(e)}")
+        logger.error(f"Error generating image embeddings: {str(e)}")
         raise
 
+def _generate_pixel_embeddings_background(pixel_values: np.ndarray, model_type: ModelType, backend: Optional[str] = None) -> np.ndarray:
+    """Background vision-tower passes over chunks of a batch, pausing for searches
+    between chunks; runs on the background inference executor"""
+    gate = get_inference_gate()
+    chunks = []
+    for start in range(0, len(pixel_values), BACKGROUND_CHUNK_SIZE):
+        gate.wait_for_interactive()
+        chunks.append(_generate_pixel_embeddings_sync(pixel_values[start:start + BACKGROUND_CHUNK_SIZE], model_type, backend))
+    return np.concatenate(chunks)
+
+async def generate_image_embeddings_from_pixels(
+    pixel_values: np.ndarray,
+    model_type: ModelType = ModelType.DEFAULT,
+    background: bool = False,
+    backend: Optional[str] = None
+) -> np.ndarray:
+    """Generate CLIP embeddings from an (N, C, H, W) batch already preprocessed by
+    `app.utils.image_preprocessing.preprocess_for_clip`, on `backend` or the tier's
+    configured encoder backend.
+
+    With `background`, the batch runs at indexing priority: on the background thread,
+    yielding to searches between chunks.
+    """
+    if len(pixel_values) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    
+    try:
+        if background:
+            return await run_background_inference(_generate_pixel_embeddings_background, pixel_values, model_type, backend)
+        return await run_inference(_generate_pixel_embeddings_sync, pixel_values, model_type, backend)
+    except Exception as e:
+        logger.error(f"Error generating image embeddings from pixels: {str(e)}")
+        raise
+
+def compare_encoder_backends(
+    pixel_values: np.ndarray,
+    texts: List[str],
+    model_type: ModelType = ModelType.DEFAULT,
+    backend: str = "onnx-int8",
+    k: int = 10,
+    batch_size: int = 32
+) -> Dict[str, Any]:
+    """Embed a sample of preprocessed images and query texts with PyTorch and an ONNX
+    backend, and report their cosine agreement, top-k overlap and speed; runs on the
+    inference executor.
+
+    Every sample image is also used as an image query against the rest of the sample,
+    so the sample needs more than `k` images for the image-query overlap to mean anything.
+    """
+    if len(pixel_values) <= k:
+        raise ValueError(f"Comparing top-{k} neighbours needs more than {k} sample images, got {len(pixel_values)}")
+    
+    embeddings = {}
+    seconds_per_image = {}
+    for name in ("torch", backend):
+        # Load and warm up the encoder first so its load time isn't counted
+        _generate_pixel_embeddings_sync(pixel_values[:1], model_type, name)
+        start = time.perf_counter()
+        images = np.concatenate([
+            _generate_pixel_embeddings_sync(pixel_values[i:i + batch_size], model_type, name)
+            for i in range(0, len(pixel_values), batch_size)
+        ])
+        seconds_per_image[name] = (time.perf_counter() - start) / max(1, len(pixel_values))
+        queries = np.asarray([_generate_text_embedding_sync(text, model_type, name) for text in texts], dtype=np.float32)
+        embeddings[name] = images, queries.reshape(len(texts), images.shape[1])
+    
+    (reference, reference_texts), (candidate, candidate_texts) = embeddings["torch"], embeddings[backend]
+    return {
+        "model": IMAGE_MODELS[model_type],
+        "backend": backend,
+        "image_queries": embedding_agreement(reference, candidate, reference, candidate, k, exclude_self=True),
+        "text_queries": embedding_agreement(reference, candidate, reference_texts, candidate_texts, k) if texts else None,
+        "ms_per_image": {name: round(seconds * 1000, 2) for name, seconds in seconds_per_image.items()},
+    }
+
+def get_image_preprocess_config(model_type: ModelType = ModelType.DEFAULT, backend: Optional[str] = None) -> Dict[str, Any]:
+    """Get the CLIP preprocessing parameters (resize, crop, normalization) as plain
+    picklable values so decoding can be done outside the model process.
+
+    Loads the model on first use, so call it through `run_inference` from async code.
+    """
+    processor = get_clip_processor(model_type, backend)
+    image_processor = getattr(processor, "image_processor", None) or processor.feature_extractor
+    
+    size = image_processor.size
+    shortest_edge = size.get("shortest_edge", 224) if isinstance(size, dict) else int(size)
+    crop_size = image_processor.crop_size
+    if isinstance(crop_size, dict):
+        crop = (int(crop_size["height"]), int(crop_size["width"]))
+    else:
+        crop = (int(crop_size), int(crop_size))
+    
+    return {
+        "shortest_edge": int(shortest_edge),
+        "crop_size": crop,
+        "image_mean": [float(v) for v in image_processor.image_mean],
+        "image_std": [float(v) for v in image_processor.image_std],
+    }
+
 def combine_embeddings(embeddings: List[List[float]]) -> List[float]:
     """Combine multiple embeddings into a single embedding vector"""
     if not embeddings:
@@ -143,7 +521,8 @@ async def search_by_vector(
 ) -> List[Dict[str, Any]]:
     """Search ChromaDB collection by vector similarity"""
     try:
-        results = collection.collection.query(
+        results = await run_storage(
+            collection.collection.query,
             query_embeddings=[query_embedding],
             n_results=limit,
             include=["metadatas", "distances"] if include_metadata else ["distances"]
@@ -0,0 +1,34 @@
+import json
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from fastapi import Request
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# Keep proxies from buffering the stream, which would defeat progressive rendering
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _json_default(value: Any) -> Any:
+    # NumPy scalars from similarity math, datetimes and the like
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+def wants_sse(request: Request) -> bool:
+    """Whether the client asked for Server-Sent Events rather than NDJSON"""
+    return SSE_MEDIA_TYPE in request.headers.get("accept", "")
+
+def format_ndjson(event: str, data: Dict[str, Any]) -> bytes:
+    """One NDJSON line: `{"event": ..., "data": ...}`"""
+    return (json.dumps({"event": event, "data": data}, default=_json_default) + "\n").encode()
+
+def format_sse(event: str, data: Dict[str, Any]) -> bytes:
+    """One Server-Sent Events message with a named event and a JSON data line"""
+    return f"event: {event}\ndata: {json.dumps(data, default=_json_default)}\n\n".encode()
+
+async def encode_events(events: AsyncIterator[Tuple[str, Dict[str, Any]]], sse: bool = False) -> AsyncIterator[bytes]:
+    """Serialize `(event, data)` pairs as Server-Sent Events or NDJSON lines"""
+    encode = format_sse if sse else format_ndjson
+    async for event, data in events:
+        yield encode(event, data)
@@ -0,0 +1,235 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Pool sizes can be overridden through the environment.
+# Inference defaults to a single thread: the model is shared and torch parallelizes
+# each forward pass internally, so more threads only add contention. Background
+# (indexing) inference runs on its own single thread.
+INFERENCE_WORKERS = max(1, int(os.environ.get("LIF_INFERENCE_WORKERS", "1")))
+STORAGE_WORKERS = max(1, int(os.environ.get("LIF_STORAGE_WORKERS", "4")))
+
+def _parse_cpu_list(value: str) -> Set[int]:
+    """Parse a CPU list such as "0-3,6" into a set of CPU numbers"""
+    cpus = set()
+    for part in filter(None, (part.strip() for part in value.split(","))):
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+# Intra-op threads of interactive (search) inference. torch's OpenMP thread count is
+# per calling thread, so each executor thread sizes its own team before every call
+TORCH_THREADS = max(1, int(os.environ.get("LIF_TORCH_THREADS", str(os.cpu_count() or 1))))
+
+def _default_background_cpus() -> Set[int]:
+    """The upper half of the CPUs this process may run on; none where pinning is unsupported"""
+    if not hasattr(os, "sched_getaffinity"):
+        return set()
+    available = sorted(os.sched_getaffinity(0))
+    if len(available) < 2:
+        return set()
+    return set(available[len(available) // 2:])
+
+def _background_cpus(value: str) -> Set[int]:
+    if not value.strip():
+        return _default_background_cpus()
+    if value.strip().lower() == "all":
+        return set()
+    return _parse_cpu_list(value)
+
+# CPUs background inference is pinned to, e.g. "4-7" (Linux only), "all" to leave it unpinned.
+# By default it gets the upper half of the cores, so a first-time index never runs torch on
+# every core. Searches are not pinned: they keep TORCH_THREADS on every core, overlapping the
+# pinned half only until indexing reaches its next gate checkpoint and pauses
+BACKGROUND_CPUS = _background_cpus(os.environ.get("LIF_BACKGROUND_CPUS", ""))
+
+# Intra-op threads of background inference: one per pinned CPU, or half the search budget
+# when unpinned, so indexing never oversubscribes the cores it runs on
+BACKGROUND_THREADS = max(1, int(os.environ.get(
+    "LIF_BACKGROUND_THREADS", str(len(BACKGROUND_CPUS) or max(1, TORCH_THREADS // 2))
+)))
+
+# Background inference resumes this long after the last search finishes, so a burst of
+# queries isn't interleaved with indexing batches
+BACKGROUND_YIELD_SECONDS = max(0.0, float(os.environ.get("LIF_INDEX_YIELD_MS", "250")) / 1000)
+
+_inference_executor: Optional[ThreadPoolExecutor] = None
+_background_executor: Optional[ThreadPoolExecutor] = None
+_storage_executor: Optional[ThreadPoolExecutor] = None
+
+class InferenceGate:
+    """Gives searches priority over background inference.
+
+    Interactive calls are counted from submission to completion. Background work calls
+    `wait_for_interactive` at its checkpoints - before each call and between the chunks
+    of a batch - and waits there while searches are active and for `yield_seconds` after
+    the last one, so a search competes with at most one background chunk.
+    """
+
+    def __init__(self, yield_seconds: float = BACKGROUND_YIELD_SECONDS):
+        self.yield_seconds = yield_seconds
+        self.active = 0
+        self.interactive_calls = 0
+        self.background_waits = 0
+        self.background_wait_seconds = 0.0
+        self._last_interactive = 0.0
+        self._condition = threading.Condition()
+
+    def enter(self) -> None:
+        with self._condition:
+            self.active += 1
+            self.interactive_calls += 1
+
+    def exit(self) -> None:
+        with self._condition:
+            self.active -= 1
+            self._last_interactive = time.monotonic()
+            self._condition.notify_all()
+
+    def wait_for_interactive(self) -> None:
+        """Block the calling background thread until no search needs the CPU"""
+        start = None
+        with self._condition:
+            while True:
+                remaining = None
+                if self.active == 0:
+                    remaining = self._last_interactive + self.yield_seconds - time.monotonic()
+                    if remaining <= 0:
+                        break
+                if start is None:
+                    start = time.perf_counter()
+                self._condition.wait(remaining)
+            if start is not None:
+                self.background_waits += 1
+                self.background_wait_seconds += time.perf_counter() - start
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "active_interactive": self.active,
+                "interactive_calls": self.interactive_calls,
+                "background_waits": self.background_waits,
+                "background_wait_seconds": round(self.background_wait_seconds, 3),
+            }
+
+_gate = InferenceGate()
+
+def get_inference_gate() -> InferenceGate:
+    """Get the gate that pauses background inference while searches run"""
+    return _gate
+
+def _apply_thread_budget(threads: int) -> None:
+    """Size the calling thread's intra-op team once torch has been imported"""
+    # torch is imported lazily; until it is, there is no intra-op pool to size
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return
+    # get_num_threads runs torch's per-thread initialisation first, which would otherwise
+    # overwrite the budget with the last value set by any thread
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+
+def _with_thread_budget(func: Callable[..., T], threads: int) -> Callable[..., T]:
+    @functools.wraps(func)
+    def call(*args: Any, **kwargs: Any) -> T:
+        _apply_thread_budget(threads)
+        return func(*args, **kwargs)
+    return call
+
+def _init_background_thread() -> None:
+    if BACKGROUND_CPUS and hasattr(os, "sched_setaffinity"):
+        try:
+            # On Linux pid 0 is the calling thread; torch's worker threads inherit its mask
+            os.sched_setaffinity(0, BACKGROUND_CPUS)
+        except OSError as e:
+            logger.warning(f"Cannot pin background inference to CPUs {sorted(BACKGROUND_CPUS)}: {str(e)}")
+    _apply_thread_budget(BACKGROUND_THREADS)
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Get the executor that runs blocking model inference"""
+    global _inference_executor
+    if _inference_executor is None:
+        _inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+        logger.info(f"Started inference executor with {INFERENCE_WORKERS} workers")
+    return _inference_executor
+
+def get_background_executor() -> ThreadPoolExecutor:
+    """Get the single-worker executor that runs background (indexing) inference"""
+    global _background_executor
+    if _background_executor is None:
+        _background_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="background-inference", initializer=_init_background_thread
+        )
+        logger.info("Started background inference executor")
+    return _background_executor
+
+def get_storage_executor() -> ThreadPoolExecutor:
+    """Get the executor that runs blocking vector store and filesystem calls"""
+    global _storage_executor
+    if _storage_executor is None:
+        _storage_executor = ThreadPoolExecutor(max_workers=STORAGE_WORKERS, thread_name_prefix="storage")
+        logger.info(f"Started storage executor with {STORAGE_WORKERS} workers")
+    return _storage_executor
+
+async def run_inference(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking model call on the inference executor without blocking the event loop.
+
+    Interactive calls take priority: background inference pauses until they finish.
+    """
+    loop = asyncio.get_running_loop()
+    _gate.enter()
+    try:
+        return await loop.run_in_executor(
+            get_inference_executor(), functools.partial(_with_thread_budget(func, TORCH_THREADS), *args, **kwargs)
+        )
+    finally:
+        _gate.exit()
+
+async def run_background_inference(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking model call for background work such as indexing.
+
+    It starts once no search is running. Long calls should call
+    `get_inference_gate().wait_for_interactive()` between chunks to keep yielding.
+    """
+    def call(*args: Any, **kwargs: Any) -> T:
+        _gate.wait_for_interactive()
+        return func(*args, **kwargs)
+    
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_background_executor(), functools.partial(_with_thread_budget(call, BACKGROUND_THREADS), *args, **kwargs)
+    )
+
+def get_inference_stats() -> Dict[str, Any]:
+    """Thread budget and CPU pinning of inference, and how often indexing yielded"""
+    return {
+        "torch_threads": TORCH_THREADS,
+        "background_threads": BACKGROUND_THREADS,
+        "background_cpus": sorted(BACKGROUND_CPUS) or None,
+        **_gate.get_stats(),
+    }
+
+async def run_storage(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking storage call on the storage executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_storage_executor(), functools.partial(func, *args, **kwargs))
+
+def shutdown_executors():
+    """Stop the inference, background inference and storage executors"""
+    global _inference_executor, _background_executor, _storage_executor
+    for executor in (_inference_executor, _background_executor, _storage_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    _inference_executor = None
+    _background_executor = None
+    _storage_executor = None
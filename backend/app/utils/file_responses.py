@@ -0,0 +1,119 @@
+import os
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+# Bytes read per chunk when streaming part of a file
+RANGE_CHUNK_SIZE = 256 * 1024
+
+def file_etag(st: os.stat_result) -> str:
+    """Strong ETag from a file's inode, modification time and size"""
+    return f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Whether the client's cached copy is current; If-None-Match takes precedence over If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive (start, end) pair.
+
+    Returns None for headers this server answers with the whole file (multiple ranges,
+    other units, malformed values) and raises ValueError if the range is unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+def _read_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def conditional_file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    cache_control: str,
+    etag: Optional[str] = None,
+    st: Optional[os.stat_result] = None
+) -> Response:
+    """Serve a file honouring conditional and range requests.
+
+    Revalidation compares validators from one `stat` and answers 304 without opening
+    the file. A single byte range is answered with 206; an `If-Range` that no longer
+    matches falls back to the whole file. Async callers pass `st`, taken off the event
+    loop; without it the file is stat-ed here.
+    """
+    st = st or os.stat(path)
+    if not stat.S_ISREG(st.st_mode):
+        raise IsADirectoryError(path)
+    etag = etag or file_etag(st)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+
+    if is_not_modified(request, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() in (etag, headers["Last-Modified"])):
+        try:
+            byte_range = parse_range(range_header, st.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{st.st_size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            return StreamingResponse(
+                _read_range(path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{st.st_size}",
+                    "Content-Length": str(end - start + 1),
+                },
+            )
+
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=st)
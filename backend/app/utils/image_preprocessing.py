@@ -0,0 +1,200 @@
+import io
+import os
+import time
+import hashlib
+import logging
+import numpy as np
+from datetime import datetime
+from typing import Dict, Any, NamedTuple, Optional, Tuple
+from PIL import Image as PILImage, ImageOps, features
+from PIL.ExifTags import TAGS
+
+# NOTE: this module runs inside the indexing process pool, so it must stay free of
+# heavy imports (torch, transformers, chromadb) to keep worker start-up cheap.
+
+logger = logging.getLogger(__name__)
+
+# Read size used when hashing files that are not being decoded
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def _new_content_hasher():
+    """Hasher used for content fingerprints"""
+    return hashlib.blake2b(digest_size=16)
+
+def compute_content_hash(image_path: str) -> str:
+    """Compute the content fingerprint of a file without decoding it"""
+    hasher = _new_content_hasher()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def compute_bytes_hash(data: bytes) -> str:
+    """Compute the content fingerprint of an in-memory file"""
+    hasher = _new_content_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+def try_compute_content_hash(image_path: str) -> Optional[str]:
+    """Compute a file's content fingerprint, or None if it cannot be read"""
+    try:
+        return compute_content_hash(image_path)
+    except OSError as e:
+        logger.warning(f"Cannot hash {image_path}: {str(e)}")
+        return None
+
+# WebP thumbnails are about a third smaller than JPEG at the same quality
+THUMBNAIL_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+THUMBNAIL_QUALITY = 80
+
+class Thumbnail(NamedTuple):
+    """A rendered thumbnail and the stat signature of the file it was made from"""
+    size: int
+    data: bytes
+    source_size: int
+    source_mtime_ns: int
+
+class DecodedImage(NamedTuple):
+    """An image decoded and preprocessed for the CLIP vision tower"""
+    path: str
+    metadata: Dict[str, Any]
+    pixel_values: np.ndarray
+    decode_seconds: float
+    thumbnail: Optional[Thumbnail] = None
+
+def _extract_pil_metadata(img: PILImage.Image) -> Dict[str, Any]:
+    """Extract dimensions and EXIF data from an opened (not yet drafted) image"""
+    metadata: Dict[str, Any] = {
+        "width": img.width,
+        "height": img.height,
+    }
+
+    # Extract EXIF data if available
+    exif_data = {}
+    try:
+        exif_info = img._getexif() if hasattr(img, '_getexif') else None
+        if exif_info:
+            for tag, value in exif_info.items():
+                tag_name = TAGS.get(tag, tag)
+                exif_data[str(tag_name)] = str(value)
+    except Exception as e:
+        logger.warning(f"Error reading EXIF data: {str(e)}")
+
+    if exif_data:
+        metadata["exif"] = exif_data
+    return metadata
+
+def extract_file_metadata(image_path: str) -> Dict[str, Any]:
+    """Extract filesystem metadata for an image file"""
+    stats = os.stat(image_path)
+    return {
+        "filename": os.path.basename(image_path),
+        "filepath": image_path,
+        "filesize": stats.st_size,
+        "creation_date": datetime.fromtimestamp(stats.st_ctime).isoformat(),
+        "modified_date": datetime.fromtimestamp(stats.st_mtime).isoformat(),
+    }
+
+def extract_image_metadata(image_path: str) -> Dict[str, Any]:
+    """Extract metadata from an image file"""
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"Image not found: {image_path}")
+
+    # Basic file metadata
+    metadata = extract_file_metadata(image_path)
+
+    try:
+        # Extract image specific metadata
+        with PILImage.open(image_path) as img:
+            metadata.update(_extract_pil_metadata(img))
+    except Exception as e:
+        logger.warning(f"Error extracting metadata from {image_path}: {str(e)}")
+
+    return metadata
+
+def render_thumbnail(img: PILImage.Image, size: int) -> bytes:
+    """Encode an upright copy of an image that fits in a size x size box"""
+    img.draft("RGB", (size, size))
+    thumb = ImageOps.exif_transpose(img)
+    if thumb is img:
+        thumb = img.copy()
+    thumb.thumbnail((size, size), PILImage.LANCZOS, reducing_gap=2.0)
+    modes = ("RGB", "RGBA") if THUMBNAIL_FORMAT == "WEBP" else ("RGB",)
+    if thumb.mode not in modes:
+        has_alpha = "A" in thumb.getbands() or "transparency" in thumb.info
+        thumb = thumb.convert("RGBA" if has_alpha and "RGBA" in modes else "RGB")
+    out = io.BytesIO()
+    thumb.save(out, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+    return out.getvalue()
+
+def render_thumbnail_file(image_path: str, size: int) -> Tuple[str, Thumbnail]:
+    """Read an image once, returning its content fingerprint and a rendered thumbnail"""
+    st = os.stat(image_path)
+    with open(image_path, "rb") as f:
+        data = f.read()
+    with PILImage.open(io.BytesIO(data)) as img:
+        thumbnail = Thumbnail(size, render_thumbnail(img, size), st.st_size, st.st_mtime_ns)
+    return compute_bytes_hash(data), thumbnail
+
+def preprocess_for_clip(img: PILImage.Image, config: Dict[str, Any]) -> np.ndarray:
+    """Downsize, center-crop and normalize an image into a CLIP (C, H, W) float32 pixel array.
+
+    `config` comes from `get_image_preprocess_config` and mirrors the CLIP processor
+    settings, so the output matches what the processor would have produced.
+    """
+    shortest_edge = config["shortest_edge"]
+    crop_height, crop_width = config["crop_size"]
+
+    # Let the JPEG decoder skip DCT scales we don't need (no-op for other formats)
+    img.draft("RGB", (shortest_edge, shortest_edge))
+
+    # Cheap integer box reduction for very large images before the bicubic resize
+    factor = min(img.width, img.height) // (shortest_edge * 2)
+    if factor > 1:
+        img = img.reduce(factor)
+
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    # Resize shortest edge, then center crop
+    scale = shortest_edge / min(img.width, img.height)
+    new_size = (max(crop_width, round(img.width * scale)), max(crop_height, round(img.height * scale)))
+    img = img.resize(new_size, PILImage.BICUBIC)
+    left = (img.width - crop_width) // 2
+    top = (img.height - crop_height) // 2
+    img = img.crop((left, top, left + crop_width, top + crop_height))
+
+    pixels = np.asarray(img, dtype=np.float32) / 255.0
+    pixels = (pixels - np.asarray(config["image_mean"], dtype=np.float32)) / np.asarray(config["image_std"], dtype=np.float32)
+    return np.ascontiguousarray(pixels.transpose(2, 0, 1))
+
+def decode_image_for_embedding(image_path: str, config: Dict[str, Any], thumbnail_size: int = 0) -> DecodedImage:
+    """Open, decode and preprocess one image for embedding.
+
+    Designed to run in a worker process: metadata extraction, decoding and CLIP
+    preprocessing all happen here so the model consumer only runs the forward pass.
+    With a `thumbnail_size`, a thumbnail is rendered from the same decode.
+    """
+    start = time.perf_counter()
+    st = os.stat(image_path)
+    metadata = extract_file_metadata(image_path)
+
+    # Read the file once: the same bytes feed the content fingerprint and the decoder
+    with open(image_path, "rb") as f:
+        data = f.read()
+    metadata["content_hash"] = compute_bytes_hash(data)
+
+    thumbnail = None
+    with PILImage.open(io.BytesIO(data)) as img:
+        metadata.update(_extract_pil_metadata(img))
+        if thumbnail_size:
+            # Decode once at a scale large enough for both the thumbnail and the model input
+            scale = max(thumbnail_size, config["shortest_edge"])
+            img.draft("RGB", (scale, scale))
+            try:
+                thumbnail = Thumbnail(thumbnail_size, render_thumbnail(img, thumbnail_size), st.st_size, st.st_mtime_ns)
+            except Exception as e:
+                logger.warning(f"Cannot render thumbnail for {image_path}: {str(e)}")
+        pixel_values = preprocess_for_clip(img, config)
+    metadata["last_indexed"] = datetime.now().isoformat()
+    return DecodedImage(image_path, metadata, pixel_values, time.perf_counter() - start, thumbnail)
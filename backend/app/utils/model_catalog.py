@@ -0,0 +1,74 @@
+import os
+import hashlib
+import logging
+from typing import Dict, Optional
+from app.models.profiles_model import ModelType
+from app.utils.onnx_encoder import ENCODER_BACKENDS, onnxruntime_available
+
+# NOTE: kept free of torch and transformers so storage code can name per-model indexes
+# without loading the ML stack.
+
+logger = logging.getLogger(__name__)
+
+# Models to use based on quality setting
+TEXT_MODELS = {
+    ModelType.PERFORMANCE: "all-MiniLM-L6-v2",  # Faster, smaller model
+    ModelType.DEFAULT: "all-MiniLM-L6-v2",      # Default - balanced
+    ModelType.QUALITY: "all-mpnet-base-v2"      # Slower but better quality
+}
+
+IMAGE_MODELS = {
+    ModelType.PERFORMANCE: "openai/clip-vit-base-patch32",  # Faster
+    ModelType.DEFAULT: "openai/clip-vit-base-patch32",      # Default
+    ModelType.QUALITY: "openai/clip-vit-large-patch14"      # Higher quality
+}
+
+def _parse_encoder_backends(value: str) -> Dict[ModelType, str]:
+    backends = {}
+    for pair in filter(None, (part.strip() for part in value.split(","))):
+        tier, _, backend = pair.partition("=")
+        try:
+            model_type = ModelType(tier.strip().lower())
+        except ValueError:
+            logger.warning(f"Ignoring encoder backend for unknown model tier: {tier}")
+            continue
+        if backend.strip().lower() not in ENCODER_BACKENDS:
+            logger.warning(f"Ignoring unknown encoder backend for {model_type.value}: {backend}")
+            continue
+        backends[model_type] = backend.strip().lower()
+    
+    # Resolved once here, so every call sees the same backend for a tier
+    if any(backend != "torch" for backend in backends.values()) and not onnxruntime_available():
+        logger.warning("ONNX encoder backends need onnxruntime; running on PyTorch. Please run: pip install onnxruntime onnx")
+        return {}
+    return backends
+
+# Encoder backend per model tier as `tier=backend` pairs, e.g. "performance=onnx-int8,default=onnx";
+# tiers not listed run on PyTorch. ONNX backends need onnxruntime and, to export, onnx;
+# without onnxruntime every tier runs on PyTorch
+ENCODER_BACKEND_OVERRIDES = _parse_encoder_backends(os.environ.get("LIF_ENCODER_BACKENDS", ""))
+
+def get_encoder_backend(model_type: ModelType = ModelType.DEFAULT) -> str:
+    """The backend a model tier's CLIP towers are configured to run on"""
+    return ENCODER_BACKEND_OVERRIDES.get(ModelType(model_type), "torch")
+
+def embedding_space(model_type: ModelType, backend: Optional[str] = None) -> str:
+    """Name of the space a tier's embeddings live in; ONNX backends differ slightly from
+    PyTorch. `backend` defaults to the tier's configured backend"""
+    backend = backend or get_encoder_backend(model_type)
+    model_name = IMAGE_MODELS[ModelType(model_type)]
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+def index_suffix(model_type: ModelType, backend: Optional[str] = None) -> str:
+    """Name suffix of the collection, manifest and vector matrix holding a model's vectors
+    as embedded by an encoder backend (the tier's configured one by default).
+
+    The default model on PyTorch keeps the unsuffixed names used before per-model indexes
+    existed; tiers that share a model and backend share its index, and switching a tier's
+    backend moves it to another index, so vectors of two backends never mix.
+    """
+    space = embedding_space(model_type, backend)
+    if space == IMAGE_MODELS[ModelType.DEFAULT]:
+        return ""
+    # Hashed to stay inside ChromaDB's 63-character collection name limit
+    return "_" + hashlib.blake2b(space.encode(), digest_size=4).hexdigest()
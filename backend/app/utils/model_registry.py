@@ -0,0 +1,125 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+class ResidentModel(NamedTuple):
+    value: Any
+    memory_bytes: int
+    load_seconds: float
+    warmup_seconds: float
+    loaded_at: float
+
+class ModelRegistry:
+    """Thread-safe LRU registry of loaded models.
+
+    Keeps up to `max_models` models resident and, with a `memory_budget` in bytes, evicts
+    the least recently used ones once their combined size exceeds it. The model just
+    requested is never evicted, so a single model larger than the budget still loads.
+    Concurrent requests for the same model wait for one load instead of each loading it.
+    """
+
+    def __init__(self, max_models: int, memory_budget: int = 0, on_evict: Optional[Callable[[str, Any], None]] = None):
+        self.max_models = max(1, max_models)
+        self.memory_budget = memory_budget
+        self.on_evict = on_evict
+        self.loads = 0
+        self.evictions = 0
+        self._models: "OrderedDict[str, ResidentModel]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        measure: Callable[[Any], int],
+        warmup: Optional[Callable[[Any], None]] = None
+    ) -> Any:
+        """Get a resident model, loading, measuring and warming it up on first use"""
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name].value
+            load_lock = self._loading.setdefault(name, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading it while this one waited
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    return self._models[name].value
+
+            try:
+                start = time.perf_counter()
+                value = loader()
+                load_seconds = time.perf_counter() - start
+                warmup_seconds = 0.0
+                if warmup is not None:
+                    start = time.perf_counter()
+                    try:
+                        warmup(value)
+                    except Exception as e:
+                        logger.warning(f"Warm-up of {name} failed: {str(e)}")
+                    warmup_seconds = time.perf_counter() - start
+                model = ResidentModel(value, measure(value), load_seconds, warmup_seconds, time.time())
+                logger.info(f"Loaded {name} in {load_seconds:.1f}s (warm-up {warmup_seconds:.1f}s, {model.memory_bytes / 2**20:.0f} MB)")
+
+                with self._lock:
+                    self._models[name] = model
+                    self.loads += 1
+                    evicted = self._evict(keep=name)
+            finally:
+                with self._lock:
+                    self._loading.pop(name, None)
+
+        for evicted_name, evicted_model in evicted:
+            logger.info(f"Evicted {evicted_name} from the model registry")
+            if self.on_evict is not None:
+                self.on_evict(evicted_name, evicted_model.value)
+        return value
+
+    def _evict(self, keep: str):
+        evicted = []
+        for name in list(self._models):
+            if len(self._models) <= self.max_models and (
+                self.memory_budget <= 0 or self._memory_bytes() <= self.memory_budget
+            ):
+                break
+            if name != keep:
+                evicted.append((name, self._models.pop(name)))
+                self.evictions += 1
+        return evicted
+
+    def _memory_bytes(self) -> int:
+        return sum(model.memory_bytes for model in self._models.values())
+
+    def is_resident(self, name: str) -> bool:
+        """Whether a model is loaded, without touching its recency"""
+        with self._lock:
+            return name in self._models
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Resident models with load times and memory use, most recently used last"""
+        with self._lock:
+            return {
+                "max_models": self.max_models,
+                "memory_budget_mb": round(self.memory_budget / 2**20, 1) if self.memory_budget > 0 else None,
+                "memory_mb": round(self._memory_bytes() / 2**20, 1),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "loading": sorted(self._loading),
+                "models": [
+                    {
+                        "name": name,
+                        "memory_mb": round(model.memory_bytes / 2**20, 1),
+                        "load_seconds": round(model.load_seconds, 3),
+                        "warmup_seconds": round(model.warmup_seconds, 3),
+                        "loaded_at": model.loaded_at,
+                    }
+                    for name, model in self._models.items()
+                ],
+            }
@@ -0,0 +1,163 @@
+import os
+import logging
+import importlib.util
+import numpy as np
+from typing import Any, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# NOTE: onnxruntime, onnx and torch are imported inside the functions that need them;
+# onnxruntime is an optional dependency and the others are slow to import.
+
+# Encoder backends a model tier can run on: PyTorch fp32, ONNX Runtime fp32, or ONNX
+# Runtime with dynamically int8-quantized weights
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Opset the CLIP towers are exported with
+ONNX_OPSET = 17
+
+def onnxruntime_available() -> bool:
+    """Whether ONNX Runtime is installed, without importing it"""
+    return importlib.util.find_spec("onnxruntime") is not None
+
+def _normalize(features: np.ndarray) -> np.ndarray:
+    features = features.astype(np.float32, copy=False)
+    return features / np.linalg.norm(features, axis=1, keepdims=True)
+
+class OnnxClipEncoder:
+    """CLIP vision and text towers run with ONNX Runtime on the CPU.
+
+    Takes the same inputs as the PyTorch towers - preprocessed pixels and tokenized
+    text as NumPy arrays - and returns L2-normalized float32 embeddings.
+    """
+
+    def __init__(self, vision_path: str, text_path: str, processor: Any, intra_op_threads: int = 0):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self.vision = ort.InferenceSession(vision_path, options, providers=["CPUExecutionProvider"])
+        self.text = ort.InferenceSession(text_path, options, providers=["CPUExecutionProvider"])
+        self.processor = processor
+        self.memory_bytes = os.path.getsize(vision_path) + os.path.getsize(text_path)
+
+    def encode_pixels(self, pixel_values: np.ndarray) -> np.ndarray:
+        """Embed an (N, C, H, W) batch of preprocessed pixels"""
+        (features,) = self.vision.run(None, {"pixel_values": np.ascontiguousarray(pixel_values, dtype=np.float32)})
+        return _normalize(features)
+
+    def encode_text(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Embed a batch of tokenized texts"""
+        (features,) = self.text.run(None, {
+            "input_ids": np.ascontiguousarray(input_ids, dtype=np.int64),
+            "attention_mask": np.ascontiguousarray(attention_mask, dtype=np.int64),
+        })
+        return _normalize(features)
+
+def onnx_model_paths(export_dir: str, quantized: bool) -> Tuple[str, str]:
+    """Paths of a model's exported (vision, text) towers"""
+    suffix = ".int8.onnx" if quantized else ".onnx"
+    return os.path.join(export_dir, f"vision{suffix}"), os.path.join(export_dir, f"text{suffix}")
+
+def export_clip_towers(model: Any, export_dir: str) -> Tuple[str, str]:
+    """Export a PyTorch CLIP model's vision and text towers to fp32 ONNX (blocking).
+
+    Batch size and text length stay dynamic. Files are written under temporary names
+    and renamed into place, so an interrupted export is redone rather than loaded.
+    """
+    import torch
+
+    class VisionTower(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.clip = clip
+
+        def forward(self, pixel_values):
+            features = self.clip.get_image_features(pixel_values=pixel_values)
+            # Handle both tensor and dataclass return types (transformers API changed in v5)
+            return features if isinstance(features, torch.Tensor) else features.pooler_output
+
+    class TextTower(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.clip = clip
+
+        def forward(self, input_ids, attention_mask):
+            features = self.clip.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+            return features if isinstance(features, torch.Tensor) else features.pooler_output
+
+    os.makedirs(export_dir, exist_ok=True)
+    vision_path, text_path = onnx_model_paths(export_dir, quantized=False)
+    device = next(model.parameters()).device
+    image_size = model.config.vision_config.image_size
+    pixels = torch.zeros((1, 3, image_size, image_size), dtype=torch.float32, device=device)
+    tokens = torch.ones((1, 8), dtype=torch.long, device=device)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            VisionTower(model).eval(), (pixels,), vision_path + ".tmp",
+            input_names=["pixel_values"], output_names=["image_embeds"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+            opset_version=ONNX_OPSET
+        )
+        torch.onnx.export(
+            TextTower(model).eval(), (tokens, tokens), text_path + ".tmp",
+            input_names=["input_ids", "attention_mask"], output_names=["text_embeds"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "text_embeds": {0: "batch"},
+            },
+            opset_version=ONNX_OPSET
+        )
+    os.replace(vision_path + ".tmp", vision_path)
+    os.replace(text_path + ".tmp", text_path)
+    logger.info(f"Exported CLIP towers to {export_dir}")
+    return vision_path, text_path
+
+def quantize_towers(export_dir: str) -> Tuple[str, str]:
+    """Quantize exported fp32 towers' weights to int8 with dynamic activation scaling (blocking)"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantized_paths = onnx_model_paths(export_dir, quantized=True)
+    for source, target in zip(onnx_model_paths(export_dir, quantized=False), quantized_paths):
+        quantize_dynamic(source, target + ".tmp", weight_type=QuantType.QInt8)
+        os.replace(target + ".tmp", target)
+    logger.info(f"Quantized CLIP towers in {export_dir} to int8")
+    return quantized_paths
+
+def embedding_agreement(
+    reference: np.ndarray,
+    candidate: np.ndarray,
+    reference_queries: np.ndarray,
+    candidate_queries: np.ndarray,
+    k: int = 10,
+    exclude_self: bool = False
+) -> Dict[str, Any]:
+    """How closely one backend's embeddings of a sample set match another's.
+
+    `reference` and `candidate` embed the same images row for row, and the query arrays
+    the same queries. Reports the cosine similarity of matching rows, and the overlap of
+    each query's top-k images among the sample when ranked by either backend's vectors.
+    With `exclude_self`, query i is image i of the sample and is left out of its own
+    ranking, which both backends would otherwise always put first.
+    """
+    cosines = np.sum(reference * candidate, axis=1)
+    k = min(k, len(reference) - 1 if exclude_self else len(reference))
+    reference_scores = reference_queries @ reference.T
+    candidate_scores = candidate_queries @ candidate.T
+    if exclude_self:
+        np.fill_diagonal(reference_scores, -np.inf)
+        np.fill_diagonal(candidate_scores, -np.inf)
+    reference_top = np.argsort(-reference_scores, axis=1, kind="stable")[:, :k]
+    candidate_top = np.argsort(-candidate_scores, axis=1, kind="stable")[:, :k]
+    overlaps = np.array([len(np.intersect1d(a, b)) / k for a, b in zip(reference_top, candidate_top)]) if k else np.ones(0)
+    return {
+        "samples": len(reference),
+        "queries": len(reference_queries),
+        "k": k,
+        "cosine_mean": round(float(cosines.mean()), 5) if len(cosines) else None,
+        "cosine_min": round(float(cosines.min()), 5) if len(cosines) else None,
+        "top_k_overlap_mean": round(float(overlaps.mean()), 4) if len(overlaps) else None,
+        "top_k_overlap_min": round(float(overlaps.min()), 4) if len(overlaps) else None,
+    }
@@ -0,0 +1,51 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+# Ways of merging the result lists of a query with several inputs:
+# "rrf" sums reciprocal ranks, "weighted" sums similarity scores and
+# "vector" searches once with the normalized mean of the query embeddings
+FUSION_METHODS = ("rrf", "weighted", "vector")
+
+# Rank offset of reciprocal-rank fusion; damps the weight of the very top ranks
+RRF_K = 60
+
+def fuse_rankings(
+    result_lists: Sequence[List[Dict[str, Any]]],
+    method: str = "rrf",
+    limit: int = 20,
+    weights: Optional[Sequence[float]] = None
+) -> List[Dict[str, Any]]:
+    """Merge per-input result lists into one ranking.
+
+    Scores are gathered into a (inputs, candidates) matrix and combined with one weighted
+    sum; a candidate missing from an input's list scores zero for it. Each fused result
+    keeps its best `similarity_score` and gains a `fusion_score`.
+    """
+    if not result_lists:
+        return []
+    first_seen: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        for result in results:
+            first_seen.setdefault(result["id"], result)
+    ids = list(first_seen)
+    columns = {image_id: column for column, image_id in enumerate(ids)}
+
+    similarities = np.zeros((len(result_lists), len(columns)), dtype=np.float32)
+    ranks = np.zeros_like(similarities)
+    for row, results in enumerate(result_lists):
+        for rank, result in enumerate(results):
+            column = columns[result["id"]]
+            similarities[row, column] = result["similarity_score"]
+            ranks[row, column] = 1.0 / (RRF_K + rank + 1)
+
+    weights = np.ones(len(result_lists), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+    fused = (weights / weights.sum()) @ (ranks if method == "rrf" else similarities)
+    best = similarities.max(axis=0)
+
+    fused_results = []
+    for column in np.argsort(-fused, kind="stable")[:limit]:
+        result = dict(first_seen[ids[column]])
+        result["similarity_score"] = float(best[column])
+        result["fusion_score"] = float(fused[column])
+        fused_results.append(result)
+    return fused_results
@@ -0,0 +1,58 @@
+import time
+import logging
+import threading
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Subsystems brought up at startup, in the order they usually finish; the app accepts
+# requests as soon as the port is bound and each of these comes up in the background
+SUBSYSTEMS = ("metadata_store", "vector_store", "ml_libraries", "models", "indexing_scheduler")
+
+# Subsystems that must be up before searches and indexing can run
+REQUIRED_SUBSYSTEMS = ("metadata_store", "vector_store", "ml_libraries")
+
+_process_start = time.time()
+_lock = threading.Lock()
+_states: Dict[str, Dict[str, Any]] = {name: {"state": "pending"} for name in SUBSYSTEMS}
+_timings: Dict[str, float] = {}
+
+def record_timing(phase: str, seconds: float) -> None:
+    """Record and log the duration of a startup phase that isn't a subsystem, such as imports"""
+    with _lock:
+        _timings[phase] = round(seconds, 3)
+    logger.info(f"Startup: {phase} took {seconds:.2f}s")
+
+def mark_loading(name: str) -> None:
+    """Record that a subsystem started initializing"""
+    with _lock:
+        _states[name] = {"state": "loading", "started_at": time.time()}
+
+def mark_ready(name: str, **details: Any) -> None:
+    """Record that a subsystem finished initializing and log how long it took"""
+    with _lock:
+        state = _states.setdefault(name, {})
+        now = time.time()
+        started = state.get("started_at", now)
+        state.update(details, state="ready", ready_at=now, seconds=round(now - started, 3),
+                     since_process_start=round(now - _process_start, 3))
+    logger.info(f"Startup: {name} ready in {now - started:.2f}s ({now - _process_start:.2f}s after process start)")
+
+def mark_failed(name: str, error: str) -> None:
+    """Record that a subsystem failed to initialize"""
+    with _lock:
+        state = _states.setdefault(name, {})
+        state.update(state="failed", error=error, failed_at=time.time())
+    logger.error(f"Startup: {name} failed: {error}")
+
+def get_readiness() -> Dict[str, Any]:
+    """State and timings of each startup subsystem, and whether the required ones are up"""
+    with _lock:
+        subsystems = {name: dict(state) for name, state in _states.items()}
+        timings = dict(_timings)
+    return {
+        "ready": all(subsystems[name]["state"] == "ready" for name in REQUIRED_SUBSYSTEMS),
+        "uptime_seconds": round(time.time() - _process_start, 3),
+        "timings": timings,
+        "subsystems": subsystems,
+    }
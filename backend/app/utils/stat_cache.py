@@ -0,0 +1,116 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.utils.executors import run_storage
+
+logger = logging.getLogger(__name__)
+
+# Seconds a file's existence is trusted without another stat; 0 disables the cache
+STAT_CACHE_TTL = max(0.0, float(os.environ.get("LIF_STAT_CACHE_TTL", "30")))
+
+# Paths remembered before the least recently checked are forgotten
+STAT_CACHE_SIZE = 100_000
+
+# Return search results without waiting on stats for unknown paths; a background
+# check removes files that turn out to be missing from the index
+DEFER_EXISTS_CHECK = os.environ.get("LIF_DEFER_EXISTS_CHECK", "0").lower() in ("1", "true", "yes")
+
+class FileStatCache:
+    """Short-lived, thread-safe record of which files exist.
+
+    Search results repeat the same paths constantly, and on network shares each stat can
+    cost a round trip. The indexer and folder watcher record what they observe, so most
+    lookups are answered without touching the filesystem.
+    """
+
+    def __init__(
+        self,
+        ttl: float = STAT_CACHE_TTL,
+        capacity: int = STAT_CACHE_SIZE,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[bool]:
+        """Cached existence of a path, or None if unknown or expired"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[1] < self.clock():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def record(self, path: str, exists: bool) -> None:
+        """Remember whether a path exists"""
+        self.record_many([path], exists)
+
+    def record_many(self, paths: Iterable[str], exists: bool) -> None:
+        """Remember the same existence state for several paths"""
+        if self.ttl <= 0:
+            return
+        expires = self.clock() + self.ttl
+        with self._lock:
+            for path in paths:
+                self._entries[path] = (exists, expires)
+                self._entries.move_to_end(path)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def exists(self, path: str) -> bool:
+        """Whether a path exists, stat-ing it only on a cache miss"""
+        cached = self.get(path)
+        return cached if cached is not None else self.refresh(path)
+
+    def refresh(self, path: str) -> bool:
+        """Stat a path and remember the result"""
+        exists = os.path.exists(path)
+        self.record(path, exists)
+        return exists
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and occupancy"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "deferred_checks": DEFER_EXISTS_CHECK,
+            }
+
+_stat_cache = FileStatCache()
+
+def get_stat_cache() -> FileStatCache:
+    """Get the process-wide file stat cache"""
+    return _stat_cache
+
+async def paths_exist(paths: List[str], defer: bool = DEFER_EXISTS_CHECK) -> Tuple[List[bool], List[str]]:
+    """Check which paths exist, answering from the stat cache where possible.
+
+    Cache misses are stat-ed concurrently on the storage executor. With `defer`, misses
+    are assumed to exist instead and returned as the second element so the caller can
+    verify them in the background.
+    """
+    cache = get_stat_cache()
+    exists = [cache.get(path) if path else False for path in paths]
+    unknown = list(dict.fromkeys(path for path, known in zip(paths, exists) if known is None))
+    if defer:
+        return [known is not False for known in exists], unknown
+
+    checked = await asyncio.gather(*(run_storage(cache.refresh, path) for path in unknown))
+    found = dict(zip(unknown, checked))
+    return [found[path] if known is None else known for path, known in zip(paths, exists)], []
@@ -0,0 +1,225 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from app.utils.image_preprocessing import THUMBNAIL_FORMAT, Thumbnail, render_thumbnail_file
+
+logger = logging.getLogger(__name__)
+
+# Thumbnails are content-addressed files under the data directory
+THUMBNAIL_DIR = os.environ.get(
+    "LIF_THUMBNAIL_DIR", os.path.join(os.path.expanduser("~"), ".local-image-finder", "thumbnails")
+)
+
+# Requested sizes are rounded up to one of these bounding boxes so each image has few variants
+THUMBNAIL_SIZES = (128, 256, 512)
+
+# Bucket rendered alongside the embedding during indexing; 0 renders only on first request
+INDEX_THUMBNAIL_SIZE = int(os.environ.get("LIF_INDEX_THUMBNAIL_SIZE", "256"))
+
+# Disk space the cache may use before the least recently served thumbnails are evicted
+THUMBNAIL_CACHE_BYTES = max(0, int(os.environ.get("LIF_THUMBNAIL_CACHE_MB", "512"))) * 1024 * 1024
+
+# Last-access times are only rewritten when older than this, so hits rarely write
+TOUCH_INTERVAL_SECONDS = 300
+
+THUMBNAIL_MEDIA_TYPE = "image/webp" if THUMBNAIL_FORMAT == "WEBP" else "image/jpeg"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+"""
+
+def thumbnail_bucket(size: int) -> int:
+    """Smallest thumbnail bucket that covers the requested size"""
+    for bucket in THUMBNAIL_SIZES:
+        if size <= bucket:
+            return bucket
+    return THUMBNAIL_SIZES[-1]
+
+class CachedThumbnail(NamedTuple):
+    """A thumbnail file ready to be served"""
+    path: str
+    etag: str
+    media_type: str
+
+class ThumbnailCache:
+    """Content-addressed, size-capped disk cache of image thumbnails.
+
+    Files are keyed on the source's content fingerprint and size bucket, so moved or
+    duplicated images share thumbnails. A small SQLite index maps each source path's
+    stat signature to its fingerprint, letting a hit be served after a single `stat`,
+    and tracks last access for LRU eviction. Methods are blocking; call them through
+    the storage executor from async code.
+    """
+
+    def __init__(self, cache_dir: str = THUMBNAIL_DIR, capacity_bytes: int = THUMBNAIL_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.capacity_bytes = capacity_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the index database"""
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _key(content_hash: str, size: int) -> str:
+        return f"{content_hash}_{size}"
+
+    def _file_path(self, key: str) -> str:
+        extension = "webp" if THUMBNAIL_FORMAT == "WEBP" else "jpg"
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{extension}")
+
+    def _lookup(self, content_hash: str, size: int) -> Optional[CachedThumbnail]:
+        key = self._key(content_hash, size)
+        row = self._conn.execute("SELECT last_access FROM entries WHERE key = ?", (key,)).fetchone()
+        if not row or not os.path.exists(self._file_path(key)):
+            return None
+        now = time.time()
+        if now - row["last_access"] > TOUCH_INTERVAL_SECONDS:
+            with self._conn:
+                self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        return CachedThumbnail(self._file_path(key), f'"{key}"', THUMBNAIL_MEDIA_TYPE)
+
+    def _record_source(self, path: str, source_size: int, source_mtime_ns: int, content_hash: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sources (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+            (path, source_size, source_mtime_ns, content_hash)
+        )
+
+    def _store(self, content_hash: str, thumbnail: Thumbnail) -> CachedThumbnail:
+        key = self._key(content_hash, thumbnail.size)
+        file_path = self._file_path(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # Write then rename so a reader never sees a partial file
+        with open(file_path + ".tmp", "wb") as f:
+            f.write(thumbnail.data)
+        os.replace(file_path + ".tmp", file_path)
+
+        previous = self._conn.execute("SELECT bytes FROM entries WHERE key = ?", (key,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (key, bytes, last_access) VALUES (?, ?, ?)",
+            (key, len(thumbnail.data), time.time())
+        )
+        self._total_bytes += len(thumbnail.data) - (previous["bytes"] if previous else 0)
+        return CachedThumbnail(file_path, f'"{key}"', THUMBNAIL_MEDIA_TYPE)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Delete the least recently served thumbnails until the cache is back under 90% of its cap.
+
+        `keep` names an entry about to be served, which stays even if the cap is smaller than it.
+        """
+        if self._total_bytes <= self.capacity_bytes:
+            return
+        target = self.capacity_bytes * 0.9
+        with self._conn:
+            for row in self._conn.execute("SELECT key, bytes FROM entries ORDER BY last_access").fetchall():
+                if self._total_bytes <= target:
+                    break
+                if row["key"] == keep:
+                    continue
+                try:
+                    os.remove(self._file_path(row["key"]))
+                except FileNotFoundError:
+                    pass
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (row["key"],))
+                self._total_bytes -= row["bytes"]
+                self.evictions += 1
+
+    def get_thumbnail(self, image_path: str, size: int) -> CachedThumbnail:
+        """Get a thumbnail for an image, rendering and caching it on a miss"""
+        bucket = thumbnail_bucket(size)
+        st = os.stat(image_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM sources WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (image_path, st.st_size, st.st_mtime_ns)
+            ).fetchone()
+            cached = self._lookup(row["content_hash"], bucket) if row else None
+            if cached:
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        # Render outside the lock; concurrent misses for one image just write the same file twice
+        content_hash, thumbnail = render_thumbnail_file(image_path, bucket)
+        with self._lock, self._conn:
+            self._record_source(image_path, thumbnail.source_size, thumbnail.source_mtime_ns, content_hash)
+            cached = self._lookup(content_hash, bucket) or self._store(content_hash, thumbnail)
+        with self._lock:
+            self._evict(keep=self._key(content_hash, bucket))
+        return cached
+
+    def put_many(self, items: Iterable[Tuple[str, str, Thumbnail]]) -> int:
+        """Store (image path, content hash, Thumbnail) triples rendered elsewhere, e.g. during indexing"""
+        stored = 0
+        with self._lock:
+            with self._conn:
+                for image_path, content_hash, thumbnail in items:
+                    self._record_source(image_path, thumbnail.source_size, thumbnail.source_mtime_ns, content_hash)
+                    if not self._lookup(content_hash, thumbnail.size):
+                        self._store(content_hash, thumbnail)
+                        stored += 1
+            self._evict()
+        return stored
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Occupancy and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+                "bytes": self._total_bytes,
+                "capacity_bytes": self.capacity_bytes,
+                "format": THUMBNAIL_FORMAT.lower(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+_thumbnail_cache: Optional[ThumbnailCache] = None
+_thumbnail_cache_lock = threading.Lock()
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Get the process-wide thumbnail cache"""
+    global _thumbnail_cache
+    with _thumbnail_cache_lock:
+        if _thumbnail_cache is None:
+            _thumbnail_cache = ThumbnailCache()
+        return _thumbnail_cache
+
+def close_thumbnail_cache() -> None:
+    """Close the thumbnail cache's index"""
+    global _thumbnail_cache
+    with _thumbnail_cache_lock:
+        if _thumbnail_cache is not None:
+            _thumbnail_cache.close()
+            _thumbnail_cache = None
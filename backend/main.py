@@ -1,13 +1,29 @@
+import time
+
+# Timed from here so the log shows what importing the application costs; readiness
+# timings count from its import, so it comes first
+_import_start = time.perf_counter()
+from app.utils.readiness import mark_loading, mark_ready, mark_failed, get_readiness, record_timing
+
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from typing import List, Optional, Dict, Any
 import os
 import uuid
+import asyncio
 import logging
 from pathlib import Path
-from app.routes import search_router, library_router, albums_router, settings_router, profiles_router, image_router
-from app.utils.database import initialize_database
-from app.services.indexing_service import start_indexing_scheduler
+from app.routes import search_router, library_router, albums_router, settings_router, profiles_router, image_router, indexing_router
+from app.utils.database import initialize_metadata_store, initialize_vector_store
+from app.services.indexing_service import shutdown_decode_pool
+from app.services.watcher_service import start_indexing_scheduler, stop_indexing_scheduler
+from app.utils.executors import run_background_inference, shutdown_executors
+from app.utils.embedding_cache import save_query_embedding_cache
+from app.database.manifest_repository import close_manifests
+from app.database.metadata_store import close_metadata_store
+from app.utils.thumbnails import close_thumbnail_cache
+from app.utils.embeddings import start_model_preload, load_ml_libraries
 
 # Configure logging
 logging.basicConfig(
@@ -15,6 +31,7 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+record_timing("imports", time.perf_counter() - _import_start)
 
 # Initialize the FastAPI app
 app = FastAPI(
@@ -39,20 +56,81 @@ app.include_router(albums_router.router, prefix="/api/albums", tags=["albums"])
 app.include_router(settings_router.router, prefix="/api/settings", tags=["settings"])
 app.include_router(profiles_router.router, prefix="/api/profiles", tags=["profiles"])
 app.include_router(image_router.router, prefix="/api/image", tags=["image"])
+app.include_router(indexing_router.router, prefix="/api/indexing", tags=["indexing"])
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database and start background services on application startup."""
+_background_startup: Optional[asyncio.Task] = None
+
+async def _initialize_subsystem(name: str, initialize, required: bool = False) -> bool:
+    """Run one startup phase, recording its state and timing; returns whether it succeeded"""
+    mark_loading(name)
     try:
-        # Initialize database connections and collections
-        await initialize_database()
-        # Start background indexing scheduler
-        start_indexing_scheduler()
-        logger.info("Application initialization successful")
+        details = await initialize()
+        mark_ready(name, **(details or {}))
+        return True
     except Exception as e:
-        logger.error(f"Error during application startup: {str(e)}")
-        # Re-raise to prevent app from starting with initialization errors
-        raise
+        mark_failed(name, str(e))
+        if required:
+            raise
+        return False
+
+async def _initialize_vector_store():
+    await initialize_vector_store()
+
+async def _load_ml_libraries():
+    return await run_background_inference(load_ml_libraries)
+
+async def _preload_models():
+    preload = start_model_preload()
+    if preload is None:
+        return {"preload": "disabled"}
+    await preload
+
+async def _start_indexing_scheduler():
+    start_indexing_scheduler()
+
+async def _initialize_in_background():
+    """Bring up the vector store, ML libraries, models and indexing after the port is bound"""
+    vector_store, ml_libraries = await asyncio.gather(
+        _initialize_subsystem("vector_store", _initialize_vector_store),
+        _initialize_subsystem("ml_libraries", _load_ml_libraries)
+    )
+    if not ml_libraries:
+        mark_failed("models", "ML libraries failed to load")
+        mark_failed("indexing_scheduler", "ML libraries failed to load")
+        return
+    # Indexing writes to the vector store, so it waits for it; preloading only needs the metadata store
+    if vector_store:
+        await _initialize_subsystem("indexing_scheduler", _start_indexing_scheduler)
+    else:
+        mark_failed("indexing_scheduler", "Vector store failed to open")
+    await _initialize_subsystem("models", _preload_models)
+    logger.info(f"Application initialization successful: {get_readiness()['uptime_seconds']:.2f}s after process start")
+
+@app.on_event("startup")
+async def startup_event():
+    """Open the metadata store, then start everything slow in the background.
+
+    Health, profile and settings requests are served as soon as the port is bound;
+    `/ready` reports when searching and indexing are available.
+    """
+    global _background_startup
+    # Profiles and settings are served from the metadata store, so it opens before the port is bound
+    # Raises to prevent app from starting with initialization errors
+    await _initialize_subsystem("metadata_store", initialize_metadata_store, required=True)
+    _background_startup = asyncio.create_task(_initialize_in_background())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release background worker pools on application shutdown."""
+    if _background_startup is not None:
+        _background_startup.cancel()
+    stop_indexing_scheduler()
+    shutdown_decode_pool()
+    shutdown_executors()
+    close_manifests()
+    close_metadata_store()
+    close_thumbnail_cache()
+    save_query_embedding_cache()
 
 @app.get("/")
 async def root():
@@ -64,6 +142,12 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """State and timings of each startup subsystem; 503 until searching and indexing can run."""
+    readiness = get_readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+import pytest
+
+# App modules create their data directories under the home directory on import, so
+# point it at a scratch directory before any test imports them
+_home = tempfile.mkdtemp(prefix="lif-tests-")
+os.environ["HOME"] = _home
+os.environ["USERPROFILE"] = _home
+os.environ.pop("LIF_THUMBNAIL_DIR", None)
+os.environ.pop("LIF_QUERY_CACHE_PATH", None)
+
+@pytest.fixture
+def manifest(tmp_path):
+    """An empty file manifest, removed after the test"""
+    # Imported here so the module sees the scratch home directory
+    from app.database.manifest_repository import ManifestRepository
+    repository = ManifestRepository(f"test-{tmp_path.name}")
+    yield repository
+    repository.close()
+    os.remove(repository.db_path)
+
+@pytest.fixture
+def store(tmp_path):
+    """An empty metadata store, closed after the test"""
+    from app.database.metadata_store import MetadataStore
+    metadata_store = MetadataStore(str(tmp_path / "metadata.sqlite3"))
+    yield metadata_store
+    metadata_store.close()
@@ -0,0 +1,68 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.database import chat_repository
+from app.database.chat_repository import ChatRepository
+
+@pytest.fixture
+def chat(store, monkeypatch):
+    """A chat with seven messages, numbered 1 to 7"""
+    monkeypatch.setattr(chat_repository, "get_metadata_store", lambda: store)
+    repository = ChatRepository("p1")
+    
+    async def create():
+        chat_id = await repository.create_chat("cats")
+        for i in range(1, 8):
+            await repository.add_message(chat_id, "query", {"n": i})
+        return chat_id
+    
+    return repository, asyncio.run(create())
+
+def _page(repository, chat_id, **cursor):
+    page = asyncio.run(repository.get_messages(chat_id, limit=3, **cursor))
+    return [message["seq"] for message in page["messages"]], page["before"], page["after"]
+
+def test_appends_number_messages_from_the_chat_count(chat, store):
+    repository, chat_id = chat
+    
+    assert store.get_chat(chat_id)["message_count"] == 7
+    assert store.append_chat_message(chat_id, {"type": "result"}) == 8
+    assert [message["content"]["n"] for message in store.get_chat_messages(chat_id, limit=3, before=4)] == [1, 2, 3]
+
+def test_concurrent_appends_get_distinct_sequence_numbers(store):
+    store.create_chat({"id": "c1", "profile_id": "p1", "title": "busy"})
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        seqs = list(pool.map(lambda i: store.append_chat_message("c1", {"content": {"n": i}}), range(40)))
+    
+    assert sorted(seqs) == list(range(1, 41))
+    assert store.get_chat("c1")["message_count"] == 40
+
+def test_appending_to_a_missing_chat_fails(chat, store):
+    repository, _ = chat
+    
+    assert store.append_chat_message("missing", {"type": "query"}) is None
+    assert asyncio.run(repository.add_message("missing", "query", {})) is None
+
+def test_newest_page_comes_first(chat):
+    assert _page(*chat) == ([5, 6, 7], 5, 7)
+
+def test_paging_backward_stops_at_the_first_message(chat):
+    assert _page(*chat, before=5) == ([2, 3, 4], 2, 4)
+    assert _page(*chat, before=2) == ([1], None, 1)
+    assert _page(*chat, before=1) == ([], None, None)
+
+def test_paging_forward_echoes_the_cursor_when_caught_up(chat):
+    assert _page(*chat, after=3) == ([4, 5, 6], 4, 6)
+    assert _page(*chat, after=6) == ([7], 7, 7)
+    assert _page(*chat, after=7) == ([], None, 7)
+
+def test_empty_chat_has_no_cursors(store, monkeypatch):
+    monkeypatch.setattr(chat_repository, "get_metadata_store", lambda: store)
+    repository = ChatRepository("p1")
+    chat_id = asyncio.run(repository.create_chat())
+    
+    assert _page(repository, chat_id) == ([], None, None)
+    assert asyncio.run(repository.get_chat(chat_id))["title"] == "New Chat"
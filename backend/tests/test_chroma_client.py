@@ -0,0 +1,116 @@
+import uuid
+
+import pytest
+
+from app.database import chroma_client
+from app.database.chroma_client import ChromaCollectionWrapper
+
+class FakeChromaCollection:
+    """In-memory ChromaDB collection; `update` replaces metadata, which is how a field gets dropped"""
+    
+    def __init__(self):
+        self.name = f"test-{uuid.uuid4().hex}"
+        self.rows = {}
+        self.scans = 0
+    
+    def get(self, ids=None, include=None, limit=None, offset=None, where=None):
+        if ids is not None:
+            selected = [doc_id for doc_id in ids if doc_id in self.rows]
+        else:
+            selected = list(self.rows)
+            if where is not None:
+                clauses = where.get("$and", [where])
+                selected = [doc_id for doc_id in selected if all(
+                    self.rows[doc_id].get(key) == value for clause in clauses for key, value in clause.items()
+                )]
+            elif offset in (None, 0):
+                self.scans += 1
+            selected = selected[offset or 0:None if limit is None else (offset or 0) + limit]
+        return {"ids": selected, "metadatas": [dict(self.rows[doc_id]) for doc_id in selected]}
+    
+    def add(self, ids, embeddings, metadatas=None, documents=None):
+        for doc_id, metadata in zip(ids, metadatas):
+            self.rows[doc_id] = dict(metadata)
+    
+    upsert = add
+    
+    def update(self, ids, embeddings=None, metadatas=None, documents=None):
+        for doc_id, metadata in zip(ids, metadatas):
+            self.rows[doc_id] = dict(metadata)
+    
+    def delete(self, ids):
+        for doc_id in ids:
+            self.rows.pop(doc_id, None)
+
+@pytest.fixture
+def collection():
+    fake = FakeChromaCollection()
+    yield ChromaCollectionWrapper(fake)
+    chroma_client._drop_collection_indexes(fake.name)
+
+def _ids(documents):
+    return [document["id"] for document in documents]
+
+def test_indexed_lookups_scan_once_and_follow_writes(collection):
+    collection.add(["a", "b"], [[0.0], [0.0]], [{"filepath": "/a.jpg"}, {"filepath": "/b.jpg"}])
+    
+    assert collection.find_one({"filepath": "/a.jpg"})["id"] == "a"
+    collection.add(["c"], [[0.0]], [{"filepath": "/a.jpg"}])
+    collection.upsert(["b"], [[0.0]], [{"filepath": "/a.jpg"}])
+    
+    assert _ids(collection.find({"filepath": "/a.jpg"})) == ["a", "b", "c"]
+    assert collection.find({"filepath": "/b.jpg"}) == []
+    assert collection.collection.scans == 1
+    
+    collection.delete(["a"])
+    assert _ids(collection.find({"filepath": "/a.jpg"})) == ["b", "c"]
+    assert collection.collection.scans == 1
+
+def test_update_that_drops_a_field_rebuilds_the_index(collection):
+    collection.add(["a"], [[0.0]], [{"filepath": "/a.jpg", "kind": "photo"}])
+    assert collection.find_one({"filepath": "/a.jpg"})["id"] == "a"
+    
+    collection.update(["a"], metadatas=[{"kind": "photo"}])
+    
+    assert collection.find_one({"filepath": "/a.jpg"}) is None
+    assert collection.collection.scans == 2
+
+def test_update_one_moves_a_document_between_values(collection):
+    collection.add(["a"], [[0.0]], [{"filepath": "/a.jpg", "profile_id": "p1"}])
+    
+    assert collection.update_one({"filepath": "/a.jpg"}, {"$set": {"filepath": "/moved.jpg"}})
+    
+    assert collection.find_one({"filepath": "/a.jpg"}) is None
+    assert collection.find_one({"filepath": "/moved.jpg"}) == {"id": "a", "filepath": "/moved.jpg", "profile_id": "p1"}
+    assert not collection.update_one({"filepath": "/missing.jpg"}, {"name": "x"})
+
+def test_delete_one_drops_the_document_from_the_index(collection):
+    collection.add(["a", "b"], [[0.0], [0.0]], [{"profile_id": "p1"}, {"profile_id": "p1"}])
+    
+    assert collection.delete_one({"profile_id": "p1"})
+    
+    assert _ids(collection.find({"profile_id": "p1"})) == ["b"]
+    assert not collection.delete_one({"profile_id": "p2"})
+
+def test_indexed_lookup_rechecks_other_predicates(collection):
+    collection.add(["a", "b", "c"], [[0.0]] * 3, [
+        {"profile_id": "p1", "kind": "photo"}, {"profile_id": "p1", "kind": "scan"}, {"profile_id": "p1", "kind": "photo"}
+    ])
+    
+    assert _ids(collection.find({"profile_id": "p1", "kind": "photo"})) == ["a", "c"]
+    assert _ids(collection.find({"profile_id": "p1"}, skip=1, limit=1)) == ["b"]
+    assert _ids(collection.find({"id": "b", "kind": "photo"})) == []
+
+def test_scalar_predicates_are_pushed_down(collection):
+    collection.add(["a", "b"], [[0.0], [0.0]], [{"kind": "photo"}, {"kind": "scan"}])
+    
+    assert _ids(collection.find({"kind": "scan"})) == ["b"]
+    assert collection.collection.scans == 0
+
+def test_scan_fallback_skips_after_filtering(collection, monkeypatch):
+    monkeypatch.setattr(chroma_client, "SCAN_PAGE_SIZE", 2)
+    tags = [["a"], ["b"], ["a"], ["b"], ["a"], ["a"]]
+    collection.add([f"d{i}" for i in range(6)], [[0.0]] * 6, [{"tags": tag} for tag in tags])
+    
+    assert _ids(collection.find({"tags": ["a"]}, skip=1, limit=2)) == ["d2", "d4"]
+    assert _ids(collection.find({"tags": ["a"]}, skip=3)) == ["d5"]
@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.utils.embedding_cache import EmbeddingCache, normalize_query_text
+
+def test_normalize_query_text():
+    assert normalize_query_text("  A  Red\tCar ") == "a red car"
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EmbeddingCache(capacity=2)
+    cache.put("model", "text", "a", [1.0])
+    cache.put("model", "text", "b", [2.0])
+    cache.get("model", "text", "a")
+    cache.put("model", "text", "c", [3.0])
+    
+    assert cache.get("model", "text", "b") is None
+    assert cache.get("model", "text", "a") is not None
+    assert cache.get_stats()["size"] == 2
+
+def test_zero_capacity_disables_cache():
+    cache = EmbeddingCache(capacity=0)
+    cache.put("model", "text", "a", [1.0])
+    
+    assert cache.get("model", "text", "a") is None
+
+def test_entries_are_scoped_per_model():
+    cache = EmbeddingCache(capacity=4)
+    cache.put("model-a", "text", "cat", [1.0, 0.0])
+    
+    assert cache.get("model-b", "text", "cat") is None
+    np.testing.assert_array_equal(cache.get("model-a", "text", "cat"), [1.0, 0.0])
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 1
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "queries.npz")
+    cache = EmbeddingCache(capacity=4)
+    cache.put("model-a", "text", "cat", [1.0, 0.0])
+    cache.put("model-b", "image", "0f3a", [0.0, 1.0])
+    cache.save(path)
+    
+    restored = EmbeddingCache(capacity=4)
+    restored.load(path)
+    
+    np.testing.assert_array_equal(restored.get("model-b", "image", "0f3a"), [0.0, 1.0])
+    assert restored.get_stats()["models"] == 2
+
+def test_load_accepts_single_model_files(tmp_path):
+    path = str(tmp_path / "queries.npz")
+    with open(path, "wb") as f:
+        np.savez(f, model=np.array("model-a"), kinds=np.array(["text"]), keys=np.array(["cat"]),
+                 vectors=np.ones((1, 2), dtype=np.float32))
+    
+    cache = EmbeddingCache(capacity=4)
+    cache.load(path)
+    
+    assert cache.get("model-a", "text", "cat") is not None
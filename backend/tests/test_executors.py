@@ -0,0 +1,84 @@
+import asyncio
+import sys
+import threading
+import time
+
+from app.utils import executors
+from app.utils.executors import InferenceGate
+
+def test_background_passes_when_no_search_ran():
+    gate = InferenceGate(yield_seconds=0.5)
+    
+    start = time.perf_counter()
+    gate.wait_for_interactive()
+    
+    assert time.perf_counter() - start < 0.1
+    assert gate.get_stats()["background_waits"] == 0
+
+def test_background_waits_for_search_and_yield_period():
+    gate = InferenceGate(yield_seconds=0.1)
+    gate.enter()
+    resumed = threading.Event()
+    
+    def background():
+        gate.wait_for_interactive()
+        resumed.set()
+    
+    thread = threading.Thread(target=background)
+    thread.start()
+    assert not resumed.wait(0.1)
+    
+    finished = time.perf_counter()
+    gate.exit()
+    assert resumed.wait(1)
+    thread.join()
+    
+    assert time.perf_counter() - finished >= 0.09
+    stats = gate.get_stats()
+    assert stats["active_interactive"] == 0
+    assert stats["interactive_calls"] == 1
+    assert stats["background_waits"] == 1
+
+def test_background_cpus_default_to_upper_half(monkeypatch):
+    monkeypatch.setattr(executors.os, "sched_getaffinity", lambda pid: {0, 1, 2, 3, 4, 5, 6, 7}, raising=False)
+    
+    assert executors._background_cpus("") == {4, 5, 6, 7}
+    assert executors._background_cpus("all") == set()
+    assert executors._background_cpus("0-1,6") == {0, 1, 6}
+
+def test_single_cpu_is_left_unpinned(monkeypatch):
+    monkeypatch.setattr(executors.os, "sched_getaffinity", lambda pid: {0}, raising=False)
+    assert executors._background_cpus("") == set()
+
+class FakeTorch:
+    """Records intra-op thread counts per calling thread, like OpenMP's per-thread setting"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get_num_threads(self):
+        return getattr(self._local, "threads", 64)
+
+    def set_num_threads(self, threads):
+        self._local.threads = threads
+
+def test_search_and_indexing_get_separate_thread_budgets(monkeypatch):
+    torch = FakeTorch()
+    monkeypatch.setitem(sys.modules, "torch", torch)
+    monkeypatch.setattr(executors, "TORCH_THREADS", 8)
+    monkeypatch.setattr(executors, "BACKGROUND_THREADS", 3)
+    monkeypatch.setattr(executors, "BACKGROUND_CPUS", set())
+    monkeypatch.setattr(executors, "_gate", InferenceGate(yield_seconds=0))
+    monkeypatch.setattr(executors, "_inference_executor", None)
+    monkeypatch.setattr(executors, "_background_executor", None)
+    
+    async def run():
+        background = await executors.run_background_inference(torch.get_num_threads)
+        interactive = await executors.run_inference(torch.get_num_threads)
+        return background, interactive
+    
+    try:
+        assert asyncio.run(run()) == (3, 8)
+    finally:
+        executors.get_inference_executor().shutdown()
+        executors.get_background_executor().shutdown()
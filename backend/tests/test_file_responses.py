@@ -0,0 +1,100 @@
+import asyncio
+import os
+from email.utils import formatdate
+
+import pytest
+from starlette.requests import Request
+
+from app.utils.file_responses import conditional_file_response, file_etag, parse_range
+
+CONTENT = bytes(range(256)) * 4
+
+def _request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+async def _consume(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+def _body(response):
+    return asyncio.run(_consume(response))
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "image.jpg"
+    path.write_bytes(CONTENT)
+    return str(path)
+
+def _serve(path, **headers):
+    return conditional_file_response(_request(**headers), path, "image/jpeg", "private, max-age=60")
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=1000-", (1000, 1023)),
+    ("bytes=-24", (1000, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(CONTENT)) == expected
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=9-3"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, len(CONTENT))
+
+def test_full_response_carries_validators(image):
+    response = _serve(image)
+    
+    assert response.status_code == 200
+    assert response.headers["etag"] == file_etag(os.stat(image))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"] == "private, max-age=60"
+
+def test_if_none_match_returns_304(image):
+    etag = file_etag(os.stat(image))
+    
+    assert _serve(image, if_none_match=etag).status_code == 304
+    assert _serve(image, if_none_match=f'"other", W/{etag}').status_code == 304
+    assert _serve(image, if_none_match='"other"').status_code == 200
+
+def test_if_none_match_takes_precedence_over_if_modified_since(image):
+    future = formatdate(os.stat(image).st_mtime + 3600, usegmt=True)
+    
+    assert _serve(image, if_modified_since=future).status_code == 304
+    assert _serve(image, if_none_match='"other"', if_modified_since=future).status_code == 200
+
+def test_if_modified_since_older_than_file(image):
+    past = formatdate(os.stat(image).st_mtime - 3600, usegmt=True)
+    
+    assert _serve(image, if_modified_since=past).status_code == 200
+    assert _serve(image, if_modified_since="not a date").status_code == 200
+
+def test_range_returns_206_with_the_requested_bytes(image):
+    response = _serve(image, range="bytes=10-19")
+    
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+    assert response.headers["content-length"] == "10"
+    assert _body(response) == CONTENT[10:20]
+
+def test_unsatisfiable_range_returns_416(image):
+    response = _serve(image, range=f"bytes={len(CONTENT)}-")
+    
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+def test_if_range_with_stale_validator_returns_whole_file(image):
+    etag = file_etag(os.stat(image))
+    
+    assert _serve(image, range="bytes=0-9", if_range=etag).status_code == 206
+    assert _serve(image, range="bytes=0-9", if_range='"stale"').status_code == 200
+
+def test_directories_are_rejected(tmp_path):
+    with pytest.raises(IsADirectoryError):
+        _serve(str(tmp_path))
@@ -0,0 +1,363 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.models.profiles_model import ModelType
+from app.services import indexing_service
+from app.database.manifest_repository import ManifestEntry
+from app.services.indexing_service import (
+    _apply_manifest_diff, _diff_against_manifest, _image_id_for_path, _new_pipeline_stats,
+    check_for_new_images, run_indexing_pipeline
+)
+from app.utils import embeddings, image_preprocessing
+from app.utils.embeddings import generate_image_embeddings_from_pixels
+from app.utils.image_preprocessing import compute_content_hash
+
+# Embedding width of the fake encoder
+DIMENSION = 16
+
+# CLIP preprocessing settings, shrunk so decoding the test images stays cheap
+PREPROCESS_CONFIG = {
+    "shortest_edge": 8,
+    "crop_size": (8, 8),
+    "image_mean": [0.5, 0.5, 0.5],
+    "image_std": [0.5, 0.5, 0.5],
+}
+
+class FakeCollection:
+    """In-memory stand-in for the async ChromaDB collection wrapper"""
+    
+    def __init__(self):
+        self.rows = {}
+        self.upserts = []
+    
+    def get(self, include):
+        return {"ids": list(self.rows), "metadatas": [metadata for _, metadata in self.rows.values()]}
+    
+    async def get_async(self, ids, include):
+        found = [image_id for image_id in ids if image_id in self.rows]
+        return {
+            "ids": found,
+            "embeddings": [self.rows[image_id][0] for image_id in found],
+            "metadatas": [self.rows[image_id][1] for image_id in found],
+        }
+    
+    async def upsert_async(self, ids, embeddings, metadatas):
+        self.upserts.append(len(ids))
+        for image_id, embedding, metadata in zip(ids, embeddings, metadatas):
+            self.rows[image_id] = (embedding, metadata)
+    
+    async def delete_async(self, ids):
+        for image_id in ids:
+            self.rows.pop(image_id, None)
+
+@pytest.fixture
+def encoder(monkeypatch):
+    """Sizes of the batches sent to the vision tower; each row gets a unit vector without running a model"""
+    batches = []
+    
+    def encode(pixel_values, model_type, backend=None):
+        batches.append(len(pixel_values))
+        vectors = np.random.default_rng(len(batches)).normal(size=(len(pixel_values), DIMENSION))
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+    
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(embeddings, "_generate_pixel_embeddings_sync", encode)
+    monkeypatch.setattr(indexing_service, "get_image_preprocess_config", lambda model_type, backend=None: PREPROCESS_CONFIG)
+    monkeypatch.setattr(indexing_service, "get_decode_pool", lambda: pool)
+    yield batches
+    pool.shutdown()
+
+@pytest.fixture
+def embedded(monkeypatch):
+    """Paths sent to the embedding pipeline; each gets a vector without running a model"""
+    paths = []
+    
+    async def run_indexing_pipeline(image_paths, collection, batch_size, stats, model_type, backend=None):
+        results = []
+        for path in image_paths:
+            paths.append(path)
+            metadata = {"filepath": path, "content_hash": compute_content_hash(path)}
+            await collection.upsert_async([_image_id_for_path(path)], [[float(len(paths))]], [metadata])
+            results.append((_image_id_for_path(path), metadata))
+        return results
+    
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(indexing_service, "run_indexing_pipeline", run_indexing_pipeline)
+    monkeypatch.setattr(indexing_service, "get_decode_pool", lambda: pool)
+    yield paths
+    pool.shutdown()
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return os.path.abspath(path)
+
+def _write_images(folder, count):
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"{i:03d}.jpg")
+        Image.new("RGB", (32, 24), (i * 20 % 256, 100, 200)).save(path)
+        paths.append(os.path.abspath(path))
+    return paths
+
+def _entry(path, image_id=None):
+    st = os.stat(path)
+    return ManifestEntry(path, st.st_size, st.st_mtime_ns, st.st_ino, compute_content_hash(path), image_id or _image_id_for_path(path))
+
+def _apply(collection, manifest, diff):
+    return asyncio.run(_apply_manifest_diff(collection, manifest, diff, 8, _new_pipeline_stats()))
+
+def test_pixel_batch_embeds_to_one_row_per_image(encoder):
+    pixel_values = np.zeros((5, 3, 8, 8), dtype=np.float32)
+    
+    vectors = asyncio.run(generate_image_embeddings_from_pixels(pixel_values))
+    
+    assert vectors.shape == (5, DIMENSION)
+    assert vectors.dtype == np.float32
+    assert encoder == [5]
+
+def test_pipeline_embeds_and_upserts_once_per_batch(tmp_path, encoder):
+    paths = _write_images(str(tmp_path), 10)
+    collection = FakeCollection()
+    stats = _new_pipeline_stats()
+    
+    indexed = asyncio.run(run_indexing_pipeline(paths, collection, 4, stats))
+    
+    assert sorted(image_id for image_id, _ in indexed) == sorted(_image_id_for_path(path) for path in paths)
+    assert collection.upserts == [4, 4, 2]
+    assert sum(encoder) == 10
+    assert all(len(embedding) == DIMENSION for embedding, _ in collection.rows.values())
+    assert stats["embedded"] == 10 and stats["failed"] == 0
+
+def test_rescan_reports_throughput(tmp_path, monkeypatch, encoder):
+    folder = str(tmp_path / "photos")
+    _write_images(folder, 6)
+    collection = FakeCollection()
+    
+    class FakeStore:
+        def get_settings(self, profile_id):
+            return {"monitored_folders": [folder]}
+        
+        def update_settings(self, profile_id, updates):
+            return updates
+    
+    async def index_model(profile_id):
+        return ModelType.DEFAULT, "torch"
+    
+    async def images_collection(profile_id, model_type, backend=None):
+        return collection
+    
+    monkeypatch.setattr(indexing_service, "get_metadata_store", lambda: FakeStore())
+    monkeypatch.setattr(indexing_service, "get_profile_index_model", index_model)
+    monkeypatch.setattr(indexing_service, "get_images_collection", images_collection)
+    profile_id = f"test-{tmp_path.name}"
+    
+    indexed = asyncio.run(check_for_new_images(profile_id, batch_size=4))
+    status = indexing_service.get_indexing_status(profile_id)
+    
+    assert len(indexed) == 6
+    assert collection.upserts == [4, 2]
+    assert status["indexed_count"] == 6 and status["batch_size"] == 4
+    assert status["images_per_second"] > 0
+
+def test_diff_classifies_files(tmp_path):
+    folder = str(tmp_path / "photos")
+    unchanged = _write(os.path.join(folder, "unchanged.jpg"), b"same")
+    updated = _write(os.path.join(folder, "updated.jpg"), b"old")
+    touched = _write(os.path.join(folder, "touched.jpg"), b"bytes")
+    known = {path: _entry(path) for path in (unchanged, updated, touched)}
+    known["/gone.jpg"] = ManifestEntry("/gone.jpg", 1, 1, 1, None, "img_gone")
+    
+    _write(updated, b"new content")
+    os.utime(touched, ns=(1, 1))
+    added = _write(os.path.join(folder, "nested", "added.png"), b"new")
+    _write(os.path.join(folder, "notes.txt"), b"not an image")
+    
+    diff = _diff_against_manifest([folder], known)
+    
+    assert diff.added == [added]
+    assert diff.updated == [updated]
+    assert [entry.path for entry in diff.touched] == [touched]
+    assert diff.touched[0].mtime_ns == 1
+    assert [entry.path for entry in diff.removed] == ["/gone.jpg"]
+    assert set(diff.stats) == {added, updated}
+
+def test_diff_treats_unreadable_files_as_updated(tmp_path, monkeypatch):
+    path = _write(str(tmp_path / "locked.jpg"), b"bytes")
+    known = {path: _entry(path)}
+    os.utime(path, ns=(1, 1))
+    
+    def locked(image_path):
+        raise PermissionError(image_path)
+    
+    monkeypatch.setattr(image_preprocessing, "compute_content_hash", locked)
+    diff = _diff_against_manifest([str(tmp_path)], known)
+    
+    assert diff.updated == [path]
+    assert diff.touched == []
+
+def test_diff_keeps_entries_of_unreachable_folders(tmp_path):
+    missing = str(tmp_path / "unmounted")
+    entry = ManifestEntry(os.path.join(missing, "a.jpg"), 1, 1, 1, None, "img_a")
+    
+    diff = _diff_against_manifest([missing], {entry.path: entry})
+    
+    assert diff.removed == []
+
+def test_apply_refreshes_touched_entries_without_embedding(tmp_path, manifest, embedded):
+    path = _write(str(tmp_path / "a.jpg"), b"picture")
+    collection = FakeCollection()
+    _apply(collection, manifest, _diff_against_manifest([str(tmp_path)], {}))
+    embedded.clear()
+    
+    os.utime(path, ns=(1, 1))
+    _apply(collection, manifest, _diff_against_manifest([str(tmp_path)], manifest.load()))
+    
+    assert embedded == []
+    assert manifest.load()[path].mtime_ns == 1
+
+def test_apply_embeds_new_content_once(tmp_path, manifest, embedded):
+    first = _write(str(tmp_path / "a.jpg"), b"picture")
+    copy = _write(str(tmp_path / "copy.jpg"), b"picture")
+    other = _write(str(tmp_path / "b.jpg"), b"other picture")
+    collection = FakeCollection()
+    
+    diff = _diff_against_manifest([str(tmp_path)], {})
+    indexed = _apply(collection, manifest, diff)
+    
+    assert len(embedded) == 2 and other in embedded
+    assert set(indexed) == {_image_id_for_path(path) for path in (first, copy, other)}
+    assert collection.rows[_image_id_for_path(copy)][0] == collection.rows[_image_id_for_path(first)][0]
+    assert set(manifest.load()) == {first, copy, other}
+
+def test_apply_reuses_vectors_of_renamed_files(tmp_path, manifest, embedded):
+    old_path = _write(str(tmp_path / "old.jpg"), b"picture")
+    collection = FakeCollection()
+    _apply(collection, manifest, _diff_against_manifest([str(tmp_path)], {}))
+    embedded.clear()
+    
+    new_path = str(tmp_path / "new.jpg")
+    os.rename(old_path, new_path)
+    diff = _diff_against_manifest([str(tmp_path)], manifest.load())
+    _apply(collection, manifest, diff)
+    
+    assert embedded == []
+    assert list(collection.rows) == [_image_id_for_path(new_path)]
+    assert collection.rows[_image_id_for_path(new_path)][1]["filepath"] == new_path
+    assert list(manifest.load()) == [new_path]
+
+@pytest.fixture
+def profile_index(tmp_path, monkeypatch):
+    """A profile searching the default model's index, configured for the quality model"""
+    folder = str(tmp_path / "photos")
+    os.makedirs(folder)
+    settings = {"monitored_folders": [folder], "vlm_model": ModelType.QUALITY.value}
+    indexed = {"model": (ModelType.DEFAULT, "torch")}
+    collections = {}
+    events = []
+    
+    class FakeStore:
+        def get_settings(self, profile_id):
+            return settings
+        
+        def update_settings(self, profile_id, updates):
+            settings.update(updates)
+            return settings
+    
+    async def index_model(profile_id):
+        return indexed["model"]
+    
+    def set_index_model(profile_id, model_type, backend="torch"):
+        events.append(("switch", model_type, backend))
+        indexed["model"] = (model_type, backend)
+    
+    async def images_collection(profile_id, model_type, backend=None):
+        return collections.setdefault((model_type, backend), FakeCollection())
+    
+    monkeypatch.setattr(indexing_service, "get_metadata_store", lambda: FakeStore())
+    monkeypatch.setattr(indexing_service, "get_profile_index_model", index_model)
+    monkeypatch.setattr(indexing_service, "set_profile_index_model", set_index_model)
+    monkeypatch.setattr(indexing_service, "get_images_collection", images_collection)
+    monkeypatch.setattr(indexing_service, "get_encoder_backend", lambda model_type: "torch")
+    return {
+        "id": f"test-{tmp_path.name}", "folder": folder, "settings": settings,
+        "indexed": indexed, "collections": collections, "events": events,
+    }
+
+def test_migration_fills_the_new_index_before_switching(profile_index, embedded, monkeypatch):
+    folder, events = profile_index["folder"], profile_index["events"]
+    paths = [_write(os.path.join(folder, f"{i}.jpg"), bytes([i]) * 8) for i in range(3)]
+    apply_diff = indexing_service._apply_manifest_diff
+    
+    async def apply_then_change(*args, **kwargs):
+        indexed = await apply_diff(*args, **kwargs)
+        events.append(("applied", len(indexed)))
+        # A file added during the bulk pass is picked up by the locked catch-up pass
+        if len(events) == 1:
+            paths.append(_write(os.path.join(folder, "late.jpg"), b"late"))
+        return indexed
+    
+    monkeypatch.setattr(indexing_service, "_apply_manifest_diff", apply_then_change)
+    
+    indexed = asyncio.run(indexing_service.migrate_profile_index(profile_index["id"]))
+    
+    target = (ModelType.QUALITY, "torch")
+    assert sorted(indexed) == sorted(_image_id_for_path(path) for path in paths)
+    assert events == [("applied", 3), ("applied", 1), ("switch", *target)]
+    assert set(profile_index["collections"]) == {target}
+    assert len(profile_index["collections"][target].rows) == 4
+    manifest = indexing_service.get_manifest(profile_index["id"], indexing_service.index_suffix(*target))
+    assert set(asyncio.run(indexing_service.run_storage(manifest.load))) == set(paths)
+    status = indexing_service.get_indexing_status(profile_index["id"])
+    assert status["migration"]["completed"] and not status["migration"]["running"]
+
+def test_migration_to_the_searched_index_does_nothing(profile_index, embedded):
+    profile_index["settings"]["vlm_model"] = ModelType.DEFAULT.value
+    
+    assert asyncio.run(indexing_service.migrate_profile_index(profile_index["id"])) == []
+    assert profile_index["events"] == []
+    assert profile_index["collections"] == {}
+
+def test_rescan_resumes_an_unfinished_migration(profile_index, embedded, monkeypatch):
+    started = []
+    monkeypatch.setattr(indexing_service, "start_index_migration", lambda profile_id, target: started.append(target))
+    
+    asyncio.run(check_for_new_images(profile_index["id"]))
+    profile_index["settings"]["vlm_model"] = ModelType.DEFAULT.value
+    asyncio.run(check_for_new_images(profile_index["id"]))
+    
+    assert started == [ModelType.QUALITY]
+
+def test_migration_restarts_only_for_another_target(monkeypatch):
+    runs = []
+    
+    async def migrate(profile_id):
+        runs.append(profile_id)
+        await asyncio.sleep(10)
+    
+    monkeypatch.setattr(indexing_service, "migrate_profile_index", migrate)
+    
+    async def start():
+        indexing_service.start_index_migration("p1", ModelType.QUALITY)
+        first = indexing_service._migration_tasks["p1"]
+        indexing_service.start_index_migration("p1", ModelType.QUALITY)
+        same = indexing_service._migration_tasks["p1"]
+        indexing_service.start_index_migration("p1", ModelType.PERFORMANCE)
+        replaced = indexing_service._migration_tasks["p1"]
+        await asyncio.sleep(0)
+        replaced.cancel()
+        await asyncio.gather(first, replaced, return_exceptions=True)
+        return first, same, replaced
+    
+    first, same, replaced = asyncio.run(start())
+    
+    assert same is first and replaced is not first
+    assert first.cancelled()
+    assert runs == ["p1"]
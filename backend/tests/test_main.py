@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.utils import readiness
+
+# Records every top-level module the import asks for, whether or not it is installed,
+# so the check holds on machines without the ML libraries too
+_RECORD_IMPORTS = """
+import sys
+
+class Recorder:
+    requested = set()
+    
+    def find_spec(self, name, path=None, target=None):
+        Recorder.requested.add(name.split(".")[0])
+        return None
+
+sys.meta_path.insert(0, Recorder())
+import main
+print(" ".join(sorted(Recorder.requested | {name.split(".")[0] for name in sys.modules})))
+"""
+
+@pytest.fixture
+def client(monkeypatch):
+    """The application without its startup events, with every subsystem pending"""
+    import main
+    monkeypatch.setattr(readiness, "_states", {name: {"state": "pending"} for name in readiness.SUBSYSTEMS})
+    return TestClient(main.app)
+
+def test_ready_until_required_subsystems_are_up(client):
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+    
+    for name in readiness.REQUIRED_SUBSYSTEMS:
+        readiness.mark_loading(name)
+        assert client.get("/ready").status_code == 503
+        readiness.mark_ready(name)
+    
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["subsystems"]["models"]["state"] == "pending"
+
+def test_not_ready_when_a_required_subsystem_failed(client):
+    for name in readiness.REQUIRED_SUBSYSTEMS:
+        readiness.mark_ready(name)
+    readiness.mark_failed("vector_store", "disk full")
+    
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["subsystems"]["vector_store"]["error"] == "disk full"
+
+def test_importing_the_app_leaves_ml_libraries_unloaded():
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", _RECORD_IMPORTS], cwd=backend, env=os.environ.copy(),
+        capture_output=True, text=True, check=True
+    )
+    modules = set(result.stdout.split())
+    
+    assert "fastapi" in modules
+    assert not modules & {"torch", "chromadb", "transformers", "onnxruntime"}
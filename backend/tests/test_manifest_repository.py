@@ -0,0 +1,30 @@
+import os
+
+from app.database.manifest_repository import ManifestEntry
+
+def _entry(path, content_hash=None, image_id=None):
+    return ManifestEntry(path, 10, 1, 1, content_hash, image_id or f"img_{os.path.basename(path)}")
+
+def test_delete_paths(manifest):
+    manifest.upsert_entries([_entry("/a.jpg"), _entry("/b.jpg")])
+    manifest.delete_paths(["/a.jpg"])
+    
+    assert list(manifest.load()) == ["/b.jpg"]
+    assert manifest.count() == 1
+
+def test_entries_under_matches_only_the_folder(manifest):
+    inside = [os.path.join(os.sep, "photos", "a.jpg"), os.path.join(os.sep, "photos", "trip", "b.jpg")]
+    outside = [os.path.join(os.sep, "photos2", "c.jpg"), os.path.join(os.sep, "photosX.jpg")]
+    manifest.upsert_entries(_entry(path) for path in inside + outside)
+    
+    assert sorted(entry.path for entry in manifest.entries_under(os.path.join(os.sep, "photos"))) == sorted(inside)
+    assert sorted(entry.path for entry in manifest.entries_under(os.path.join(os.sep, "photos") + os.sep)) == sorted(inside)
+
+def test_duplicate_groups_and_hash_lookup(manifest):
+    manifest.upsert_entries([
+        _entry("/a.jpg", "h1"), _entry("/b.jpg", "h1"), _entry("/c.jpg", "h2"), _entry("/d.jpg"),
+    ])
+    
+    assert manifest.count_duplicate_groups() == 1
+    assert [[entry.path for entry in group] for group in manifest.duplicate_groups()] == [["/a.jpg", "/b.jpg"]]
+    assert set(manifest.find_by_hashes(["h1", "h2", "missing"])) == {"h1", "h2"}
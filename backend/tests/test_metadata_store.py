@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from app.database.metadata_store import migrate_from_chroma
+
+class FakeChromaCollection:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def get(self, include):
+        return {"ids": list(self.rows), "metadatas": list(self.rows.values())}
+
+class FakeChromaClient:
+    """The legacy collections of an earlier ChromaDB-only install"""
+    
+    def __init__(self, collections):
+        self.collections = collections
+    
+    def get_collection(self, name):
+        if name not in self.collections:
+            raise ValueError(f"Collection {name} does not exist")
+        return FakeChromaCollection(self.collections[name])
+
+def _legacy_client():
+    return FakeChromaClient({
+        "profiles": {
+            "p1": {"name": "Me", "is_default": True, "created_at": "2024-01-01T00:00:00", "last_accessed": "2024-01-02T00:00:00"},
+            # No name: the row is skipped instead of failing the migration
+            "broken": {"is_default": False},
+        },
+        "settings": {
+            "settings_p1": {"theme": "dark", "custom_theme_colors": '{"accent": "#fff"}'},
+            "settings_p2": {"profile_id": "p2", "custom_theme_colors": "not json"},
+        },
+        "p1_chats": {
+            "c1": {"title": "cats", "messages": json.dumps([{"type": "query", "content": {"text": "cats"}}])},
+        },
+    })
+
+def test_migrates_legacy_rows(store):
+    migrate_from_chroma(store, _legacy_client())
+    
+    assert [profile["id"] for profile in store.list_profiles()] == ["p1"]
+    assert store.get_profile("p1")["is_default"] is True
+    assert store.get_settings("p1") == {"theme": "dark", "custom_theme_colors": {"accent": "#fff"}}
+    assert store.get_settings("p2") == {"custom_theme_colors": {}}
+    assert store.get_chat("c1")["message_count"] == 1
+    assert store.get_chat_messages("c1")[0]["content"] == {"text": "cats"}
+
+def test_migration_runs_once(store):
+    client = _legacy_client()
+    migrate_from_chroma(store, client)
+    migrated_at = store.get_meta("chroma_migrated")
+    
+    client.collections["profiles"]["p3"] = {"name": "Later"}
+    migrate_from_chroma(store, client)
+    
+    assert migrated_at is not None
+    assert store.get_meta("chroma_migrated") == migrated_at
+    assert store.get_profile("p3") is None
+
+def test_missing_legacy_collections_still_mark_migration(store):
+    migrate_from_chroma(store, FakeChromaClient({}))
+    
+    assert store.list_profiles() == []
+    assert store.get_meta("chroma_migrated") is not None
+
+def test_album_images_are_replaced_in_one_transaction(store):
+    album = {"id": "a1", "profile_id": "p1", "name": "Trip", "images": [
+        {"image_id": "img_1", "order": 0}, {"image_id": "img_2", "order": 1},
+    ]}
+    store.save_album(album)
+    
+    with pytest.raises(KeyError):
+        store.save_album({**album, "name": "Renamed", "images": [{"image_id": "img_3"}, {"order": 1}]})
+    
+    saved = store.get_album("p1", "a1")
+    assert saved["name"] == "Trip"
+    assert [image["image_id"] for image in saved["images"]] == ["img_1", "img_2"]
+
+def test_album_without_image_list_keeps_its_images(store):
+    store.save_album({"id": "a1", "profile_id": "p1", "name": "Trip", "images": [{"image_id": "img_1"}]})
+    
+    store.save_album({"id": "a1", "profile_id": "p1", "name": "Renamed"})
+    
+    saved = store.get_album("p1", "a1")
+    assert saved["name"] == "Renamed"
+    assert [image["image_id"] for image in saved["images"]] == ["img_1"]
+    assert store.delete_album("p1", "a1")
+    assert store.get_album("p1", "a1") is None
+
+def test_setting_the_default_profile_clears_the_others(store):
+    store.save_profile({"id": "p1", "name": "One", "is_default": True})
+    store.save_profile({"id": "p2", "name": "Two"})
+    
+    store.set_default_profile("p2")
+    
+    assert {profile["id"]: profile["is_default"] for profile in store.list_profiles()} == {"p1": False, "p2": True}
+
+def test_update_settings_merges_fields(store):
+    store.save_settings("p1", {"theme": "dark", "monitored_folders": ["/photos"]})
+    
+    merged = store.update_settings("p1", {"theme": "light"})
+    
+    assert merged == {"theme": "light", "monitored_folders": ["/photos"]}
+    assert store.get_settings("p1") == merged
@@ -0,0 +1,19 @@
+from app.models.profiles_model import ModelType
+from app.utils import model_catalog
+from app.utils.model_catalog import embedding_space, index_suffix
+
+def test_default_model_on_torch_keeps_unsuffixed_index():
+    assert index_suffix(ModelType.DEFAULT, "torch") == ""
+    # Tiers sharing a model and backend share its index
+    assert index_suffix(ModelType.PERFORMANCE, "torch") == ""
+
+def test_each_backend_gets_its_own_index():
+    suffixes = {index_suffix(ModelType.DEFAULT, backend) for backend in ("torch", "onnx", "onnx-int8")}
+    assert len(suffixes) == 3
+    assert index_suffix(ModelType.QUALITY, "torch") != index_suffix(ModelType.QUALITY, "onnx-int8")
+
+def test_configured_backend_is_the_default(monkeypatch):
+    monkeypatch.setitem(model_catalog.ENCODER_BACKEND_OVERRIDES, ModelType.PERFORMANCE, "onnx-int8")
+    assert embedding_space(ModelType.PERFORMANCE) == "openai/clip-vit-base-patch32@onnx-int8"
+    assert index_suffix(ModelType.PERFORMANCE) == index_suffix(ModelType.PERFORMANCE, "onnx-int8")
+    assert index_suffix(ModelType.DEFAULT) == ""
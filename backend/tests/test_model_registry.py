@@ -0,0 +1,74 @@
+import threading
+
+from app.utils.model_registry import ModelRegistry
+
+def _get(registry, name, size=1, loads=None):
+    def loader():
+        if loads is not None:
+            loads.append(name)
+        return f"{name}-model"
+    return registry.get(name, loader, lambda model: size)
+
+def test_resident_model_is_not_reloaded():
+    registry = ModelRegistry(max_models=2)
+    loads = []
+    
+    assert _get(registry, "a", loads=loads) == "a-model"
+    assert _get(registry, "a", loads=loads) == "a-model"
+    assert loads == ["a"]
+
+def test_least_recently_used_model_is_evicted():
+    evicted = []
+    registry = ModelRegistry(max_models=2, on_evict=lambda name, model: evicted.append(name))
+    _get(registry, "a")
+    _get(registry, "b")
+    _get(registry, "a")
+    _get(registry, "c")
+    
+    assert evicted == ["b"]
+    assert registry.is_resident("a") and registry.is_resident("c")
+    assert registry.get_stats()["evictions"] == 1
+
+def test_memory_budget_evicts_but_keeps_requested_model():
+    evicted = []
+    registry = ModelRegistry(max_models=4, memory_budget=100, on_evict=lambda name, model: evicted.append(name))
+    _get(registry, "a", size=60)
+    _get(registry, "b", size=60)
+    
+    assert evicted == ["a"]
+    
+    # A single model over budget still loads
+    _get(registry, "huge", size=500)
+    
+    assert evicted == ["a", "b"]
+    assert registry.is_resident("huge")
+
+def test_concurrent_requests_share_one_load():
+    registry = ModelRegistry(max_models=2)
+    release = threading.Event()
+    loads = []
+    
+    def loader():
+        loads.append("a")
+        release.wait(1)
+        return "a-model"
+    
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("a", loader, lambda model: 1))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    
+    assert loads == ["a"]
+    assert results == ["a-model"] * 4
+
+def test_failed_warmup_still_loads():
+    registry = ModelRegistry(max_models=1)
+    
+    def warmup(model):
+        raise RuntimeError("no device")
+    
+    assert registry.get("a", lambda: "a-model", lambda model: 1, warmup) == "a-model"
+    assert registry.is_resident("a")
@@ -0,0 +1,26 @@
+import numpy as np
+
+from app.utils.onnx_encoder import embedding_agreement
+
+def _unit_rows(rows):
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+def test_image_queries_exclude_themselves():
+    reference = _unit_rows(np.random.default_rng(0).normal(size=(6, 8)))
+    # A candidate whose neighbours are unrelated to the reference's
+    candidate = _unit_rows(np.random.default_rng(1).normal(size=(6, 8)))
+    
+    # Counting itself, every image is in its own top-6 of 6 under both backends
+    assert embedding_agreement(reference, candidate, reference, candidate, k=6)["top_k_overlap_min"] == 1.0
+    
+    report = embedding_agreement(reference, candidate, reference, candidate, k=6, exclude_self=True)
+    assert report["k"] == 5
+    partial = embedding_agreement(reference, candidate, reference, candidate, k=2, exclude_self=True)
+    assert partial["top_k_overlap_mean"] < 1.0
+
+def test_identical_backends_agree_fully():
+    vectors = _unit_rows(np.random.default_rng(2).normal(size=(12, 8)))
+    report = embedding_agreement(vectors, vectors, vectors, vectors, k=3, exclude_self=True)
+    assert report["cosine_min"] == 1.0
+    assert report["top_k_overlap_mean"] == 1.0
@@ -0,0 +1,40 @@
+import pytest
+
+from app.utils.rank_fusion import RRF_K, fuse_rankings
+
+def _results(*pairs):
+    return [{"id": image_id, "similarity_score": score} for image_id, score in pairs]
+
+def test_rrf_prefers_results_ranked_by_several_inputs():
+    fused = fuse_rankings([
+        _results(("a", 0.9), ("b", 0.8)),
+        _results(("b", 0.7), ("c", 0.6)),
+    ], "rrf")
+    
+    assert [result["id"] for result in fused] == ["b", "a", "c"]
+    assert fused[0]["fusion_score"] == pytest.approx((1 / (RRF_K + 2) + 1 / (RRF_K + 1)) / 2)
+
+def test_weighted_sums_similarities_and_keeps_best_score():
+    fused = fuse_rankings([
+        _results(("a", 0.9), ("b", 0.5)),
+        _results(("b", 0.6)),
+    ], "weighted")
+    
+    assert [result["id"] for result in fused] == ["b", "a"]
+    assert fused[0]["similarity_score"] == pytest.approx(0.6)
+    assert fused[0]["fusion_score"] == pytest.approx(0.55)
+    assert fused[1]["fusion_score"] == pytest.approx(0.45)
+
+def test_weights_and_limit():
+    fused = fuse_rankings([_results(("a", 0.9)), _results(("b", 0.9))], "weighted", limit=1, weights=[1, 3])
+    
+    assert [result["id"] for result in fused] == ["b"]
+
+def test_results_are_copies():
+    result_lists = [_results(("a", 0.9))]
+    fuse_rankings(result_lists)
+    
+    assert "fusion_score" not in result_lists[0][0]
+
+def test_no_inputs():
+    assert fuse_rankings([]) == []
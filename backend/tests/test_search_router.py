@@ -0,0 +1,62 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import image_repository
+from app.models.profiles_model import ModelType
+from app.routes import search_router
+
+class FakeCollection:
+    """Holds two indexed images; records the IDs of each read"""
+    def __init__(self):
+        self.reads = []
+        self.metadatas = {
+            "img_a": {"filepath": "/photos/a.jpg"},
+            "img_b": {"filepath": "/photos/b.jpg"},
+        }
+    
+    async def get_async(self, ids, include=None):
+        self.reads.append(ids)
+        found = [image_id for image_id in ids if image_id in self.metadatas]
+        return {"ids": found, "metadatas": [self.metadatas[image_id] for image_id in found]}
+
+@pytest.fixture
+def collection(monkeypatch):
+    fake = FakeCollection()
+    
+    async def index_model(profile_id):
+        return ModelType.DEFAULT, "torch"
+    
+    async def get_collection(name):
+        return fake
+    
+    monkeypatch.setattr(image_repository, "get_profile_index_model", index_model)
+    monkeypatch.setattr(image_repository, "get_chroma_collection", get_collection)
+    return fake
+
+@pytest.fixture
+def client():
+    """The search routes mounted where main mounts them"""
+    app = FastAPI()
+    app.include_router(search_router.router, prefix="/api/search")
+    return TestClient(app)
+
+def _batch(client, image_ids):
+    return client.post("/api/search/properties/batch", params={"profile_id": "p1"}, json={"image_ids": image_ids})
+
+def test_batch_reads_each_id_once_and_omits_unknown_ids(client, collection):
+    response = _batch(client, ["img_a", "img_missing", "img_a", "img_b"])
+    
+    assert response.status_code == 200
+    assert collection.reads == [["img_a", "img_missing", "img_b"]]
+    assert sorted(response.json()) == ["img_a", "img_b"]
+    assert response.json()["img_b"]["path"] == "/photos/b.jpg"
+
+def test_batch_accepts_one_page_of_ids(client, collection):
+    assert _batch(client, [f"img_{i}" for i in range(500)]).status_code == 200
+
+def test_batch_rejects_more_than_one_page_of_ids(client, collection):
+    response = _batch(client, [f"img_{i}" for i in range(501)])
+    
+    assert response.status_code == 422
+    assert collection.reads == []
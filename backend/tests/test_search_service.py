@@ -0,0 +1,179 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from app.database.image_repository import ImageRepository
+from app.database.manifest_repository import ManifestEntry
+from app.models.profiles_model import ModelType
+from app.services import search_service
+from app.services.indexing_service import _apply_manifest_diff, _new_manifest_diff, _new_pipeline_stats
+from app.services.search_service import PRIMARY_RESULT_COUNT, search_by_query, stream_search_query
+from app.utils.database import bump_index_generation
+from app.utils.model_catalog import index_suffix
+
+# Index model searched by each profile, when not the default
+index_models = {}
+
+class FakeImageRepository:
+    """Ranks a fixed list of images; records how many searches reached the index"""
+    searches = 0
+    
+    def __init__(self, profile_id, model_type=None, backend=None):
+        pass
+    
+    async def initialize(self):
+        return None
+    
+    async def search_by_embedding(self, embedding, limit=20):
+        FakeImageRepository.searches += 1
+        return [
+            {"id": f"img_{i}", "path": f"/photos/{i}.jpg", "similarity_score": 1 - i / 100}
+            for i in range(limit)
+        ]
+
+@pytest.fixture
+def events(monkeypatch):
+    """What the search did, in order"""
+    log = []
+    index_models.clear()
+    
+    async def index_model(profile_id):
+        return index_models.get(profile_id, (ModelType.DEFAULT, "torch"))
+    
+    async def query_embeddings(text, images, model_type, backend=None):
+        return np.ones((1, 4), dtype=np.float32)
+    
+    async def paths_exist(paths, defer=True):
+        log.append(("checked", len(paths)))
+        return [os.path.exists(path) if not defer else True for path in paths], []
+    
+    class FakeChatRepository:
+        def __init__(self, profile_id):
+            pass
+        
+        async def create_chat(self, title):
+            log.append(("chat", title))
+            return "chat-1"
+        
+        async def add_message(self, chat_id, message_type, content):
+            log.append(("message", message_type))
+    
+    FakeImageRepository.searches = 0
+    monkeypatch.setattr(search_service, "_search_cache", search_service.OrderedDict())
+    monkeypatch.setattr(search_service, "nudge_profile_indexing", lambda profile_id: None)
+    monkeypatch.setattr(search_service, "get_profile_index_model", index_model)
+    monkeypatch.setattr(search_service, "ImageRepository", FakeImageRepository)
+    monkeypatch.setattr(search_service, "generate_query_embeddings", query_embeddings)
+    monkeypatch.setattr(search_service, "paths_exist", paths_exist)
+    monkeypatch.setattr(search_service, "ChatRepository", FakeChatRepository)
+    monkeypatch.setattr(search_service, "get_index_freshness", lambda profile_id: {})
+    return log
+
+async def _collect(stream):
+    return [(event, data) async for event, data in stream]
+
+def test_stream_sends_primary_before_checking_the_rest(events):
+    async def first_event():
+        stream = stream_search_query("profile", "a red car", limit=12)
+        event, data = await stream.__anext__()
+        seen = list(events)
+        remaining = await _collect(stream)
+        return event, data, seen, remaining
+    
+    event, data, seen, remaining = asyncio.run(first_event())
+    
+    assert event == "primary"
+    assert [result["id"] for result in data["results"]] == [f"img_{i}" for i in range(PRIMARY_RESULT_COUNT)]
+    assert seen == [("checked", PRIMARY_RESULT_COUNT)]
+    assert [name for name, _ in remaining] == ["related", "session"]
+    assert len(remaining[0][1]["results"]) == 12 - PRIMARY_RESULT_COUNT
+    assert remaining[1][1]["chat_id"] == "chat-1"
+    assert events[1] == ("checked", 12 - PRIMARY_RESULT_COUNT)
+    assert [name for name, _ in events[2:]] == ["chat", "message", "message"]
+
+def test_stream_omits_related_for_short_result_lists(events):
+    sent = asyncio.run(_collect(stream_search_query("profile", "a red car", limit=3)))
+    
+    assert [name for name, _ in sent] == ["primary", "session"]
+    assert len(sent[0][1]["results"]) == 3
+
+def test_streamed_results_are_cached(events):
+    asyncio.run(_collect(stream_search_query("profile", "a red car", limit=12)))
+    results = asyncio.run(search_service.search_by_query("profile", "a red car", [], 12))
+    
+    assert FakeImageRepository.searches == 1
+    assert len(results) == 12 and all(result["exists"] for result in results)
+
+def test_stream_skips_query_images_that_no_longer_exist(events, tmp_path, monkeypatch):
+    present = tmp_path / "query.jpg"
+    present.write_bytes(b"jpeg")
+    queried = []
+    
+    async def query_embeddings(text, images, model_type, backend=None):
+        queried.append(images)
+        return np.ones((1, 4), dtype=np.float32)
+    
+    monkeypatch.setattr(search_service, "generate_query_embeddings", query_embeddings)
+    sent = asyncio.run(_collect(stream_search_query("profile", None, [str(present), str(tmp_path / "gone.jpg")], limit=3)))
+    
+    assert queried == [[b"jpeg"]]
+    assert [name for name, _ in sent] == ["primary", "session"]
+
+def _search(profile_id="profile", text="a red car"):
+    return asyncio.run(search_by_query(profile_id, text, [], 12))
+
+def test_index_write_invalidates_cached_results(events):
+    _search()
+    _search()
+    assert FakeImageRepository.searches == 1
+    
+    bump_index_generation("profile", index_suffix(ModelType.DEFAULT, "torch"))
+    _search()
+    
+    assert FakeImageRepository.searches == 2
+
+def test_cached_results_are_kept_per_profile_and_model(events):
+    _search()
+    _search(profile_id="other")
+    index_models["profile"] = (ModelType.QUALITY, "torch")
+    _search()
+    assert FakeImageRepository.searches == 3
+    
+    # A write to the quality index leaves the default index's results cached
+    bump_index_generation("profile", index_suffix(ModelType.QUALITY, "torch"))
+    index_models.clear()
+    _search()
+    _search(profile_id="other")
+    
+    assert FakeImageRepository.searches == 3
+
+def test_added_image_invalidates_cached_results(events):
+    _search()
+    
+    class Collection:
+        async def upsert_async(self, ids, embeddings, metadatas):
+            pass
+    
+    repository = ImageRepository("profile", ModelType.DEFAULT, "torch")
+    repository.collection = Collection()
+    assert asyncio.run(repository.add_image("img_new", {"filepath": "/new.jpg"}, [0.0]))
+    _search()
+    
+    assert FakeImageRepository.searches == 2
+
+def test_deleted_files_invalidate_cached_results(events, manifest):
+    profile_id = manifest.profile_id
+    _search(profile_id)
+    
+    class Collection:
+        async def delete_async(self, ids):
+            pass
+    
+    diff = _new_manifest_diff()
+    diff.removed.append(ManifestEntry("/photos/0.jpg", 1, 1, 1, "hash", "img_0"))
+    asyncio.run(_apply_manifest_diff(Collection(), manifest, diff, 8, _new_pipeline_stats()))
+    _search(profile_id)
+    
+    assert FakeImageRepository.searches == 2
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from app.models.profiles_model import ModelType
+from app.services import settings_service
+
+@pytest.fixture
+def migrations(store, monkeypatch):
+    """Targets of the migrations started by settings updates; the profile searches the default index"""
+    started = []
+    
+    async def index_model(profile_id):
+        return ModelType.DEFAULT, "torch"
+    
+    monkeypatch.setattr(settings_service, "get_metadata_store", lambda: store)
+    monkeypatch.setattr(settings_service, "get_profile_index_model", index_model)
+    monkeypatch.setattr(settings_service, "get_encoder_backend", lambda model_type: "torch")
+    monkeypatch.setattr(settings_service, "start_index_migration", lambda profile_id, target: started.append(target))
+    store.save_settings("p1", {"vlm_model": ModelType.DEFAULT.value})
+    return started
+
+def _update(updates):
+    return asyncio.run(settings_service.update_profile_settings("p1", updates))
+
+def test_unchanged_model_does_not_start_a_migration(migrations):
+    _update({"vlm_model": ModelType.DEFAULT.value})
+    
+    assert migrations == []
+
+def test_model_change_starts_a_migration(migrations, store):
+    updated = _update({"vlm_model": ModelType.QUALITY.value})
+    
+    assert updated.vlm_model == ModelType.QUALITY
+    assert store.get_settings("p1")["vlm_model"] == ModelType.QUALITY.value
+    assert migrations == [ModelType.QUALITY]
+
+def test_resubmitting_an_unindexed_model_resumes_its_migration(migrations, store):
+    store.save_settings("p1", {"vlm_model": ModelType.QUALITY.value})
+    
+    _update({"vlm_model": ModelType.QUALITY.value})
+    
+    assert migrations == [ModelType.QUALITY]
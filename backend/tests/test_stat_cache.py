@@ -0,0 +1,115 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.database.manifest_repository import ManifestEntry
+from app.services import watcher_service
+from app.services.indexing_service import _apply_manifest_diff, _new_manifest_diff, _new_pipeline_stats
+from app.utils import stat_cache
+from app.utils.stat_cache import FileStatCache, paths_exist
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def cache(clock, monkeypatch):
+    """A fresh process-wide stat cache with a 30 second TTL"""
+    fresh = FileStatCache(ttl=30, clock=clock)
+    monkeypatch.setattr(stat_cache, "_stat_cache", fresh)
+    return fresh
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.record("/a.jpg", True)
+    
+    clock.now += 30
+    assert cache.get("/a.jpg") is True
+    clock.now += 1
+    assert cache.get("/a.jpg") is None
+    assert cache.get_stats()["hits"] == 1 and cache.get_stats()["misses"] == 1
+
+def test_least_recently_checked_paths_are_forgotten(clock):
+    cache = FileStatCache(ttl=30, capacity=2, clock=clock)
+    cache.record("/a.jpg", True)
+    cache.record("/b.jpg", True)
+    cache.record("/a.jpg", True)
+    cache.record("/c.jpg", False)
+    
+    assert cache.get("/b.jpg") is None
+    assert cache.get("/a.jpg") is True and cache.get("/c.jpg") is False
+
+def test_zero_ttl_disables_the_cache(tmp_path, clock):
+    cache = FileStatCache(ttl=0, clock=clock)
+    path = str(tmp_path / "a.jpg")
+    
+    assert cache.exists(path) is False
+    open(path, "wb").close()
+    assert cache.exists(path) is True
+
+def test_misses_are_stated_unless_deferred(tmp_path, cache):
+    present = str(tmp_path / "present.jpg")
+    open(present, "wb").close()
+    cache.record("/gone.jpg", False)
+    paths = [present, "/gone.jpg", str(tmp_path / "missing.jpg")]
+    
+    assert asyncio.run(paths_exist(paths, defer=True)) == ([True, False, True], [present, paths[2]])
+    assert asyncio.run(paths_exist(paths, defer=False)) == ([True, False, False], [])
+    assert cache.get(paths[2]) is False
+
+def test_watcher_events_feed_the_cache(cache):
+    handler = watcher_service._FolderEventHandler(watcher_service.FolderWatcher(), "p1")
+    
+    def event(event_type, src_path, dest_path=""):
+        return SimpleNamespace(event_type=event_type, src_path=src_path, dest_path=dest_path, is_directory=False)
+    
+    handler.on_any_event(event("created", "/new.jpg"))
+    handler.on_any_event(event("deleted", "/old.jpg"))
+    handler.on_any_event(event("moved", "/from.jpg", "/to.jpg"))
+    
+    assert [cache.get(path) for path in ("/new.jpg", "/old.jpg", "/from.jpg", "/to.jpg")] == [True, False, False, True]
+
+def test_indexer_feeds_the_cache(tmp_path, cache, manifest):
+    touched = str(tmp_path / "touched.jpg")
+    open(touched, "wb").close()
+    
+    class Collection:
+        async def delete_async(self, ids):
+            pass
+    
+    diff = _new_manifest_diff()
+    diff.touched.append(ManifestEntry(touched, 0, 1, 1, "hash", "img_touched"))
+    diff.removed.append(ManifestEntry("/removed.jpg", 1, 1, 1, "hash", "img_removed"))
+    asyncio.run(_apply_manifest_diff(Collection(), manifest, diff, 8, _new_pipeline_stats()))
+    
+    assert cache.get(touched) is True
+    assert cache.get("/removed.jpg") is False
+
+def test_deferred_check_sends_missing_results_to_the_indexer(tmp_path, cache, monkeypatch):
+    present = str(tmp_path / "present.jpg")
+    open(present, "wb").close()
+    missing = str(tmp_path / "missing.jpg")
+    changed = []
+    
+    async def index_changed_paths(profile_id, paths):
+        changed.append((profile_id, paths))
+    
+    monkeypatch.setattr(watcher_service, "index_changed_paths", index_changed_paths)
+    
+    async def verify():
+        watcher = watcher_service.FolderWatcher()
+        watcher.verify_paths("p1", [present, missing])
+        await asyncio.gather(*watcher._background_tasks)
+    
+    asyncio.run(verify())
+    
+    assert changed == [("p1", [missing])]
+    assert cache.get(missing) is False
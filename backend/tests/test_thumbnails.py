@@ -0,0 +1,59 @@
+import os
+
+import pytest
+from PIL import Image
+
+from app.utils.thumbnails import ThumbnailCache
+
+def _write_image(path, color):
+    Image.new("RGB", (64, 48), color).save(path)
+    return str(path)
+
+@pytest.fixture
+def cache_factory(tmp_path):
+    caches = []
+    
+    def create(capacity_bytes):
+        cache = ThumbnailCache(str(tmp_path / f"cache-{len(caches)}"), capacity_bytes)
+        caches.append(cache)
+        return cache
+    
+    yield create
+    for cache in caches:
+        cache.close()
+
+def test_thumbnail_is_rendered_once(tmp_path, cache_factory):
+    cache = cache_factory(1024 * 1024)
+    path = _write_image(tmp_path / "a.jpg", (200, 10, 10))
+    
+    first = cache.get_thumbnail(path, 100)
+    second = cache.get_thumbnail(path, 120)
+    
+    assert first == second
+    assert "_128." in os.path.basename(first.path)
+    assert cache.get_stats()["hits"] == 1 and cache.get_stats()["misses"] == 1
+
+def test_zero_capacity_keeps_the_thumbnail_being_served(tmp_path, cache_factory):
+    cache = cache_factory(0)
+    first = _write_image(tmp_path / "a.jpg", (200, 10, 10))
+    second = _write_image(tmp_path / "b.jpg", (10, 200, 10))
+    
+    served = cache.get_thumbnail(first, 256)
+    assert os.path.exists(served.path)
+    
+    next_served = cache.get_thumbnail(second, 256)
+    assert os.path.exists(next_served.path)
+    assert not os.path.exists(served.path)
+    assert cache.get_stats()["evictions"] == 1
+
+def test_least_recently_served_thumbnails_are_evicted(tmp_path, cache_factory):
+    paths = [_write_image(tmp_path / f"{i}.jpg", (i * 60, 20, 20)) for i in range(3)]
+    probe = cache_factory(1024 * 1024)
+    capacity = sum(os.path.getsize(probe.get_thumbnail(path, 128).path) for path in paths[:2])
+    cache = cache_factory(capacity)
+    
+    served = [cache.get_thumbnail(path, 128) for path in paths]
+    
+    assert not os.path.exists(served[0].path)
+    assert os.path.exists(served[2].path)
+    assert cache.get_stats()["bytes"] <= capacity
@@ -0,0 +1,48 @@
+import numpy as np
+
+from app.database.vector_index import NumpyVectorIndex, benchmark_search_backends
+
+class FakeCollection:
+    """Stand-in for a ChromaDB collection holding a fixed set of embeddings"""
+
+    def __init__(self, embeddings):
+        self.ids = [f"img_{i}" for i in range(len(embeddings))]
+        self.embeddings = [list(map(float, row)) for row in embeddings]
+
+    def get(self, include, limit, offset):
+        page = slice(offset, offset + limit)
+        return {
+            "ids": self.ids[page],
+            "embeddings": self.embeddings[page],
+            "metadatas": [{"last_indexed": "t"} for _ in self.ids[page]],
+        }
+
+    def query(self, query_embeddings, n_results, include):
+        scores = np.asarray(self.embeddings) @ np.asarray(query_embeddings[0])
+        return {"ids": [[self.ids[i] for i in np.argsort(-scores)[:n_results]]]}
+
+def _index(tmp_path, count=20):
+    embeddings = np.random.default_rng(0).normal(size=(count, 4))
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return NumpyVectorIndex(f"test-{tmp_path.name}"), FakeCollection(embeddings)
+
+def test_sample_embeddings_skips_deleted_rows(tmp_path):
+    index, collection = _index(tmp_path)
+    index.sync(collection)
+    index._on_write("delete", collection.ids[:15], None, None)
+    
+    sample = index.sample_embeddings(collection, 10)
+    
+    assert sample.shape == (5, 4)
+    live = np.asarray(collection.embeddings[15:], dtype=np.float32)
+    assert all(np.isclose(live, row, atol=1e-6).all(axis=1).any() for row in sample)
+
+def test_benchmark_reports_exact_recall(tmp_path):
+    index, collection = _index(tmp_path)
+    
+    report = benchmark_search_backends(index, collection, num_queries=5, k=3)
+    
+    assert report["count"] == 20
+    assert report["dimension"] == 4
+    assert report["queries"] == 5
+    assert report["chroma_recall_at_k"] == 1.0
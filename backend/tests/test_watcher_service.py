@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+from app.services import watcher_service
+from app.services.watcher_service import FolderWatcher, MODE_INTERVAL
+
+def _nudge_after(monkeypatch, seconds_since_last_run, interval_minutes):
+    """Nudge an interval-mode profile whose last rescan ended a while ago; returns the rescans started"""
+    rescans = []
+    
+    async def check_for_new_images(profile_id):
+        rescans.append(profile_id)
+    
+    monkeypatch.setattr(watcher_service, "check_for_new_images", check_for_new_images)
+    monkeypatch.setattr(
+        watcher_service, "get_indexing_status",
+        lambda profile_id: {"running": False, "end_time": time.time() - seconds_since_last_run}
+    )
+    
+    async def nudge():
+        watcher = FolderWatcher()
+        watcher._modes["p"] = MODE_INTERVAL
+        watcher._intervals["p"] = watcher_service._interval_seconds({"auto_index_interval_minutes": interval_minutes})
+        watcher.nudge("p")
+        await asyncio.gather(*watcher._background_tasks)
+    
+    asyncio.run(nudge())
+    return rescans
+
+def test_search_does_not_rescan_before_profile_interval(monkeypatch):
+    assert _nudge_after(monkeypatch, 10 * 60, interval_minutes=60) == []
+
+def test_search_rescans_once_profile_interval_passed(monkeypatch):
+    assert _nudge_after(monkeypatch, 10 * 60, interval_minutes=5) == ["p"]
@@ -24,6 +24,7 @@ interface EnhancedSearchResultProps {
   relatedImages: Array<{
     id: string;
     path: string;
+    thumbnail?: string;
   }>;
 }
 
@@ -191,7 +192,7 @@ const EnhancedSearchResult: React.FC<EnhancedSearchResultProps> = ({
                 <ContextMenuTrigger>
                   <div className="h-24 rounded-md overflow-hidden">
                     <img
-                      src={image.path}
+                      src={image.thumbnail || image.path}
                       alt="Related"
                       className="h-full w-full object-cover cursor-pointer hover:opacity-90 transition-opacity"
                       onClick={() => handleImageClick(image.path)}
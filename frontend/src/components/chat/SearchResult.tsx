@@ -22,6 +22,7 @@ interface SearchResultProps {
   relatedImages: Array<{
     id: string;
     path: string;
+    thumbnail?: string;
   }>;
 }
 
@@ -205,7 +206,7 @@ const SearchResult: React.FC<SearchResultProps> = ({
                 <ContextMenuTrigger>
                   <div className="h-24 rounded-md overflow-hidden">
                     <img
-                      src={image.path}
+                      src={image.thumbnail || image.path}
                       alt="Related"
                       className="h-full w-full object-cover cursor-pointer hover:opacity-90 transition-opacity"
                       onClick={() => handleImageClick(image.path)}
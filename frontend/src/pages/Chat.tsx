@@ -68,7 +68,8 @@ const Chat: React.FC = () => {
           } : undefined,
           relatedResults: result.relatedResults.map(img => ({
             id: img.id,
-            path: img.imagePath
+            path: img.imagePath,
+            thumbnail: img.thumbnailPath
           })),
           timestamp: new Date().toISOString(),
         })
@@ -80,8 +81,8 @@ const Chat: React.FC = () => {
         : 'Image search';
       
       const thumbnails = [
-        result.primaryResult?.imagePath,
-        ...(result.relatedResults.slice(0, 2).map(img => img.imagePath)),
+        result.primaryResult?.thumbnailPath,
+        ...(result.relatedResults.slice(0, 2).map(img => img.thumbnailPath)),
       ].filter(Boolean) as string[];
       
       const session = {
@@ -20,6 +20,7 @@ interface SearchSection {
   relatedResults: {
     id: string;
     path: string;
+    thumbnail?: string;
   }[];
   timestamp: string;
 }
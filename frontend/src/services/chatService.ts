@@ -13,6 +13,8 @@ interface SearchParams {
 interface SearchResult {
   id: string;
   imagePath: string;
+  // Small rendition for grid cells; imagePath stays the full-size original
+  thumbnailPath: string;
   score: number;
   metadata?: Record<string, any>;
 }
@@ -22,14 +24,22 @@ interface SearchResponse {
   queryImage?: string;
   primaryResult?: SearchResult;
   relatedResults: SearchResult[];
+  // When the searched index was last updated, and how many files are still being indexed
+  indexUpdatedAt?: string;
+  pendingFiles?: number;
+  indexing?: boolean;
 }
 
 const API_BASE = 'http://localhost:8000';
 
-function pathToUrl(filePath: string): string {
+// Pixels requested for grid cells and library cards; the backend rounds up to a cached thumbnail bucket
+const GRID_THUMBNAIL_SIZE = 256;
+
+function pathToUrl(filePath: string, size?: number): string {
   if (!filePath) return '';
   // Serve local files through the backend to bypass Electron's webSecurity restrictions
-  return `${API_BASE}/api/image/serve?path=${encodeURIComponent(filePath)}`;
+  const url = `${API_BASE}/api/image/serve?path=${encodeURIComponent(filePath)}`;
+  return size ? `${url}&size=${size}` : url;
 }
 
 function mapResult(r: any): SearchResult {
@@ -37,6 +47,7 @@ function mapResult(r: any): SearchResult {
   return {
     id: r.id,
     imagePath: pathToUrl(rawPath),
+    thumbnailPath: pathToUrl(rawPath, GRID_THUMBNAIL_SIZE),
     score: r.similarity_score ?? r.score ?? 0,
     metadata: r.metadata,
   };
@@ -79,6 +90,9 @@ const chatService = {
       query: params.query || '',
       primaryResult: allResults[0],
       relatedResults: allResults.slice(1),
+      indexUpdatedAt: data.index_updated_at ?? undefined,
+      pendingFiles: data.pending_files ?? 0,
+      indexing: data.indexing ?? false,
     };
   },
 